@@ -1,42 +1,35 @@
 import os
-from dotenv import load_dotenv
-from langchain_community.utilities import SQLDatabase
-from langchain_community.agent_toolkits.sql.base import SQLDatabaseToolkit, create_sql_agent
-from langchain_openai import ChatOpenAI
-
-
-# Load environment variables safely
-try:
-    load_dotenv()
-    api_key = os.getenv("Groq_Api_Key")
-    if not api_key:
-        raise ValueError("Groq_Api_Key not found in environment variables.")
-except Exception as e:
-    raise RuntimeError(f"[ERROR] Could not load API key: {e}")
-
-# Initialize the language model
-try:
-    llm = ChatOpenAI(
-        model="meta-llama/llama-4-scout-17b-16e-instruct",
-        base_url="https://api.groq.com/openai/v1",
-        api_key=api_key,
-        temperature=0.4
-    )
-except Exception as e:
-    raise RuntimeError(f"[ERROR] Failed to initialize language model: {e}")
-
-# Connect to the SQLite database
-try:
-    db = SQLDatabase.from_uri("sqlite:///db/laptops.db")
-except Exception as e:
-    raise RuntimeError(f"[ERROR] Failed to connect to database: {e}")
-
-# Create toolkit and SQL agent
-try:
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-    agent_executor = create_sql_agent(llm=llm, toolkit=toolkit, verbose=True)
-except Exception as e:
-    raise RuntimeError(f"[ERROR] Failed to create SQL agent: {e}")
+import time
+import queue
+import sqlite3
+import threading
+import resources
+import telemetry
+import sql_assistant
+from langchain_core.callbacks import BaseCallbackHandler
+
+# The LLM, SQLDatabase and SQL agent are built lazily through the shared
+# resource registry, so importing this module no longer connects to anything.
+
+# "lean" uses the single-tool agent with a precomputed schema summary;
+# "toolkit" restores the full LangChain SQL toolkit agent
+ASSISTANT_MODE = os.getenv("ASSISTANT_MODE", "lean")
+AGENT_RESOURCE = "sql_agent" if ASSISTANT_MODE == "toolkit" else "lean_sql_agent"
+
+# Common question shapes are answered by SQL templates without the LLM
+SQL_TEMPLATES_ENABLED = os.getenv("ASSISTANT_SQL_TEMPLATES", "1") == "1"
+
+def _template_answer(user_input):
+    if not SQL_TEMPLATES_ENABLED:
+        return None
+    try:
+        with telemetry.span("sql_template"):
+            answer = sql_assistant.answer_from_template(user_input)
+    except (RuntimeError, sqlite3.Error) as e:
+        print(f"[WARNING] SQL templates unavailable: {e}")
+        return None
+    telemetry.increment("assistant_requests_total", path="agent" if answer is None else "template")
+    return answer
 
 # Query function with exception handling
 def query_assistant(user_input):
@@ -44,11 +37,100 @@ def query_assistant(user_input):
     Executes the assistant agent with the given user input.
     """
     try:
-        response = agent_executor.run(user_input)
+        with telemetry.request("query_assistant"):
+            response = _template_answer(user_input)
+            if response is None:
+                agent_executor = resources.get(AGENT_RESOURCE)
+                response = agent_executor.run(user_input)
         return response
     except Exception as e:
         return f"[ERROR] Could not process query: {str(e)}"
 
+# -------------------- Streaming --------------------
+
+FINAL_ANSWER_PREFIX = "Final Answer:"
+
+class FinalAnswerStreamer(BaseCallbackHandler):
+    """
+    Collects LLM tokens from the agent run and forwards only those after
+    "Final Answer:" to a queue; the ReAct thoughts and SQL tool calls that
+    come before it are not shown to the user.
+    """
+
+    def __init__(self):
+        self.tokens = queue.Queue()
+        self.streamed = False
+        self._buffer = ""
+        self._in_answer = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._buffer = ""
+        self._in_answer = False
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.on_llm_start(serialized, [], **kwargs)
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not self._in_answer:
+            self._buffer += token
+            position = self._buffer.find(FINAL_ANSWER_PREFIX)
+            if position < 0:
+                return
+            self._in_answer = True
+            token = self._buffer[position + len(FINAL_ANSWER_PREFIX):]
+
+        if not self.streamed:
+            token = token.lstrip()
+            if not token:
+                return
+        self.streamed = True
+        self.tokens.put(token)
+
+def query_assistant_stream(user_input):
+    """
+    Streaming variant of query_assistant: runs the agent in a background
+    thread and yields the final answer token by token as it is generated.
+    Falls back to yielding the whole answer when the agent finishes
+    without a streamed "Final Answer:" (e.g. on an early stop). Template
+    answers are yielded as a single chunk.
+    """
+    answer = _template_answer(user_input)
+    if answer is not None:
+        yield answer
+        return
+
+    streamer = FinalAnswerStreamer()
+    outcome = {}
+
+    def run_agent():
+        try:
+            with telemetry.request("query_assistant", streaming=True):
+                agent_executor = resources.get(AGENT_RESOURCE)
+                outcome["response"] = agent_executor.run(user_input, callbacks=[streamer])
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            streamer.tokens.put(None)
+
+    start = time.perf_counter()
+    threading.Thread(target=run_agent, name="assistant-stream", daemon=True).start()
+
+    first_token = True
+    while True:
+        token = streamer.tokens.get()
+        if token is None:
+            break
+        if first_token:
+            first_token = False
+            telemetry.observe("llm_time_to_first_token_seconds", time.perf_counter() - start,
+                              endpoint="query_assistant")
+        yield token
+
+    if "error" in outcome:
+        yield f"[ERROR] Could not process query: {str(outcome['error'])}"
+    elif not streamer.streamed:
+        yield outcome.get("response", "")
+
 # Optional: Testing block
 if __name__ == "__main__":
     test_queries = [
@@ -60,3 +142,8 @@ if __name__ == "__main__":
     for query in test_queries:
         print(f"\n[QUERY] {query}")
         print(query_assistant(query))
+
+    print("\n[STREAMING]")
+    for token in query_assistant_stream(test_queries[0]):
+        print(token, end="", flush=True)
+    print()
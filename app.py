@@ -1,84 +1,152 @@
-
-
-
+import os
 import streamlit as st
-import pandas as pd
-import sqlite3
-from search_handler import search_laptops
-from user_history import save_history_to_db, get_user_history
-from agent import query_assistant
-from llm_recommendation import generate_recommendation
+import threading
+from collections import OrderedDict
+from cache import normalize_query
+from renderings import renderings
+
+# Thin client mode: with DEALWIZARD_SERVICE_URL set, search, recommendations,
+# the assistant and history go to service.py and this process loads no models
+SERVICE_URL = os.getenv("DEALWIZARD_SERVICE_URL")
+
+if SERVICE_URL:
+    from service_client import (find_laptops, generate_recommendation_stream, query_assistant_stream,
+                                save_history_to_db, get_user_history, is_complete)
+else:
+    import resources
+    from cache_warmer import warm_caches
+    from search_handler import find_laptops
+    from user_history import save_history_to_db, get_user_history
+    from agent import query_assistant_stream
+    from llm_recommendation import generate_recommendation_stream, is_complete
 
 # Static user ID
 user_id = "user123"
 
+VIEWS = ["🔎 Search", "🧠 Recommendation", "🧞 Assistant", "📜 History"]
+
+def background_warmup():
+    resources.warmup()
+    # Then replay popular history queries so their caches are hot
+    warm_caches()
+
+@st.cache_resource(show_spinner=False)
+def start_background_warmup():
+    """
+    Loads the heavy search/agent resources once per process in a background
+    thread, so the first page render is not blocked on model loading.
+    """
+    thread = threading.Thread(target=background_warmup, daemon=True)
+    thread.start()
+    return thread
+
+# ---------------- Per-Session Memo ----------------
+
+# Streamlit reruns this script on every interaction. Pipeline results are
+# memoized per session, keyed by normalized query, for the last few queries,
+# so a rerun with the same query (e.g. sending a chat message) or switching
+# back to a recent one does no search, LLM call or history write.
+QUERY_MEMO_SIZE = 8
+
+def query_state(user_query):
+    """
+    Returns the memo for the current query, evicting the least recently
+    used query once the session holds QUERY_MEMO_SIZE of them.
+    """
+    memo = st.session_state.setdefault("query_memo", OrderedDict())
+    key = normalize_query(user_query)
+    state = memo.get(key)
+    if state is None:
+        state = memo[key] = {"query": user_query}
+        while len(memo) > QUERY_MEMO_SIZE:
+            memo.popitem(last=False)
+    memo.move_to_end(key)
+    return state
+
+def search_results(state):
+    """
+    Runs the search once per query; returns a DataFrame or an error message.
+    """
+    if "results" not in state:
+        try:
+            state["results"], state["query_data"] = find_laptops(state["query"])
+        except RuntimeError as e:
+            state["results"], state["query_data"] = str(e), None
+    return state["results"]
+
 # Streamlit UI setup
 st.set_page_config(page_title="DealWizard", layout="wide")
+
+# After set_page_config, which must be the first Streamlit command
+if not SERVICE_URL:
+    start_background_warmup()
+
 st.title("💻 DealWizard")
 st.caption("Your personal AI-powered laptop shopping assistant.")
 
 # Sidebar input
 with st.sidebar:
     st.header("🔍 Laptop Query")
-    user_query = st.text_input("Describe what you want in a laptop:", "")
+    user_query = st.text_input("Describe what you want in a laptop:", "").strip()
 
-# Run search if input exists
-search_results = None
-if user_query:
-    search_results = search_laptops(user_query)
+state = query_state(user_query) if user_query else None
 
-# Tabs: Search | Recommendation | Assistant | History
-tab1, tab2, tab3, tab4 = st.tabs(["🔎 Search", "🧠 Recommendation", "🧞 Assistant", "📜 History"])
+# Only the selected view runs, unlike st.tabs which executes every tab body
+view = st.radio("View", VIEWS, horizontal=True, label_visibility="collapsed", key="active_view")
 
-# ---------------- Tab 1: Search ----------------
-with tab1:
+# ---------------- View 1: Search ----------------
+if view == VIEWS[0]:
     st.subheader("Matching Laptops")
     if user_query:
-        if isinstance(search_results, str):
-            st.error(search_results)
-        elif not search_results.empty:
-            for idx, (_, row) in enumerate(search_results.iterrows()):
-                st.markdown(f"""
-                **{idx+1}. {row['Company']} {row['Product']}**
-                - 💾 RAM: {row['Ram']}GB | 💽 {row['PrimaryStorage']}GB {row['PrimaryStorageType']}
-                - 🎮 GPU: {row['GPU_model']} | 💰 Price: €{row['Price_euros']} | ⚖️ {row['Weight']}kg
-                """)
+        results = search_results(state)
+        if isinstance(results, str):
+            st.error(results)
+        elif not results.empty:
+            # Cards are rendered at build time; only the rank is added here
+            for idx, card in enumerate(renderings("card", results)):
+                st.markdown(f"**{idx+1}.** {card}")
         else:
             st.warning("No laptops found for that query.")
     else:
         st.info("Please enter a query in the sidebar.")
 
-# ---------------- Tab 2: Recommendation ----------------
-with tab2:
+# ---------------- View 2: Recommendation ----------------
+elif view == VIEWS[1]:
     st.subheader("📢 LLM-Powered Recommendation")
     if user_query:
         try:
-            # Use a small subset of laptops for generating recommendations
-            conn = sqlite3.connect("db/laptops.db")
-            df_subset = pd.read_sql_query("SELECT * FROM laptops LIMIT 3", conn)
-            conn.close()
-
-            with st.spinner("Thinking... 🤖"):
-                recommendation = generate_recommendation(user_query, df_subset)
-
-            # Save to in-memory list via SQLite
-            save_history_to_db([
-                            {
-                                "user_id": user_id,
-                                "query": user_query,
-                                "recommendation": recommendation
-                            }
-                        ])
-
-
-            st.success("Here's my advice:")
-            st.markdown(f"```markdown\n{recommendation}\n```")
+            results = search_results(state)
+            if isinstance(results, str):
+                st.error(results)
+            elif "recommendation" in state:
+                st.success("Here's my advice:")
+                st.markdown(state["recommendation"])
+            else:
+                st.success("Here's my advice:")
+                # Rendered token by token; write_stream returns the full text
+                recommendation = st.write_stream(
+                    generate_recommendation_stream(user_query, results, state["query_data"])
+                )
+
+                # Failed or cut-off streams are neither memoized nor saved,
+                # so the next rerun retries
+                if is_complete(recommendation):
+                    state["recommendation"] = recommendation
+                    # Persisted once per query, after the stream has finished
+                    save_history_to_db([
+                                    {
+                                        "user_id": user_id,
+                                        "query": user_query,
+                                        "recommendation": recommendation
+                                    }
+                                ])
         except Exception as e:
             st.error(f"⚠️ Error generating recommendation: {str(e)}")
     else:
         st.info("Please enter a query in the sidebar first.")
-# ---------------- Tab 3: Assistant ----------------
-with tab3:
+
+# ---------------- View 3: Assistant ----------------
+elif view == VIEWS[2]:
     st.subheader("🧞 Ask the Laptop Assistant")
     st.write("Ask about brands, specs, cheapest laptops, GPU types, etc.")
 
@@ -98,25 +166,25 @@ with tab3:
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        with st.spinner("Thinking..."):
-            response = query_assistant(user_input)
-
-        st.session_state.agent_messages.append({"role": "assistant", "content": response})
         with st.chat_message("assistant"):
+            placeholder = st.empty()
+            with placeholder.container():
+                response = st.write_stream(query_assistant_stream(user_input))
+
             # Highlight if it's a fallback message
             if "I only help with laptops" in response or "can't help" in response:
-                st.info(response)
-            elif "something went wrong" in response:
-                st.error(response)
-            else:
-                st.markdown(response)
+                placeholder.info(response)
+            elif "something went wrong" in response or response.startswith("[ERROR]"):
+                placeholder.error(response)
+
+        st.session_state.agent_messages.append({"role": "assistant", "content": response})
 
-# ---------------- Tab 4: History ----------------
-with tab4:
+# ---------------- View 4: History ----------------
+else:
     st.subheader("🕓 Your Query History")
     history = get_user_history(user_id)
     if history:
         for q, r, ts in history:
             st.markdown(f"- ⏱️ {ts} | **Query**: _{q}_ \n**Recommendation**: _{r}_")
     else:
-        st.info("No previous queries found.")
\ No newline at end of file
+        st.info("No previous queries found.")
@@ -0,0 +1,286 @@
+import os
+import io
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from llm_stub_server import start_stub_server
+
+# -------------------- Configuration --------------------
+
+RESULTS_DIR = "benchmark_results"
+
+# Fixed corpus so runs are comparable between commits
+BENCHMARK_QUERIES = [
+    "HP laptop under 800 euros",
+    "lightweight student laptop",
+    "Suggest a good gaming laptop which has 16GB RAM and is lightweight.",
+    "Find laptops for students",
+    "Best laptop under 800 euros for school and college",
+    "I need a lightweight Dell laptop which weight under 1 kg",
+    "High performance laptops for video editing which has above 32 GB RAM",
+    "MacBook Air between 900 and 1500",
+    "Lenovo ThinkPad for office work",
+    "Asus gaming laptop with GTX 1060",
+    "cheap laptop with SSD and long battery life",
+    "Laptop for programming and machine learning",
+    "thin and light laptop for travel under 1200 euros",
+    "workstation laptop with Quadro graphics",
+    "Acer laptop for college under 500 euros",
+    "2 in 1 convertible touchscreen laptop",
+    "MSI gaming laptop over 1500 euros",
+    "Razer Blade for gaming",
+    "something that runs my favourite simulation software smoothly",
+    "Dell XPS 13",
+]
+
+ASSISTANT_QUERIES = [
+    "What are the top 5 cheapest laptops?",
+    "List all Apple laptops with more than 8GB RAM",
+    "Show me gaming laptops with RTX graphics",
+]
+
+# -------------------- Measurement --------------------
+
+def summarize(samples_ms):
+    if not samples_ms:
+        return {"count": 0}
+    samples = np.asarray(samples_ms)
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples, 99)), 3),
+    }
+
+class StageTimer:
+    """
+    Collects wall-clock samples per stage name.
+    """
+
+    def __init__(self, quiet=True):
+        self.samples = {}
+        self.errors = {}
+        self.quiet = quiet
+
+    def measure(self, name, fn, *args, **kwargs):
+        # Pipeline code prints progress lines; keep them out of the report
+        sink = io.StringIO() if self.quiet else None
+        start = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            self.errors.setdefault(name, []).append(str(e))
+            return None
+        self.samples.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+        return result
+
+    def report(self):
+        report = {name: summarize(samples) for name, samples in self.samples.items()}
+        for name, errors in self.errors.items():
+            report.setdefault(name, {"count": 0})["errors"] = len(errors)
+            report[name]["first_error"] = errors[0]
+        return report
+
+def run_stage_benchmark(queries, iterations=1, top_k=5, cold=False, quiet=True):
+    """
+    Times every pipeline stage separately plus the end-to-end calls.
+    With cold=True the query-understanding and recommendation caches are
+    cleared before each query so every call reaches the (stubbed) LLM.
+    """
+    import resources
+    import llm_query_handler
+    import query_encoder
+    from search_handler import (parse_query_data, encode_query, rank_candidates,
+                                apply_filters, format_results, search_laptops)
+    from llm_recommendation import generate_recommendation
+    from agent import query_assistant
+
+    timer = StageTimer(quiet=quiet)
+    timer.measure("warmup", resources.warmup)
+
+    store = resources.get("product_store")
+    candidate_frame = store.frame(store.ids[:200])
+
+    for _ in range(iterations):
+        for q in queries:
+            if cold:
+                llm_query_handler.query_cache.clear()
+                query_encoder.query_embeddings.clear()
+                resources.get("recommendation_cache").clear()
+            query_data = timer.measure("understand_query", parse_query_data, q)
+            embedding = timer.measure("encode_query", encode_query, q)
+            if query_data is None or embedding is None:
+                continue
+            results = timer.measure("rank_candidates", rank_candidates, embedding, query_data, top_k)
+            timer.measure("apply_filters", apply_filters, query_data, candidate_frame)
+            if results is None:
+                continue
+            timer.measure("format_results", format_results, results)
+            timer.measure("generate_recommendation", generate_recommendation, q, results, query_data)
+
+            if cold:
+                llm_query_handler.query_cache.clear()
+            timer.measure("search_laptops_e2e", search_laptops, q, top_k)
+
+        for q in ASSISTANT_QUERIES:
+            timer.measure("query_assistant", query_assistant, q)
+
+    return timer.report()
+
+def run_concurrency_benchmark(queries, concurrency, total_requests, top_k=5, quiet=True):
+    """
+    Runs search_laptops from `concurrency` threads and reports throughput
+    and latency percentiles across all requests.
+    """
+    from search_handler import search_laptops
+
+    timer = StageTimer(quiet=False)
+    work = [queries[i % len(queries)] for i in range(total_requests)]
+
+    sink = io.StringIO() if quiet else None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink) if sink else contextlib.nullcontext():
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda q: timer.measure("search_laptops", search_laptops, q, top_k), work))
+    elapsed = time.perf_counter() - start
+
+    result = timer.report().get("search_laptops", {"count": 0})
+    result["concurrency"] = concurrency
+    result["throughput_qps"] = round(total_requests / elapsed, 3) if elapsed > 0 else 0.0
+    return result
+
+# -------------------- Results --------------------
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_results(results, output_path=None):
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output_path = os.path.join(RESULTS_DIR, f"{stamp}-{results['meta']['revision']}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return output_path
+
+def print_report(results, baseline=None):
+    base_stages = (baseline or {}).get("stages", {})
+    print(f"\n{'stage':<26} {'n':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'Δ p50':>9} {'Δ p95':>9}")
+    for name, stats in results["stages"].items():
+        if not stats.get("count"):
+            print(f"{name:<26} {'-':>5}  errors: {stats.get('errors', 0)} ({stats.get('first_error', '')[:60]})")
+            continue
+        deltas = ["", ""]
+        if name in base_stages and base_stages[name].get("count"):
+            for i, key in enumerate(["p50_ms", "p95_ms"]):
+                before = base_stages[name][key]
+                deltas[i] = f"{(stats[key] - before) / before * 100:+.1f}%" if before else ""
+        print(f"{name:<26} {stats['count']:>5} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+              f"{stats['p99_ms']:>10.2f} {deltas[0]:>9} {deltas[1]:>9}")
+
+    base_load = {r["concurrency"]: r for r in (baseline or {}).get("concurrency", [])}
+    print(f"\n{'callers':>8} {'qps':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'Δ qps':>9}")
+    for r in results["concurrency"]:
+        if not r.get("count"):
+            continue
+        before = base_load.get(r["concurrency"], {}).get("throughput_qps")
+        delta = f"{(r['throughput_qps'] - before) / before * 100:+.1f}%" if before else ""
+        print(f"{r['concurrency']:>8} {r['throughput_qps']:>10.2f} {r['p50_ms']:>10.2f} "
+              f"{r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} {delta:>9}")
+
+# -------------------- Main --------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against a local LLM stub.")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="stub latency per LLM call")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="extra uniform random stub latency")
+    parser.add_argument("--iterations", type=int, default=3, help="passes over the query corpus")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated caller counts")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--cold", action="store_true", help="clear the query cache before every query")
+    parser.add_argument("--output", help="results JSON path (default: benchmark_results/<time>-<rev>.json)")
+    parser.add_argument("--compare", help="baseline results JSON to diff against")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline log output")
+    parser.add_argument("--llm-rpm", type=float, default=0.0,
+                        help="LLM_REQUESTS_PER_MINUTE for the run (default 0: no rate limit)")
+    parser.add_argument("--llm-concurrency", type=int,
+                        help="LLM_MAX_CONCURRENCY for the run (default: the highest --concurrency)")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Per-request HTTP client logs would drown the report
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    server, base_url = start_stub_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    cache_dir = tempfile.mkdtemp(prefix="dealwizard-bench-")
+
+    # Must be set before the pipeline modules build their clients and caches
+    os.environ["Groq_Base_Url"] = base_url
+    os.environ.setdefault("Groq_Api_Key", "benchmark-stub-key")
+    os.environ["DEALWIZARD_CACHE_DB"] = os.path.join(cache_dir, "cache.db")
+    # The stub has no quota: by default the limiter neither throttles nor
+    # queues callers, so the run measures the pipeline, not the Groq limits
+    llm_concurrency = args.llm_concurrency or max(int(n) for n in args.concurrency.split(","))
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.llm_rpm)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(llm_concurrency)
+    print(f"[INFO] LLM limiter: {args.llm_rpm or 'no'} requests/minute, {llm_concurrency} in flight")
+    print(f"[INFO] LLM stub at {base_url} ({args.latency_ms} ms + up to {args.jitter_ms} ms jitter)")
+
+    try:
+        stages = run_stage_benchmark(BENCHMARK_QUERIES, args.iterations, args.top_k, args.cold, not args.verbose)
+        concurrency = [
+            run_concurrency_benchmark(BENCHMARK_QUERIES, int(n), args.requests, args.top_k, not args.verbose)
+            for n in args.concurrency.split(",")
+        ]
+        llm_calls = server.request_count
+        import telemetry
+        metrics = telemetry.metrics_snapshot()
+    finally:
+        server.shutdown()
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "stub_latency_ms": args.latency_ms,
+            "stub_jitter_ms": args.jitter_ms,
+            "iterations": args.iterations,
+            "cold": args.cold,
+            "queries": len(BENCHMARK_QUERIES),
+            "llm_calls": llm_calls,
+            "llm_requests_per_minute": args.llm_rpm,
+            "llm_max_concurrency": llm_concurrency,
+        },
+        "stages": stages,
+        "concurrency": concurrency,
+        "metrics": metrics,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print_report(results, baseline)
+    print(f"\n[INFO] {llm_calls} stubbed LLM calls")
+    print(f"[INFO] Results saved to {save_results(results, args.output)}")
+
+if __name__ == "__main__":
+    main()
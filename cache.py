@@ -0,0 +1,211 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# -------------------- Configuration --------------------
+
+CACHE_DB_PATH = os.getenv("DEALWIZARD_CACHE_DB", "db/cache.db")
+
+# -------------------- Helpers --------------------
+
+def normalize_query(text):
+    """
+    Canonical form of a user query used as a cache key: lower-cased, with
+    whitespace collapsed and trailing punctuation removed, so "Gaming laptop "
+    and "gaming laptop" share an entry.
+    """
+    if not isinstance(text, str):
+        return ""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" .!?")
+
+# -------------------- Two-Tier Cache --------------------
+
+class PersistentCache:
+    """
+    String-valued cache with an in-memory LRU in front of a SQLite table.
+
+    Entries are scoped by namespace and version: bumping the version (e.g.
+    when a prompt template changes) makes every older entry unreachable, and
+    those rows are purged the next time the cache is opened. Entries older
+    than ttl_seconds are treated as misses in both tiers.
+    """
+
+    def __init__(self, namespace, version, ttl_seconds=7 * 24 * 3600,
+                 max_entries=1024, max_disk_entries=100_000, db_path=CACHE_DB_PATH):
+        self.namespace = namespace
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.db_path = db_path
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        self._open()
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND (version != ? OR created_at < ?)",
+                (self.namespace, self.version, time.time() - self.ttl_seconds)
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            # The in-memory tier keeps working without the persistent store
+            print(f"[WARNING] Persistent cache '{self.namespace}' unavailable: {e}")
+            self._conn = None
+
+    def _expired(self, created_at):
+        return time.time() - created_at > self.ttl_seconds
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, created_at FROM cache_entries "
+                        "WHERE namespace = ? AND key = ? AND version = ?",
+                        (self.namespace, key, self.version)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"[WARNING] Cache read failed: {e}")
+                    row = None
+                if row is not None and not self._expired(row[1]):
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, version, value, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, self.version, value, created_at)
+                )
+                self._writes += 1
+                if self._writes % 256 == 0:
+                    self._prune_disk()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"[WARNING] Cache write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+                self._conn.commit()
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self):
+        self._conn.execute("""
+            DELETE FROM cache_entries
+            WHERE namespace = ? AND key IN (
+                SELECT key FROM cache_entries WHERE namespace = ?
+                ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.namespace, self.namespace, self.max_disk_entries))
+
+    def snapshot(self):
+        """
+        Returns hit/miss counters plus the current in-memory size.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            return stats
+
+# -------------------- Semantic Tier --------------------
+
+class SemanticIndex:
+    """
+    In-memory nearest-neighbour lookup from query embeddings to cache keys.
+
+    A match is only served when cosine similarity reaches the threshold and
+    both queries contain exactly the same numbers, so "under 500" never
+    reuses the answer for "under 800".
+    """
+
+    def __init__(self, threshold=0.95, max_entries=4096):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._keys = []
+        self._vectors = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _numbers(key):
+        return re.findall(r"\d+(?:\.\d+)?", key)
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype="float32").ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def add(self, key, vector):
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.append(key)
+            self._vectors.append(self._unit(vector))
+            if len(self._keys) > self.max_entries:
+                self._keys.pop(0)
+                self._vectors.pop(0)
+
+    def lookup(self, key, vector):
+        with self._lock:
+            if not self._keys:
+                return None
+            scores = np.stack(self._vectors) @ self._unit(vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            candidate = self._keys[best]
+        if self._numbers(candidate) != self._numbers(key):
+            return None
+        return candidate
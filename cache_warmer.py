@@ -0,0 +1,230 @@
+import os
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+import telemetry
+from cache import normalize_query, CACHE_DB_PATH
+from user_history import HISTORY_DB_PATH
+
+# -------------------- Configuration --------------------
+
+# Replays the most popular and most recent history queries after startup,
+# so their query-understanding, embedding and recommendation caches are hot
+# before users arrive
+CACHE_WARMUP_ENABLED = os.getenv("CACHE_WARMUP", "1") == "1"
+CACHE_WARMUP_QUERIES = int(os.getenv("CACHE_WARMUP_QUERIES", 50))
+CACHE_WARMUP_WINDOW_DAYS = int(os.getenv("CACHE_WARMUP_WINDOW_DAYS", 30))
+
+# Budgets: warming stops once either is spent. Tokens are read from the
+# llm_tokens_total counters, so live traffic running alongside counts too.
+CACHE_WARMUP_SECONDS = float(os.getenv("CACHE_WARMUP_SECONDS", 120))
+CACHE_WARMUP_TOKENS = int(os.getenv("CACHE_WARMUP_TOKENS", 50_000))
+
+# Recommendations cost the most tokens; they can be left to live traffic
+CACHE_WARMUP_RECOMMENDATIONS = os.getenv("CACHE_WARMUP_RECOMMENDATIONS", "1") == "1"
+
+WARMUP_ENDPOINTS = ("understand_query", "generate_recommendation")
+
+# The query-embedding cache, the catalog_mask lru_cache and the memory tier
+# of every PersistentCache are per process, so every process warms those
+# from the cache DB without calling the LLM. The LLM-backed pass
+# (understanding misses, recommendations) fills the shared cache DB and
+# spends tokens, so one process per deployment runs it under a lease; a new
+# run may start once this long has passed since the last one began, e.g.
+# after a redeploy or a crashed warmup.
+CACHE_WARMUP_LEASE_SECONDS = float(os.getenv("CACHE_WARMUP_LEASE_SECONDS", 600))
+
+# -------------------- Hot Queries --------------------
+
+def hot_queries(limit=CACHE_WARMUP_QUERIES, window_days=CACHE_WARMUP_WINDOW_DAYS, db_path=HISTORY_DB_PATH):
+    """
+    Up to limit distinct queries from the history window, alternating
+    between the most frequent and the most recent so both kinds get a
+    share. Variants that normalize to the same text count as one query,
+    represented by its latest wording.
+    """
+    if not Path(db_path).exists():
+        return []
+    since = (datetime.now() - timedelta(days=window_days)).isoformat()
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT query, COUNT(*) AS uses, MAX(timestamp) AS last_used
+            FROM history
+            WHERE timestamp >= ? AND query IS NOT NULL AND query != ''
+            GROUP BY query
+        """, (since,)).fetchall()
+    finally:
+        conn.close()
+
+    groups = {}
+    for query, uses, last_used in rows:
+        key = normalize_query(query)
+        if not key:
+            continue
+        group = groups.setdefault(key, {"query": query, "uses": 0, "last_used": last_used})
+        group["uses"] += uses
+        if last_used > group["last_used"]:
+            group["query"], group["last_used"] = query, last_used
+
+    by_recency = sorted(groups, key=lambda k: groups[k]["last_used"], reverse=True)
+    # Stable sort: equally frequent queries stay newest first
+    by_frequency = sorted(by_recency, key=lambda k: groups[k]["uses"], reverse=True)
+
+    chosen = []
+    for pair in zip(by_frequency, by_recency):
+        for key in pair:
+            if key not in chosen and len(chosen) < limit:
+                chosen.append(key)
+    return [groups[key]["query"] for key in chosen]
+
+# -------------------- Coordination --------------------
+
+def claim_warmup(lease_seconds=CACHE_WARMUP_LEASE_SECONDS, db_path=CACHE_DB_PATH):
+    """
+    True for the single process (across app and service workers sharing
+    the cache DB) that should warm the caches now. The claim is one atomic
+    upsert, so workers starting together cannot both win.
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10)
+    try:
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_warmup (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT NOT NULL,
+                    started_at REAL NOT NULL
+                )
+            """)
+            now = time.time()
+            claimed = conn.execute("""
+                INSERT INTO cache_warmup (id, owner, started_at) VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET owner = excluded.owner, started_at = excluded.started_at
+                WHERE cache_warmup.started_at < ?
+            """, (str(os.getpid()), now, now - lease_seconds)).rowcount
+        return claimed == 1
+    finally:
+        conn.close()
+
+# -------------------- Warmup --------------------
+
+def _tokens_spent():
+    return sum(counter["value"] for counter in telemetry.metrics_snapshot()["counters"]
+               if counter["name"] == "llm_tokens_total" and counter["labels"].get("kind") == "total"
+               and counter["labels"].get("endpoint") in WARMUP_ENDPOINTS)
+
+def warm_query(user_query, recommend=CACHE_WARMUP_RECOMMENDATIONS, use_llm=True):
+    """
+    Runs one query through the live pipeline so every cache it touches is
+    filled with exactly the entries a user's request would look up. With
+    use_llm=False only what the caches can answer is used: the query is
+    encoded and searched, and cached understanding and recommendations are
+    loaded into this process's memory tiers.
+    """
+    from search_handler import parse_query_data, find_laptops
+    from llm_recommendation import generate_recommendation, cached_recommendation, FAILURE_MESSAGE
+
+    if not use_llm:
+        results, query_data = find_laptops(user_query, use_llm=False)
+        if recommend and not results.empty:
+            cached_recommendation(user_query, results, query_data)
+        return
+
+    # Parsed first and in full, so find_laptops reads it from the cache
+    # instead of racing its understanding deadline
+    parse_query_data(user_query)
+    results, query_data = find_laptops(user_query)
+    if recommend and not results.empty:
+        if generate_recommendation(user_query, results, query_data) == FAILURE_MESSAGE:
+            raise RuntimeError("recommendation failed")
+
+def _warm_pass(queries, report, tier, start, time_budget, tokens_before=None, token_budget=None):
+    for user_query in queries:
+        if time.perf_counter() - start >= time_budget:
+            report["stopped_by"] = "time"
+            return
+        if token_budget is not None and _tokens_spent() - tokens_before >= token_budget:
+            report["stopped_by"] = "tokens"
+            return
+        try:
+            warm_query(user_query, use_llm=tier == "llm")
+            report[f"{tier}_warmed"] += 1
+            telemetry.increment("cache_warmup_queries_total", tier=tier, result="ok")
+        except Exception as e:
+            report["failed"] += 1
+            telemetry.increment("cache_warmup_queries_total", tier=tier, result="error")
+            print(f"[WARNING] Cache warmup ({tier}) failed for '{user_query}': {e}")
+
+def warm_caches(limit=CACHE_WARMUP_QUERIES, time_budget=CACHE_WARMUP_SECONDS, token_budget=CACHE_WARMUP_TOKENS,
+                db_path=HISTORY_DB_PATH, force=False):
+    """
+    Warms the caches for the hot history queries, one at a time (so warmup
+    never takes more than one LLM slot), in two passes sharing the time
+    budget. The local pass runs in every process and makes no LLM calls.
+    The LLM pass follows only in the process that claims the warmup (see
+    claim_warmup), or when forced, so the token budget holds for the whole
+    deployment. Returns a report dict, or None when warmup is disabled.
+    """
+    if not force and not CACHE_WARMUP_ENABLED:
+        return None
+
+    start = time.perf_counter()
+    try:
+        queries = hot_queries(limit, db_path=db_path)
+    except sqlite3.Error as e:
+        print(f"[WARNING] Cache warmup skipped, history unavailable: {e}")
+        return None
+
+    report = {"hot_queries": len(queries), "local_warmed": 0, "llm_warmed": 0, "failed": 0,
+              "llm_pass": False, "stopped_by": None}
+    with telemetry.request("warm_caches", queries=len(queries)):
+        _warm_pass(queries, report, "local", start, time_budget)
+
+        claimed = force
+        if not claimed and queries and report["stopped_by"] is None:
+            try:
+                claimed = claim_warmup()
+            except sqlite3.Error as e:
+                print(f"[WARNING] LLM cache warmup skipped, could not claim it: {e}")
+            else:
+                if not claimed:
+                    print(f"[INFO] LLM cache warmup skipped in process {os.getpid()}; another process is running it")
+
+        tokens_before = _tokens_spent()
+        if claimed and report["stopped_by"] is None:
+            report["llm_pass"] = True
+            _warm_pass(queries, report, "llm", start, time_budget, tokens_before, token_budget)
+
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    report["tokens"] = _tokens_spent() - tokens_before
+    stopped = f"; stopped by {report['stopped_by']} budget" if report["stopped_by"] else ""
+    llm = f", {report['llm_warmed']} through the LLM" if report["llm_pass"] else ""
+    print(f"[INFO] Cache warmup: warmed {report['local_warmed']} of {report['hot_queries']} hot queries locally{llm} "
+          f"in {report['seconds']}s using {report['tokens']} LLM tokens{stopped}")
+    return report
+
+def warm_caches_in_background(**kwargs):
+    """
+    Starts warm_caches in a daemon thread and returns the thread.
+    """
+    thread = threading.Thread(target=warm_caches, kwargs=kwargs, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the query, embedding and recommendation caches from history.")
+    parser.add_argument("--queries", type=int, default=CACHE_WARMUP_QUERIES, help="hot queries to warm")
+    parser.add_argument("--seconds", type=float, default=CACHE_WARMUP_SECONDS, help="time budget")
+    parser.add_argument("--tokens", type=int, default=CACHE_WARMUP_TOKENS, help="LLM token budget")
+    parser.add_argument("--list", action="store_true", help="only print the hot queries")
+    args = parser.parse_args()
+
+    if args.list:
+        for q in hot_queries(args.queries):
+            print(q)
+    else:
+        print(warm_caches(args.queries, args.seconds, args.tokens, force=True))
@@ -1,54 +1,140 @@
 import os
+import sys
+import json
+import time
 import sqlite3
-import pickle
+import hashlib
+import argparse
+import numpy as np
 import pandas as pd
 import faiss
 from sentence_transformers import SentenceTransformer
+from product_store import ProductStoreWriter, STORE_PATH
+from lexical_index import LexicalIndexWriter, LEXICAL_INDEX_PATH
+from renderings import TEMPLATES, RENDER_VERSION, RENDER_STORE_PATH, render_template, render_frame
 
 # Configs
 DB_PATH = 'db/laptops.db'
 TABLE_NAME = 'laptops'
 
 INDEX_SAVE_PATH = 'embeddings/faiss.index'
-DF_SAVE_PATH = 'embeddings/laptop_dataframe.pkl'
-ID_MAP_SAVE_PATH = 'embeddings/id_map.pkl'
+MANIFEST_SAVE_PATH = 'embeddings/manifest.json'
+HASHES_SAVE_PATH = 'embeddings/content_hashes.npz'
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
 
+CHUNK_SIZE = 5000
+ENCODE_BATCH_SIZE = 64
+
+# Bump when the index layout changes so existing indexes are rebuilt
+MANIFEST_FORMAT = 2
+
+# Index specs: "flat-l2" is the original exact L2 index; the others use inner
+# product on L2-normalized vectors, i.e. cosine similarity, which is what
+# MiniLM embeddings are trained for. {nlist}, {m} and {nbits} are sized from
+# the catalog row count when the index is built.
+DEFAULT_INDEX_SPEC = 'flat-ip'
+INDEX_SPECS = {
+    'flat-l2': {'factory': 'IDMap2,Flat', 'metric': 'l2', 'normalize': False, 'removable': True},
+    'flat-ip': {'factory': 'IDMap2,Flat', 'metric': 'ip', 'normalize': True, 'removable': True},
+    'ivf': {'factory': 'IVF{nlist},Flat', 'metric': 'ip', 'normalize': True, 'removable': True,
+            'search_params': {'nprobe': 16}},
+    'hnsw': {'factory': 'IDMap2,HNSW32', 'metric': 'ip', 'normalize': True, 'removable': False,
+             'search_params': {'efSearch': 64}},
+    'ivfpq': {'factory': 'IVF{nlist},PQ{m}x{nbits}', 'metric': 'ip', 'normalize': True, 'removable': True,
+              'search_params': {'nprobe': 16}},
+}
+
+# Vectors used to train IVF/PQ indexes before anything is added, drawn
+# uniformly from the whole catalog
+TRAIN_SAMPLE_SIZE = 50_000
+TRAIN_SAMPLE_SEED = 0
+
+def catalog_query(conn):
+    """
+    SELECT for the whole catalog with a product_id column: the explicit
+    primary key of databases built by data_loader, or the rowid of older
+    ones (the two are the same value).
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+    if 'product_id' in columns:
+        return f"SELECT * FROM {TABLE_NAME} ORDER BY product_id"
+    return f"SELECT rowid AS product_id, * FROM {TABLE_NAME} ORDER BY rowid"
+
 def fetch_laptop_data():
+    """
+    Loads the catalog indexed by product_id (the SQLite rowid), which is
+    also the label each vector carries in the FAISS index.
+    """
     try:
         conn = sqlite3.connect(DB_PATH)
-        df = pd.read_sql_query(f"SELECT * FROM {TABLE_NAME}", conn)
+        df = pd.read_sql_query(catalog_query(conn), conn, index_col='product_id')
         conn.close()
         return df
     except sqlite3.Error as e:
         print(f"[ERROR] Failed to fetch laptop data: {e}")
         return pd.DataFrame()
 
-def create_embedding_text(row):
+def iter_laptop_chunks(chunk_size=CHUNK_SIZE):
+    """
+    Streams the catalog from SQLite in chunks of chunk_size rows, indexed by
+    product_id, so memory stays bounded regardless of catalog size.
+    """
+    conn = sqlite3.connect(DB_PATH)
     try:
-        return (
-            f"{row['Company']} {row['Product']} {row['TypeName']} {row['Inches']} inch, "
-            f"{row['Ram']} RAM, {row['OS']}, {row['Weight']}kg, {row['Screen']} "
-            f"{row['ScreenW']}x{row['ScreenH']}, Touchscreen: {row['Touchscreen']}, "
-            f"IPS: {row['IPSpanel']}, Retina: {row['RetinaDisplay']}, "
-            f"{row['CPU_company']} {row['CPU_model']} @ {row['CPU_freq']}GHz, "
-            f"{row['PrimaryStorage']} {row['PrimaryStorageType']}, "
-            f"{row['SecondaryStorage']} {row['SecondaryStorageType']}, "
-            f"{row['GPU_company']} {row['GPU_model']}, Price: {row['Price_euros']} euros"
+        yield from pd.read_sql_query(
+            catalog_query(conn),
+            conn, index_col='product_id', chunksize=chunk_size
         )
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to fetch laptop data: {e}")
+    finally:
+        conn.close()
+
+def create_embedding_texts(df):
+    """
+    Renders the embedding text for every row at once with vectorized string
+    concatenation (same format the per-row renderer produced).
+    """
+    try:
+        return render_template(TEMPLATES['embedding'], df)
     except KeyError as e:
         print(f"[WARNING] Missing field while creating embedding text: {e}")
-        return ""
+        return pd.Series("", index=df.index)
 
-def generate_embeddings(texts):
+def generate_embeddings(texts, model=None, batch_size=ENCODE_BATCH_SIZE, pool=None):
+    """
+    Encodes texts in batches of batch_size, across the worker processes of
+    pool when one is given.
+    """
     try:
-        model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        embeddings = model.encode(texts, convert_to_numpy=True).astype('float32')
-        return embeddings, model
+        model = model or SentenceTransformer(EMBEDDING_MODEL_NAME)
+        if pool is not None:
+            embeddings = model.encode_multi_process(texts, pool, batch_size=batch_size)
+        else:
+            embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        return embeddings.astype('float32'), model
     except Exception as e:
         print(f"[ERROR] Failed to generate embeddings: {e}")
         return None, None
 
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (None where unsupported).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def format_progress(rows, encoded, elapsed):
+    rss = peak_rss_mb()
+    rss_text = f"{rss:.0f} MB" if rss is not None else "n/a"
+    rate = rows / elapsed if elapsed > 0 else 0.0
+    return f"{rows} rows ({encoded} encoded) in {elapsed:.1f}s - {rate:.0f} rows/sec, peak RSS {rss_text}"
+
 def save_index(index):
     try:
         os.makedirs(os.path.dirname(INDEX_SAVE_PATH), exist_ok=True)
@@ -56,56 +142,388 @@ def save_index(index):
     except Exception as e:
         print(f"[ERROR] Failed to save FAISS index: {e}")
 
-def save_dataframe(df):
+def content_hash(text):
+    return hashlib.sha1(f"{EMBEDDING_MODEL_NAME}\x00{text}".encode('utf-8')).hexdigest()
+
+def count_rows():
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        count = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+        conn.close()
+        return count
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to count laptop rows: {e}")
+        return 0
+
+# -------------------- Index Specs --------------------
+
+def resolve_index_spec(spec, total_rows):
+    """
+    Expands an index spec name into its FAISS factory string and settings,
+    sizing IVF lists and PQ codes for the given number of rows.
+    """
+    if spec not in INDEX_SPECS:
+        raise ValueError(f"Unknown index spec '{spec}'. Choose from: {', '.join(INDEX_SPECS)}")
+    resolved = dict(INDEX_SPECS[spec], spec=spec)
+
+    # FAISS wants at least ~39 training points per centroid
+    nlist = int(max(1, min(4 * np.sqrt(max(total_rows, 1)), total_rows // 39)))
+    nbits = int(min(8, max(4, np.floor(np.log2(max(total_rows // 39, 16))))))
+    resolved['factory'] = resolved['factory'].format(nlist=nlist, m=48, nbits=nbits)
+    resolved['search_params'] = dict(resolved.get('search_params', {}))
+    if 'nprobe' in resolved['search_params']:
+        resolved['search_params']['nprobe'] = min(resolved['search_params']['nprobe'], nlist)
+    return resolved
+
+def create_index(resolved, dimension):
+    metric = faiss.METRIC_INNER_PRODUCT if resolved['metric'] == 'ip' else faiss.METRIC_L2
+    index = faiss.index_factory(dimension, resolved['factory'], metric)
+    apply_search_params(index, resolved['search_params'])
+    return index
+
+def apply_search_params(index, search_params):
+    for name, value in search_params.items():
+        faiss.ParameterSpace().set_index_parameter(index, name, value)
+
+def prepare_vectors(embeddings, resolved):
+    if resolved['normalize']:
+        faiss.normalize_L2(embeddings)
+    return embeddings
+
+def sample_positions(total_rows, sample_size=TRAIN_SAMPLE_SIZE, seed=TRAIN_SAMPLE_SEED):
+    """
+    Sorted row positions of a uniform random sample of the catalog.
+    """
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(total_rows, size=min(sample_size, total_rows), replace=False))
+
+def training_vectors(resolved, total_rows, model, chunk_size=CHUNK_SIZE, batch_size=ENCODE_BATCH_SIZE, pool=None):
+    """
+    Encodes a random TRAIN_SAMPLE_SIZE-row sample in a first pass over the
+    catalog, so IVF/PQ centroids reflect the whole catalog rather than its
+    first rows (which follow whatever order the catalog is sorted in).
+    """
+    positions = sample_positions(total_rows)
+    texts, offset = [], 0
+    for chunk in iter_laptop_chunks(chunk_size):
+        picked = positions[(positions >= offset) & (positions < offset + len(chunk))] - offset
+        texts.extend(create_embedding_texts(chunk.iloc[picked]).tolist())
+        offset += len(chunk)
+    embeddings, _ = generate_embeddings(texts, model, batch_size, pool)
+    if embeddings is None:
+        raise RuntimeError("Embedding generation failed for the training sample")
+    return prepare_vectors(embeddings, resolved)
+
+# -------------------- Manifest --------------------
+
+def load_manifest():
+    try:
+        with open(MANIFEST_SAVE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[WARNING] Ignoring unreadable manifest: {e}")
+        return None
+
+def load_hashes():
     try:
-        os.makedirs(os.path.dirname(DF_SAVE_PATH), exist_ok=True)
-        df.to_pickle(DF_SAVE_PATH)
+        with np.load(HASHES_SAVE_PATH, allow_pickle=False) as data:
+            return dict(zip(data['ids'].tolist(), data['digests'].astype(str).tolist()))
+    except (OSError, KeyError, ValueError) as e:
+        print(f"[WARNING] Could not read content hashes, rebuilding: {e}")
+        return None
+
+def save_manifest(index, hashes, resolved):
+    """
+    Writes the small JSON manifest the search side reads (spec, metric,
+    normalization, search parameters) and the per-product content hashes
+    used for incremental refreshes as compact NumPy arrays.
+    """
+    try:
+        os.makedirs(os.path.dirname(MANIFEST_SAVE_PATH), exist_ok=True)
+        ids = np.fromiter(hashes.keys(), dtype='int64', count=len(hashes))
+        digests = np.array(list(hashes.values()), dtype='S40')
+        order = np.argsort(ids)
+        ids, digests = ids[order], digests[order]
+        with open(HASHES_SAVE_PATH + '.tmp', 'wb') as f:
+            np.savez(f, ids=ids, digests=digests)
+        os.replace(HASHES_SAVE_PATH + '.tmp', HASHES_SAVE_PATH)
+
+        manifest = {
+            "format": MANIFEST_FORMAT,
+            "model": EMBEDDING_MODEL_NAME,
+            "dimension": index.d,
+            "count": int(index.ntotal),
+            # Changes only when some product's content changes; lets caches
+            # derived from the catalog invalidate themselves
+            "catalog_hash": hashlib.sha1(ids.tobytes() + digests.tobytes()).hexdigest(),
+            # Templates the render store was built with
+            "render_version": RENDER_VERSION,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "spec": resolved['spec'],
+            "factory": resolved['factory'],
+            "metric": resolved['metric'],
+            "normalize": resolved['normalize'],
+            "search_params": resolved['search_params'],
+        }
+        with open(MANIFEST_SAVE_PATH + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(MANIFEST_SAVE_PATH + '.tmp', MANIFEST_SAVE_PATH)
     except Exception as e:
-        print(f"[ERROR] Failed to save DataFrame: {e}")
+        print(f"[ERROR] Failed to save manifest: {e}")
+
+def load_incremental_index(manifest, spec):
+    """
+    Returns (index, resolved spec, previous hashes) for an existing index
+    that was built with the current model, layout and spec and supports
+    in-place removal, otherwise None (forcing a full rebuild).
+    """
+    if not manifest or manifest.get("format") != MANIFEST_FORMAT or manifest.get("model") != EMBEDDING_MODEL_NAME:
+        return None
+    if manifest.get("spec") != spec:
+        print(f"[INFO] Index spec changed ({manifest.get('spec')} -> {spec}), rebuilding.")
+        return None
+    if not INDEX_SPECS[spec]['removable']:
+        print(f"[INFO] '{spec}' indexes do not support in-place removal, rebuilding.")
+        return None
 
-def save_id_map(df):
+    hashes = load_hashes()
+    if hashes is None:
+        return None
     try:
-        os.makedirs(os.path.dirname(ID_MAP_SAVE_PATH), exist_ok=True)
-        id_map = {i: int(df.iloc[i].name) for i in range(len(df))}
-        with open(ID_MAP_SAVE_PATH, 'wb') as f:
-            pickle.dump(id_map, f)
+        index = faiss.read_index(INDEX_SAVE_PATH)
     except Exception as e:
-        print(f"[ERROR] Failed to save ID map: {e}")
+        print(f"[WARNING] Could not read existing index, rebuilding: {e}")
+        return None
+    if index.ntotal != len(hashes):
+        return None
 
-def build_faiss_index():
-    print("[INFO] Fetching laptop data...")
-    df = fetch_laptop_data()
-    if df.empty:
-        print("[ERROR] No data fetched. Exiting.")
-        return
+    resolved = dict(INDEX_SPECS[spec], spec=spec, factory=manifest["factory"],
+                    search_params=manifest.get("search_params", {}))
+    apply_search_params(index, resolved['search_params'])
+    return index, resolved, hashes
 
-    print("[INFO] Creating text for embeddings...")
-    texts = df.apply(create_embedding_text, axis=1).tolist()
+# -------------------- Build --------------------
 
-    print("[INFO] Generating embeddings...")
-    embeddings, model = generate_embeddings(texts)
-    if embeddings is None:
-        print("[ERROR] Embedding generation failed. Exiting.")
-        return
+def build_faiss_index(full_rebuild=False, chunk_size=CHUNK_SIZE, batch_size=ENCODE_BATCH_SIZE, workers=1,
+                      spec=DEFAULT_INDEX_SPEC):
+    """
+    Builds or refreshes the FAISS index in one streaming pass: rows are read
+    from SQLite chunk by chunk, rendered and hashed vectorially, and only
+    new or changed products are encoded and appended to the ID-mapped index
+    before the next chunk is read. Vectors of changed or removed products
+    are dropped from an existing index in place. Trainable specs (IVF, PQ)
+    buffer vectors until a training sample is available.
+    """
+    existing = None if full_rebuild else load_incremental_index(load_manifest(), spec)
+    if existing is None:
+        print(f"[INFO] Performing full rebuild with index spec '{spec}'...")
+        total_rows = count_rows()
+        index, resolved, previous = None, resolve_index_spec(spec, total_rows), {}
+    else:
+        index, resolved, previous = existing
+        print(f"[INFO] Incremental update against {len(previous)} indexed products...")
 
-    print(f"[INFO] Generated {embeddings.shape[0]} embeddings of dim {embeddings.shape[1]}")
+    hashes = {}
+    store_writer = ProductStoreWriter(STORE_PATH)
+    lexical_writer = LexicalIndexWriter(LEXICAL_INDEX_PATH)
+    render_writer = ProductStoreWriter(RENDER_STORE_PATH)
+    pending = []
+    model = pool = None
+    rows = encoded = stale_count = 0
+    start = time.perf_counter()
+
+    def flush_pending(force=False):
+        # An index still untrained here covers a catalog no larger than one
+        # training sample: every vector is buffered and it trains on all of them
+        if not pending:
+            return
+        if not index.is_trained and not force:
+            return
+        vectors = np.concatenate([v for v, _ in pending])
+        ids = np.concatenate([i for _, i in pending])
+        if not index.is_trained:
+            print(f"[INFO] Training '{resolved['spec']}' index on {len(vectors)} vectors...")
+            index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        pending.clear()
 
-    print("[INFO] Building FAISS index...")
     try:
-        index = faiss.IndexFlatL2(embeddings.shape[1])
-        index.add(embeddings)
+        for chunk in iter_laptop_chunks(chunk_size):
+            try:
+                rendered = render_frame(chunk)
+            except KeyError as e:
+                print(f"[ERROR] Missing field while rendering products: {e}")
+                return
+            texts = rendered['embedding']
+            chunk_hashes = [content_hash(text) for text in texts]
+            ids = chunk.index.to_numpy(dtype='int64')
+            changed = np.array([previous.get(pid) != h for pid, h in zip(ids.tolist(), chunk_hashes)], dtype=bool)
+            hashes.update(zip(ids.tolist(), chunk_hashes))
+
+            stale = [pid for pid in ids[changed].tolist() if pid in previous]
+            if stale:
+                index.remove_ids(np.array(stale, dtype='int64'))
+                stale_count += len(stale)
+
+            if changed.any():
+                if model is None:
+                    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+                    if workers > 1:
+                        pool = model.start_multi_process_pool(target_devices=['cpu'] * workers)
+                embeddings, _ = generate_embeddings(texts[changed].tolist(), model, batch_size, pool)
+                if embeddings is None:
+                    print("[ERROR] Embedding generation failed. Exiting.")
+                    return
+                if index is None:
+                    index = create_index(resolved, embeddings.shape[1])
+                    if not index.is_trained and total_rows > TRAIN_SAMPLE_SIZE:
+                        sample = training_vectors(resolved, total_rows, model, chunk_size, batch_size, pool)
+                        print(f"[INFO] Training '{resolved['spec']}' index on {len(sample)} sampled vectors...")
+                        index.train(sample)
+                pending.append((prepare_vectors(embeddings, resolved), ids[changed]))
+                flush_pending()
+                encoded += int(changed.sum())
+
+            store_writer.append(chunk)
+            lexical_writer.append(chunk)
+            render_writer.append(rendered)
+            rows += len(chunk)
+            print(f"[INFO] Processed {format_progress(rows, encoded, time.perf_counter() - start)}")
+
+        flush_pending(force=True)
     except Exception as e:
         print(f"[ERROR] Failed to build FAISS index: {e}")
         return
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+    if rows == 0:
+        print("[ERROR] No data fetched. Exiting.")
+        return
+
+    removed = [pid for pid in previous if pid not in hashes]
+    if removed:
+        index.remove_ids(np.array(removed, dtype='int64'))
+        stale_count += len(removed)
+
+    print(f"[INFO] Indexed {format_progress(rows, encoded, time.perf_counter() - start)}; "
+          f"{stale_count} stale vectors removed")
 
     print("[INFO] Saving index and metadata...")
+    try:
+        store_writer.close()
+        lexical_writer.close()
+        render_writer.close()
+    except OSError as e:
+        print(f"[ERROR] Failed to save product store, lexical index or renderings: {e}")
+        return
     save_index(index)
-    save_dataframe(df)
-    save_id_map(df)
+    save_manifest(index, hashes, resolved)
+
+    print(f"[INFO] FAISS index ({resolved['factory']}) saved at {INDEX_SAVE_PATH} ({index.ntotal} vectors)")
+    print(f"[INFO] Product store saved at {STORE_PATH}")
+    print(f"[INFO] Lexical index saved at {LEXICAL_INDEX_PATH}")
+    print(f"[INFO] Product renderings saved at {RENDER_STORE_PATH}")
+    print(f"[INFO] Manifest saved at {MANIFEST_SAVE_PATH}")
+
+# -------------------- Benchmark --------------------
+
+def collect_embeddings(chunk_size=CHUNK_SIZE, batch_size=ENCODE_BATCH_SIZE):
+    """
+    Encodes the whole catalog (without touching the saved index) and
+    returns (L2-normalized vectors, product ids).
+    """
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    vectors, ids = [], []
+    for chunk in iter_laptop_chunks(chunk_size):
+        embeddings, _ = generate_embeddings(create_embedding_texts(chunk).tolist(), model, batch_size)
+        if embeddings is None:
+            raise RuntimeError("Embedding generation failed")
+        vectors.append(embeddings)
+        ids.append(chunk.index.to_numpy(dtype='int64'))
+    vectors = np.concatenate(vectors)
+    faiss.normalize_L2(vectors)
+    return vectors, np.concatenate(ids)
+
+def benchmark_indexes(specs, k=10, n_queries=200, vectors=None, ids=None, seed=0):
+    """
+    Builds each index spec over the catalog embeddings and reports
+    recall@k against the exact flat inner-product baseline, per-query
+    latency, build time and serialized index size.
 
-    print(f"[INFO] FAISS index saved at {INDEX_SAVE_PATH}")
-    print(f"[INFO] DataFrame saved at {DF_SAVE_PATH}")
-    print(f"[INFO] ID map saved at {ID_MAP_SAVE_PATH}")
+    Queries are catalog vectors with small Gaussian noise added, so they
+    are near (but not identical to) real products.
+    """
+    if vectors is None:
+        print("[INFO] Encoding catalog for benchmark...")
+        vectors, ids = collect_embeddings()
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[sample] + rng.normal(scale=0.02, size=(len(sample), vectors.shape[1])).astype('float32')
+    faiss.normalize_L2(queries)
+
+    baseline = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+    baseline.add_with_ids(vectors, ids)
+    _, truth = baseline.search(queries, k)
+
+    results = []
+    for spec in specs:
+        resolved = resolve_index_spec(spec, len(vectors))
+        # Vectors are already unit length, so flat-l2 ranks like the baseline
+        data = vectors.copy()
+        build_start = time.perf_counter()
+        index = create_index(resolved, vectors.shape[1])
+        if not index.is_trained:
+            index.train(data[sample_positions(len(data))])
+        index.add_with_ids(data, ids)
+        build_seconds = time.perf_counter() - build_start
+
+        latencies = []
+        found = np.empty((len(queries), k), dtype='int64')
+        for row, query in enumerate(queries):
+            query_start = time.perf_counter()
+            _, labels = index.search(query.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - query_start) * 1000)
+            found[row] = labels[0]
+
+        recall = np.mean([len(set(found[r]) & set(truth[r])) / k for r in range(len(queries))])
+        results.append({
+            "spec": spec,
+            "factory": resolved['factory'],
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+            "build_s": round(build_seconds, 3),
+            "size_mb": round(len(faiss.serialize_index(index)) / (1024 * 1024), 3),
+        })
+
+    print(f"\n{'spec':<10} {'factory':<22} {'recall@' + str(k):>10} {'p50 ms':>9} {'p95 ms':>9} {'build s':>9} {'size MB':>9}")
+    for r in results:
+        print(f"{r['spec']:<10} {r['factory']:<22} {r[f'recall@{k}']:>10.4f} {r['p50_ms']:>9.4f} "
+              f"{r['p95_ms']:>9.4f} {r['build_s']:>9.3f} {r['size_mb']:>9.3f}")
+    return results
 
 if __name__ == "__main__":
-    build_faiss_index()
+    parser = argparse.ArgumentParser(description="Build or refresh the laptop FAISS index.")
+    parser.add_argument("--full", action="store_true", help="re-encode every product instead of only changed ones")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows read from SQLite per chunk")
+    parser.add_argument("--batch-size", type=int, default=ENCODE_BATCH_SIZE, help="texts per encoder batch")
+    parser.add_argument("--workers", type=int, default=1, help="CPU encoder processes (1 = in-process)")
+    parser.add_argument("--index-spec", default=DEFAULT_INDEX_SPEC, choices=sorted(INDEX_SPECS),
+                        help="ANN index type to build")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare index specs (recall@k vs flat, latency, size) instead of building")
+    parser.add_argument("--specs", default=",".join(INDEX_SPECS), help="comma-separated specs to benchmark")
+    parser.add_argument("--k", type=int, default=10, help="neighbours per benchmark query")
+    parser.add_argument("--queries", type=int, default=200, help="number of benchmark queries")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_indexes(args.specs.split(","), k=args.k, n_queries=args.queries)
+    else:
+        build_faiss_index(full_rebuild=args.full, chunk_size=args.chunk_size,
+                          batch_size=args.batch_size, workers=args.workers, spec=args.index_spec)
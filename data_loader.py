@@ -1,48 +1,484 @@
 import pandas as pd
+import numpy as np
 import sqlite3
+import time
 import os
+import re
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def csv_to_sqlite(csv_path=r'C:\Users\krish\OneDrive\Documents\Laptop_recommender\laptop_prices.csv.txt', db_path='db/laptops.db'):
+TABLE_NAME = 'laptops'
+FTS_TABLE_NAME = 'laptops_fts'
+
+# Source tag of the primary catalog loaded by csv_to_sqlite
+PRIMARY_SOURCE = 'laptop_prices'
+
+# Explicit column types; product_id is the stable product ID (taken from
+# the product_keys table unless the CSV provides one) and doubles as the
+# SQLite rowid.
+# source, currency and price_local record where a row came from and its
+# price before conversion to euros.
+COLUMN_TYPES = {
+    'product_id': 'INTEGER PRIMARY KEY',
+    'source': 'TEXT NOT NULL',
+    'currency': 'TEXT NOT NULL',
+    'price_local': 'REAL',
+    'Company': 'TEXT NOT NULL',
+    'Product': 'TEXT NOT NULL',
+    'TypeName': 'TEXT',
+    'Inches': 'REAL',
+    'Ram': 'INTEGER',
+    'OS': 'TEXT',
+    'Weight': 'REAL',
+    'Price_euros': 'REAL NOT NULL',
+    'Screen': 'TEXT',
+    'ScreenW': 'INTEGER',
+    'ScreenH': 'INTEGER',
+    'Touchscreen': 'TEXT',
+    'IPSpanel': 'TEXT',
+    'RetinaDisplay': 'TEXT',
+    'CPU_company': 'TEXT',
+    'CPU_freq': 'REAL',
+    'CPU_model': 'TEXT',
+    'PrimaryStorage': 'INTEGER',
+    'SecondaryStorage': 'INTEGER',
+    'PrimaryStorageType': 'TEXT',
+    'SecondaryStorageType': 'TEXT',
+    'GPU_company': 'TEXT',
+    'GPU_model': 'TEXT',
+}
+
+# Columns the loader fills in; every other column must come from the source
+METADATA_COLUMNS = ['product_id', 'source', 'currency', 'price_local']
+
+# Rows missing any of these are dropped from scraped feeds
+REQUIRED_COLUMNS = ['Company', 'Product', 'Price_euros']
+
+INDEXED_COLUMNS = ['Price_euros', 'Company', 'Ram', 'Weight', 'GPU_model', 'source']
+
+# Free-text columns searchable through the FTS5 table
+FTS_COLUMNS = ['Product', 'CPU_model', 'GPU_model']
+
+# A product keeps its ID across re-imports while these columns are unchanged
+# (its price may change); see assign_product_ids
+KEYS_TABLE_NAME = 'product_keys'
+KEY_COLUMNS = [c for c in COLUMN_TYPES if c not in METADATA_COLUMNS and c != 'Price_euros']
+
+def prepare_frame(df, source=PRIMARY_SOURCE, currency='EUR'):
+    """
+    Fills the metadata columns when missing and coerces every column to its
+    declared type, so SQLite stores real numbers rather than whatever the
+    CSV held.
+    """
+    missing = [c for c in COLUMN_TYPES if c not in METADATA_COLUMNS and c not in df.columns]
+    if missing:
+        raise ValueError(f"[ERROR] CSV is missing expected columns: {missing}")
+
+    df = df[[c for c in COLUMN_TYPES if c in df.columns]].copy()
+    if 'product_id' not in df.columns:
+        # Assigned afterwards by assign_product_ids
+        df.insert(0, 'product_id', pd.NA)
+    if 'source' not in df.columns:
+        df['source'] = source
+    if 'currency' not in df.columns:
+        df['currency'] = currency
+    if 'price_local' not in df.columns:
+        df['price_local'] = df['Price_euros']
+    df = df[list(COLUMN_TYPES)]
+
+    for column, column_type in COLUMN_TYPES.items():
+        if column_type.startswith('INTEGER'):
+            df[column] = pd.to_numeric(df[column], errors='coerce').round().astype('Int64')
+        elif column_type.startswith('REAL'):
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+        else:
+            df[column] = df[column].astype('string').str.strip()
+    return df
+
+def create_schema(conn):
+    columns = ",\n    ".join(f'"{name}" {column_type}' for name, column_type in COLUMN_TYPES.items())
+    conn.execute(f"CREATE TABLE {TABLE_NAME} (\n    {columns}\n)")
+    for column in INDEXED_COLUMNS:
+        conn.execute(f'CREATE INDEX idx_{TABLE_NAME}_{column.lower()} ON {TABLE_NAME} ("{column}")')
+    create_keys_table(conn)
+
+def create_keys_table(conn):
+    # Every key ever imported stays here, so IDs of removed products are not reused
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {KEYS_TABLE_NAME} (
+            source TEXT NOT NULL,
+            key TEXT NOT NULL,
+            product_id INTEGER NOT NULL UNIQUE,
+            PRIMARY KEY (source, key)
+        )
+    """)
+
+# -------------------- Product IDs --------------------
+
+def product_keys(df, seen=None):
+    """
+    Stable identity of every row: a hash of its KEY_COLUMNS (as typed by
+    prepare_frame) plus its ordinal among rows sharing that hash, so exact
+    duplicates stay distinct. seen carries the ordinals across the chunks
+    of one import.
+    """
+    values = df[KEY_COLUMNS].astype(object)
+    values = values.where(values.notna(), '').astype(str)
+    text = values[KEY_COLUMNS[0]].str.cat([values[c] for c in KEY_COLUMNS[1:]], sep='\x1f')
+    digest = pd.Series([hashlib.sha1(t.encode('utf-8')).hexdigest() for t in text], index=df.index)
+    ordinal = digest.groupby(digest).cumcount()
+    if seen is not None:
+        ordinal += digest.map(seen).fillna(0).astype('int64')
+        for d, count in digest.value_counts().items():
+            seen[d] = seen.get(d, 0) + count
+    return digest + ':' + ordinal.astype(str)
+
+def assign_product_ids(conn, df, source, first_id=1, seen=None):
+    """
+    Fills df.product_id from the product_keys table. A product imported
+    before gets its earlier ID back, so inserting or deleting CSV rows does
+    not shift the IDs the index, caches and history refer to; new products
+    get IDs after the largest one the source has used (from first_id).
+    """
+    keys = product_keys(df, seen)
+    known = dict(conn.execute(f"SELECT key, product_id FROM {KEYS_TABLE_NAME} WHERE source = ?", (source,)))
+    ids = keys.map(known)
+    new = ids.isna().to_numpy()
+    if new.any():
+        last = conn.execute(f"SELECT MAX(product_id) FROM {KEYS_TABLE_NAME} WHERE source = ?", (source,)).fetchone()[0]
+        start = max(last or 0, first_id - 1) + 1
+        ids[new] = np.arange(start, start + new.sum())
+        conn.executemany(f"INSERT INTO {KEYS_TABLE_NAME} (source, key, product_id) VALUES (?, ?, ?)",
+                         zip([source] * int(new.sum()), keys[new], ids[new].astype('int64').tolist()))
+    df['product_id'] = ids.astype('int64').to_numpy()
+    return df
+
+def copy_product_keys(conn, old_db_path):
+    """
+    Carries the product_keys of the database being replaced into conn.
+    """
+    if not os.path.exists(old_db_path):
+        return
+    conn.execute("ATTACH DATABASE ? AS old", (old_db_path,))
+    try:
+        if conn.execute("SELECT 1 FROM old.sqlite_master WHERE type = 'table' AND name = ?",
+                        (KEYS_TABLE_NAME,)).fetchone():
+            conn.execute(f"INSERT INTO {KEYS_TABLE_NAME} SELECT source, key, product_id FROM old.{KEYS_TABLE_NAME}")
+    finally:
+        conn.commit()
+        conn.execute("DETACH DATABASE old")
+
+def create_fts_index(conn):
+    """
+    External-content FTS5 table over the product, CPU and GPU text, keyed
+    by product_id, (re)built from the current rows. Skipped with a warning
+    when SQLite lacks FTS5.
+    """
+    try:
+        columns = ", ".join(FTS_COLUMNS)
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE_NAME} USING fts5("
+            f"{columns}, content='{TABLE_NAME}', content_rowid='product_id', prefix='2 3')"
+        )
+        conn.execute(f"INSERT INTO {FTS_TABLE_NAME}({FTS_TABLE_NAME}) VALUES ('rebuild')")
+    except sqlite3.OperationalError as e:
+        print(f"[WARNING] FTS5 unavailable, skipping full-text index: {e}")
+
+PRIMARY_CSV_PATH = 'laptop_prices.csv.txt'
+
+def csv_to_sqlite(csv_path=PRIMARY_CSV_PATH, db_path='db/laptops.db'):
     try:
         # Step 1: Check if the CSV file exists
         if not os.path.exists(csv_path):
             raise FileNotFoundError(f"[ERROR] CSV file not found at: {csv_path}")
-        
+
         # Step 2: Create the db directory if it doesn't exist
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
+
         # Step 3: Read the CSV file
         try:
             df = pd.read_csv(csv_path)
         except Exception as e:
             raise ValueError(f"[ERROR] Failed to read CSV file: {e}")
-        
+
         # Step 4: Check if DataFrame is empty or has issues (you can add more validation depending on your needs)
         if df.empty:
             raise ValueError("[ERROR] The CSV file is empty.")
+        df = prepare_frame(df)
 
-        # Step 5: Try connecting to SQLite and write the table
+        # Step 5: Build the typed, indexed database next to the old one, so
+        # readers keep seeing a complete catalog until the final swap
+        tmp_path = db_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         try:
-            conn = sqlite3.connect(db_path)
+            conn = sqlite3.connect(tmp_path)
         except sqlite3.Error as e:
             raise ConnectionError(f"[ERROR] Failed to connect to SQLite database: {e}")
 
         try:
-            df.to_sql('laptops', conn, if_exists='replace', index=False)
+            with conn:
+                create_schema(conn)
+            copy_product_keys(conn, db_path)
+            with conn:
+                if df['product_id'].isna().any():
+                    assign_product_ids(conn, df, PRIMARY_SOURCE)
+                df.to_sql(TABLE_NAME, conn, if_exists='append', index=False)
+                create_fts_index(conn)
+            # Planner statistics, so filters on the indexed columns use them
+            conn.execute("ANALYZE")
         except Exception as e:
+            conn.close()
             raise ValueError(f"[ERROR] Failed to write data to SQLite table: {e}")
-        
-        # Step 6: Commit the transaction and close the connection
-        conn.commit()
+
+        # Step 6: Close the connection and swap the new database in
         conn.close()
-        
-        print(f"[INFO] Successfully created SQLite DB at: {db_path}")
-    
+        os.replace(tmp_path, db_path)
+
+        print(f"[INFO] Successfully created SQLite DB at: {db_path} ({len(df)} products)")
+        return len(df)
+
     except (FileNotFoundError, ValueError, ConnectionError) as error:
         print(error)
     except Exception as e:
         # Catch any other exceptions and print them
         print(f"[ERROR] An unexpected error occurred: {e}")
+    return 0
+
+# -------------------- Multi-Source Ingestion --------------------
+
+FLIPKART_CSV_PATH = 'flipkart_cleaned_data.csv.txt'
+
+INGEST_CHUNK_SIZE = 50_000
+
+# Euro value of one unit of each feed currency
+EUR_PER_UNIT = {
+    'EUR': 1.0,
+    'INR': float(os.getenv('EUR_PER_INR', 0.011)),
+}
+
+# Feed brand spellings mapped to the catalog's
+BRAND_NAMES = {
+    'ASUS': 'Asus', 'DELL': 'Dell', 'SAMSUNG': 'Samsung', 'MOTOROLA': 'Motorola', 'CHUWI': 'Chuwi',
+    'LENOVO': 'Lenovo', 'ACER': 'Acer', 'APPLE': 'Apple', 'INFINIX': 'Infinix', 'HUAWEI': 'Huawei',
+}
+
+CPU_VENDORS = r'(?:Intel|AMD|Apple|MediaTek|Qualcomm|Snapdragon)'
+
+def _first(series, pattern, where=None):
+    """
+    First capture group of pattern in every string (NaN where absent).
+    With a boolean mask, only the rows where it is True are searched:
+    cheap literal prefilters keep slow regexes off long descriptions that
+    cannot match.
+    """
+    if where is None:
+        return series.str.extract(pattern, flags=re.IGNORECASE, expand=False)
+    return series[where].str.extract(pattern, flags=re.IGNORECASE, expand=False).reindex(series.index)
+
+def _has(lower, *needles):
+    """
+    True where the lower-cased text contains any of the literal needles.
+    """
+    mask = lower.str.contains(needles[0], regex=False)
+    for needle in needles[1:]:
+        mask |= lower.str.contains(needle, regex=False)
+    return mask
+
+def _per_value(series, transform):
+    """
+    Applies a vectorized transform to the distinct values only and maps the
+    results back. Fields like RAM, price or CPU repeat a few hundred values
+    across any number of rows.
+    """
+    codes, uniques = pd.factorize(series.fillna(''))
+    result = transform(pd.Series(uniques, dtype=object)).to_numpy()
+    return pd.Series(result[codes], index=series.index)
+
+def _yes_no(mask):
+    return pd.Series(np.where(mask, 'Yes', 'No'), index=mask.index)
+
+def normalize_flipkart(chunk):
+    """
+    Maps a chunk of the Flipkart scrape onto the unified schema using only
+    vectorized string extraction. Prices stay in rupees in price_local.
+    """
+    missing = lambda s: s.fillna('').str.strip().isin(['', 'Not Found', 'Other'])
+    name = chunk['Product Name'].fillna('').str.replace(r'\.{3}$', '', regex=True)
+    description = chunk['Description'].fillna('')
+    text = name + ' ' + description
+    lower, name_lower = text.str.lower(), name.str.lower()
+    head = _first(name, r'^(.*?)\s+-\s+\(').fillna(name)
+
+    out = pd.DataFrame(index=chunk.index)
+    brand = chunk['Brand'].fillna('').str.strip()
+    out['Company'] = brand.str.upper().map(BRAND_NAMES).fillna(brand).replace('', np.nan)
+
+    # Series name (brand and CPU words stripped) plus the model code after the spec block
+    rest = head.str.replace(r'^\S+\s*', '', regex=True)
+    series = _first(rest, rf'^(.*?)(?:\s*\b{CPU_VENDORS}\b|$)').str.strip()
+    series = series.where(series.fillna('') != '', chunk['Model'].str.strip())
+    code = _first(name, r'\)\s+([A-Za-z0-9]*\d[\w-]*)')
+    out['Product'] = (series + ' ' + code.fillna('')).str.strip()
+
+    out['TypeName'] = np.select(
+        [_has(lower, 'gaming'), _has(name_lower, '2 in 1'), _has(name_lower, 'thin and light', 'slim')],
+        ['Gaming', '2 in 1 Convertible', 'Ultrabook'], default='Notebook'
+    )
+    inches = pd.to_numeric(_first(description, r'\(([\d.]+)\s*inch\)'), errors='coerce')
+    cm = pd.to_numeric(_per_value(chunk['Display Size'], lambda s: _first(s, r'([\d.]+)\s*cm')), errors='coerce')
+    out['Inches'] = inches.fillna((cm / 2.54).round(1))
+    out['Ram'] = pd.to_numeric(_per_value(chunk['RAM'], lambda s: _first(s, r'(\d+)\s*GB')), errors='coerce')
+
+    os_name = chunk['OS'].where(~missing(chunk['OS']), _first(name, r'/((?:Windows|Mac OS|Chrome|DOS|Ubuntu)[^/)]*)'))
+    out['OS'] = os_name.str.replace(r'\s+(?:Home|Pro)$', '', regex=True).str.strip()
+    out['Weight'] = pd.to_numeric(_first(text, r'(\d+(?:\.\d+)?)\s*kg\b', _has(lower, 'kg')), errors='coerce')
+
+    price_local = pd.to_numeric(_per_value(chunk['Price'], lambda s: s.str.replace(r'[^\d.]', '', regex=True)),
+                                errors='coerce')
+    out['price_local'] = price_local
+    out['Price_euros'] = (price_local * EUR_PER_UNIT['INR']).round(2)
+
+    out['Screen'] = np.select(
+        [_has(name_lower, '4k'), _has(lower, 'qhd', '2560'), _has(lower, 'fhd', 'full hd', '1920')],
+        ['4K Ultra HD', 'Quad HD+', 'Full HD'], default='Standard'
+    )
+    resolution = description[_has(lower, 'x', '×')].str.extract(r'(\d{3,4})\s*[x×]\s*(\d{3,4})').reindex(chunk.index)
+    out['ScreenW'] = pd.to_numeric(resolution[0], errors='coerce')
+    out['ScreenH'] = pd.to_numeric(resolution[1], errors='coerce')
+    out['Touchscreen'] = _yes_no(_has(name_lower, 'touch'))
+    out['IPSpanel'] = _yes_no(_has(lower, 'ips') & text.str.contains(r'\bIPS\b'))
+    out['RetinaDisplay'] = 'No'
+
+    # CPU: the Processor field, or the vendor phrase in the product name
+    processor = chunk['Processor'].where(~missing(chunk['Processor']))
+    cpu = _first(rest, rf'\b({CPU_VENDORS}\b.*)$').fillna(processor)
+    apple_chip = _first(rest, r'\b(M\d(?:\s+(?:Pro|Max|Ultra))?)\b')
+    cpu = cpu.fillna('Apple ' + apple_chip)
+    vendor = _per_value(cpu, lambda s: _first(s, r'^(\S+)')).replace({'Snapdragon': 'Qualcomm'})
+    model = _per_value(cpu, lambda s: s.str.replace(r'^(?:Intel|AMD|Apple|MediaTek|Qualcomm)\s*', '', regex=True)
+                       .str.replace(r'\b(?:Dual|Quad|Hexa|Octa|Deca)\s+Core\b|\b\d+(?:st|nd|rd|th)\s+Gen\b|\(Series \d\)',
+                                    '', regex=True, case=False)
+                       .str.replace(r'\s+', ' ', regex=True).str.strip())
+    out['CPU_company'] = vendor.replace('', np.nan)
+    out['CPU_freq'] = pd.to_numeric(_first(text, r'(\d(?:\.\d+)?)\s*GHz', _has(lower, 'ghz')), errors='coerce')
+    out['CPU_model'] = model.replace('', np.nan)
+
+    storage = chunk['Storage'].where(~missing(chunk['Storage']), name)
+    size = storage.str.extract(r'(\d+)\s*(GB|TB)\s*(SSD|HDD|EMMC)?', flags=re.IGNORECASE)
+    out['PrimaryStorage'] = pd.to_numeric(size[0], errors='coerce') * np.where(size[1].str.upper() == 'TB', 1024, 1)
+    out['PrimaryStorageType'] = size[2].str.upper().map({'SSD': 'SSD', 'HDD': 'HDD', 'EMMC': 'Flash Storage'})
+    out['SecondaryStorage'] = 0
+    out['SecondaryStorageType'] = 'No'
+
+    # GPU: a named GPU anywhere in the listing, else the vendor of a dedicated card
+    gpu = chunk['GPU'].where(~missing(chunk['GPU'])).fillna(_first(
+        text, r'((?:NVIDIA\s+)?GeForce\s+(?:RTX|GTX|MX)\s*\d{3,4}\w*(?:\s+Ti)?|Radeon\s+RX\s*\d{3,4}\w*|Iris\s+Xe|UHD\s+Graphics(?:\s+\d+)?)',
+        _has(lower, 'geforce', 'radeon', 'iris', 'uhd')
+    ))
+    out['GPU_model'] = gpu.str.replace(r'^NVIDIA\s+', '', regex=True, case=False)
+    out['GPU_company'] = pd.Series(np.select(
+        [gpu.str.contains('GeForce|NVIDIA', case=False, na=False), gpu.str.contains('Radeon', case=False, na=False),
+         gpu.str.contains('Iris|UHD', case=False, na=False), _has(name_lower, 'graphics/nvi'),
+         _has(name_lower, 'graphics/amd')],
+        ['Nvidia', 'AMD', 'Intel', 'Nvidia', 'AMD'], default=''
+    ), index=chunk.index).replace('', np.nan)
+    return out
+
+# Scraped feeds: normalizer, price currency, and the first product_id of
+# the source's ID range
+FEEDS = {
+    'flipkart': {'normalize': normalize_flipkart, 'currency': 'INR', 'id_base': 10_000_000},
+}
+
+def normalized_chunks(reader, normalize, workers=1):
+    """
+    Yields (rows read, normalized frame) per CSV chunk, in order. With
+    workers > 1 chunks are normalized in worker processes while the caller
+    writes earlier ones; at most 2 * workers chunks are in flight, so
+    memory stays bounded.
+    """
+    if workers <= 1:
+        for chunk in reader:
+            yield len(chunk), normalize(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in reader:
+            pending.append((len(chunk), pool.submit(normalize, chunk)))
+            if len(pending) >= 2 * workers:
+                rows, future = pending.popleft()
+                yield rows, future.result()
+        while pending:
+            rows, future = pending.popleft()
+            yield rows, future.result()
+
+def ingest_feed(csv_path=FLIPKART_CSV_PATH, source='flipkart', db_path='db/laptops.db', chunk_size=INGEST_CHUNK_SIZE,
+                workers=1):
+    """
+    Normalizes a scraped feed into the laptops table, replacing the rows a
+    previous ingest of the same source wrote. The CSV is read in chunks of
+    chunk_size rows, so memory stays bounded for feeds of any size, and
+    every chunk is normalized with vectorized pandas string operations
+    (across worker processes when workers > 1). Runs in one transaction;
+    returns the number of rows written.
+
+    Only the database changes: search sees the new rows once the index,
+    product store, lexical index and renderings are rebuilt with
+    create_vectorstore (done by running this module).
+    """
+    feed = FEEDS[source]
+    start = time.perf_counter()
+    read = written = 0
+
+    try:
+        conn = sqlite3.connect(db_path)
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to connect to SQLite database: {e}")
+        return 0
+
+    try:
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")}
+        with conn:
+            if not columns:
+                create_schema(conn)
+            elif 'source' not in columns:
+                raise ValueError("[ERROR] The laptops table predates multi-source ingestion; rebuild it with csv_to_sqlite first.")
+            create_keys_table(conn)
+
+            conn.execute(f"DELETE FROM {TABLE_NAME} WHERE source = ?", (source,))
+            reader = pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_size)
+            seen = {}
+            for rows, normalized in normalized_chunks(reader, feed['normalize'], workers):
+                read += rows
+
+                frame = prepare_frame(normalized, source, feed['currency']).dropna(subset=REQUIRED_COLUMNS)
+                assign_product_ids(conn, frame, source, feed['id_base'], seen)
+                frame.to_sql(TABLE_NAME, conn, if_exists='append', index=False)
+                written += len(frame)
+
+                elapsed = time.perf_counter() - start
+                print(f"[INFO] {source}: {read} rows read, {written} written - {read / max(elapsed, 1e-9):.0f} rows/sec")
+
+            create_fts_index(conn)
+        conn.execute("ANALYZE")
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(e if isinstance(e, ValueError) else f"[ERROR] Failed to ingest {source} feed: {e}")
+        return 0
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] Ingested {written} of {read} {source} rows in {elapsed:.2f}s "
+          f"({read / max(elapsed, 1e-9):.0f} rows/sec); {read - written} rows lacked brand, name or price")
+    return written
 
 if __name__ == "__main__":
-    csv_to_sqlite()
+    if csv_to_sqlite():
+        ingest_feed(workers=os.cpu_count() or 1)
+
+        # Incremental: only the new or changed products are encoded
+        from create_vectorstore import build_faiss_index
+        build_faiss_index()
@@ -0,0 +1,211 @@
+import os
+import re
+import shutil
+from itertools import chain
+import numpy as np
+import pandas as pd
+from query_parser import (WEIGHT_LIMIT, PRICE_RANGE, PRICE_UPPER, PRICE_LOWER, SPEC, STOPWORDS,
+                          SPEC_WORDS, LIGHTWEIGHT_WORDS, USE_CASE_SYNONYMS)
+
+# -------------------- Configuration --------------------
+
+LEXICAL_INDEX_PATH = "embeddings/lexical.npz"
+
+# Bump when the on-disk layout or the tokenizer changes
+LEXICAL_FORMAT = 1
+
+# Catalog text the lexical index covers
+LEXICAL_FIELDS = ["Company", "Product", "CPU_company", "CPU_model", "GPU_company", "GPU_model"]
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# A term is "rare" (names a model rather than a brand or a generic word)
+# when at most this share of the catalog contains it
+RARE_DF_FRACTION = float(os.getenv("LEXICAL_RARE_DF", 0.05))
+
+# Layout (one .npz, no pickle):
+#   ids          int64 product IDs, ascending (same order as the product store)
+#   doc_lengths  float32 token count per product
+#   terms        sorted unicode vocabulary
+#   offsets      int64 postings offsets per term (len(terms) + 1)
+#   postings     int32 product positions, ascending within each term
+#   tfs          uint16 term frequency per posting
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+USE_CASE_WORDS = {word for synonyms in USE_CASE_SYNONYMS.values() for s in synonyms for word in s.split()}
+
+# -------------------- Tokenizer --------------------
+
+def tokenize(text):
+    """
+    Lower-cased alphanumeric tokens plus every adjacent pair joined, so
+    "GTX 1050" in the catalog also matches "gtx1050" in a query.
+    """
+    tokens = TOKEN.findall(text.lower()) if isinstance(text, str) else []
+    return tokens + [a + b for a, b in zip(tokens, tokens[1:])]
+
+def lexical_texts(df):
+    """
+    Renders the lexical text of every row (vectorized, like the embedding text).
+    """
+    text = df[LEXICAL_FIELDS[0]].fillna("").astype(str)
+    for name in LEXICAL_FIELDS[1:]:
+        text = text + " " + df[name].fillna("").astype(str)
+    return text
+
+def query_terms(user_query):
+    """
+    Content words of a query: price, weight and spec phrases, stopwords and
+    use-case or portability words are removed, since the structured filters
+    already handle them. What remains should name products or hardware.
+    """
+    text = user_query.lower() if isinstance(user_query, str) else ""
+    for pattern in (WEIGHT_LIMIT, PRICE_RANGE, PRICE_UPPER, PRICE_LOWER, SPEC):
+        text = pattern.sub(" ", text)
+    ignored = STOPWORDS | SPEC_WORDS | LIGHTWEIGHT_WORDS | USE_CASE_WORDS
+    return [token for token in TOKEN.findall(text) if token not in ignored]
+
+# -------------------- Writer --------------------
+
+class LexicalIndexWriter:
+    """
+    Turns catalog chunks (indexed by product_id, in ascending order) into
+    per-chunk (term, position, tf) arrays spilled next to the index, and
+    merges them into the inverted index on close(). Nothing but the current
+    chunk is held in Python objects.
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_PATH):
+        self.path = path
+        self.parts_path = path + ".parts"
+        shutil.rmtree(self.parts_path, ignore_errors=True)
+        os.makedirs(self.parts_path)
+        self._parts = 0
+        self.rows = 0
+
+    def append(self, chunk):
+        tokens = lexical_texts(chunk).str.lower().str.findall(TOKEN.pattern)
+        counts = tokens.str.len().to_numpy(dtype="int64")
+        words = np.array(list(chain.from_iterable(tokens)), dtype=object)
+        docs = np.repeat(np.arange(len(chunk), dtype="int64"), counts)
+
+        # Adjacent pairs within a product, as in tokenize()
+        same = docs[1:] == docs[:-1]
+        words = np.concatenate([words, words[:-1][same] + words[1:][same]])
+        docs = np.concatenate([docs, docs[:-1][same]])
+
+        codes, vocabulary = pd.factorize(words, sort=True)
+        pairs, tfs = np.unique(docs * max(len(vocabulary), 1) + codes, return_counts=True)
+        np.savez(os.path.join(self.parts_path, f"{self._parts:06d}.npz"),
+                 ids=chunk.index.to_numpy(dtype="int64"),
+                 doc_lengths=np.bincount(docs, minlength=len(chunk)).astype("float32"),
+                 terms=np.asarray(vocabulary, dtype="U"),
+                 codes=(pairs % max(len(vocabulary), 1)).astype("int32"),
+                 postings=(pairs // max(len(vocabulary), 1) + self.rows).astype("int32"),
+                 tfs=np.minimum(tfs, 65535).astype("uint16"))
+        self._parts += 1
+        self.rows += len(chunk)
+
+    def close(self):
+        parts = []
+        for i in range(self._parts):
+            with np.load(os.path.join(self.parts_path, f"{i:06d}.npz"), allow_pickle=False) as data:
+                parts.append({name: data[name] for name in data.files})
+
+        def column(name, dtype):
+            return np.concatenate([p[name] for p in parts]) if parts else np.empty(0, dtype=dtype)
+
+        # Merge the chunk vocabularies and renumber every chunk's term codes
+        terms = np.unique(column("terms", "U1"))
+        codes = np.concatenate([np.searchsorted(terms, p["terms"])[p["codes"]] for p in parts]) \
+            if parts else np.empty(0, dtype="int64")
+
+        # Group by term; parts are in position order, so a stable sort keeps
+        # every term's postings ascending
+        order = np.argsort(codes, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(terms)))]).astype("int64")
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            np.savez(f, format=np.array(LEXICAL_FORMAT), ids=column("ids", "int64"),
+                     doc_lengths=column("doc_lengths", "float32"), terms=terms, offsets=offsets,
+                     postings=column("postings", "int32")[order], tfs=column("tfs", "uint16")[order])
+        os.replace(self.path + ".tmp", self.path)
+        shutil.rmtree(self.parts_path, ignore_errors=True)
+
+# -------------------- Reader --------------------
+
+class LexicalIndex:
+    """
+    In-memory BM25 index over product, CPU and GPU tokens. Document
+    positions match the product store's row positions, so filter masks over
+    the catalog apply to lexical results directly.
+    """
+
+    def __init__(self, path=LEXICAL_INDEX_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["format"]) != LEXICAL_FORMAT:
+                raise ValueError(f"Unsupported lexical index format: {int(data['format'])}")
+            self.ids = data["ids"]
+            self.doc_lengths = data["doc_lengths"]
+            self.terms = data["terms"]
+            self.offsets = data["offsets"]
+            self.postings = data["postings"]
+            self.tfs = data["tfs"].astype("float32")
+
+        self.rows = len(self.ids)
+        self.avg_length = float(self.doc_lengths.mean()) if self.rows else 0.0
+        self.rare_df = max(1, int(RARE_DF_FRACTION * self.rows))
+
+    def _postings(self, term):
+        i = int(np.searchsorted(self.terms, term))
+        if i >= len(self.terms) or self.terms[i] != term:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.postings[start:end], self.tfs[start:end]
+
+    def exact_positions(self, terms):
+        """
+        Positions of the products containing every term, provided at least
+        one term is rare; None when any term is unknown or all are common.
+        """
+        if not terms:
+            return None
+        found = [self._postings(term) for term in terms]
+        if any(entry is None for entry in found):
+            return None
+        if not any(len(positions) <= self.rare_df for positions, _ in found):
+            return None
+        positions = found[0][0]
+        for other, _ in found[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return positions if positions.size else None
+
+    def search(self, terms, top_k, mask=None):
+        """
+        Product IDs of the top_k BM25 matches for the terms (and their
+        joined pairs), restricted to positions where mask is True.
+        """
+        scores = np.zeros(self.rows, dtype="float32")
+        for term in set(terms + [a + b for a, b in zip(terms, terms[1:])]):
+            entry = self._postings(term)
+            if entry is None:
+                continue
+            positions, tfs = entry
+            idf = np.log(1.0 + (self.rows - len(positions) + 0.5) / (len(positions) + 0.5))
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self.doc_lengths[positions] / self.avg_length)
+            scores[positions] += idf * tfs * (BM25_K1 + 1.0) / (tfs + norm)
+
+        if mask is not None:
+            scores[~mask] = 0.0
+        hits = np.flatnonzero(scores)
+        if hits.size > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return self.ids[hits]
+
+def load_lexical_index(path=LEXICAL_INDEX_PATH):
+    return LexicalIndex(path)
@@ -0,0 +1,270 @@
+import os
+import time
+import random
+import threading
+import httpx
+from dotenv import load_dotenv
+import resources
+import telemetry
+
+# Every Groq call (query understanding, recommendations, the SQL agent)
+# goes through one pooled HTTP client whose transport enforces the shared
+# rate limit, concurrency cap, timeouts and retries, and records
+# per-endpoint metrics. Clients are built lazily through the registry.
+
+# -------------------- Configuration --------------------
+
+load_dotenv()
+
+LLM_MODEL_NAME = os.getenv("LLM_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+LLM_BASE_URL = os.getenv("Groq_Base_Url", "https://api.groq.com/openai/v1")
+
+# Per-call deadline and connect timeout (seconds)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30.0))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5.0))
+
+# Token bucket sized to the Groq quota: sustained requests per minute plus
+# a burst allowance
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 30))
+LLM_BURST = int(os.getenv("LLM_BURST", 5))
+
+# Requests in flight at once (streams hold their slot until closed), and how
+# long a caller may queue for a rate-limit token and a slot before failing
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 30.0))
+
+# Retries on 429, 5xx, timeouts and connection errors: full-jitter
+# exponential backoff, or the server's Retry-After when it sends one
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_MAX = 20.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Call sites label their requests with this header; the transport strips it
+ENDPOINT_HEADER = "X-DealWizard-Endpoint"
+
+# -------------------- Rate Limiting --------------------
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: acquire() takes one token, sleeping until one
+    is available, and returns how long it waited. With a timeout it gives
+    up and returns None once no token can be had within that many seconds.
+    """
+
+    def __init__(self, rate_per_minute, capacity):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            if timeout is not None and waited + delay > timeout:
+                return None
+            time.sleep(delay)
+            waited += delay
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number attempt + 1.
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), LLM_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+# -------------------- Transport --------------------
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """
+    Response body that frees the concurrency slot when it is closed, so a
+    streamed completion holds its slot until the stream is consumed.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+class GovernedTransport(httpx.BaseTransport):
+    """
+    httpx transport shared by every LLM client: rate limit, bounded
+    concurrency and retries around a pooled HTTP transport.
+    """
+
+    def __init__(self, bucket, max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES):
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._inner = httpx.HTTPTransport(limits=httpx.Limits(max_connections=max_concurrency * 2,
+                                                              max_keepalive_connections=max_concurrency))
+
+    def _acquire_slot(self, endpoint):
+        # The rate-limit wait and the slot wait share one LLM_QUEUE_TIMEOUT
+        start = time.perf_counter()
+        if self.bucket.acquire(timeout=LLM_QUEUE_TIMEOUT) is None:
+            telemetry.increment("llm_requests_rejected_total", endpoint=endpoint, reason="rate_limit")
+            raise httpx.PoolTimeout(f"LLM rate limit left no request slot within {LLM_QUEUE_TIMEOUT}s")
+        remaining = max(0.0, LLM_QUEUE_TIMEOUT - (time.perf_counter() - start))
+        if not self._slots.acquire(timeout=remaining):
+            telemetry.increment("llm_requests_rejected_total", endpoint=endpoint, reason="concurrency")
+            raise httpx.PoolTimeout(f"No LLM request slot free after {LLM_QUEUE_TIMEOUT}s")
+        telemetry.observe("llm_queue_wait_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+        released = threading.Event()
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self._slots.release()
+        return release
+
+    def handle_request(self, request):
+        endpoint = request.headers.pop(ENDPOINT_HEADER, "other")
+        for attempt in range(self.max_retries + 1):
+            release = self._acquire_slot(endpoint)
+            start = time.perf_counter()
+            try:
+                response = self._inner.handle_request(request)
+            except (httpx.TimeoutException, httpx.NetworkError) as e:
+                release()
+                telemetry.increment("llm_http_requests_total", endpoint=endpoint, status=type(e).__name__)
+                if attempt == self.max_retries:
+                    raise
+                self._wait(attempt, endpoint, "timeout" if isinstance(e, httpx.TimeoutException) else "network")
+                continue
+
+            telemetry.observe("llm_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+            telemetry.increment("llm_http_requests_total", endpoint=endpoint, status=response.status_code)
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = response.headers.get("retry-after")
+                response.close()
+                release()
+                self._wait(attempt, endpoint, str(response.status_code), retry_after)
+                continue
+
+            if response.is_closed:
+                release()
+            else:
+                response.stream = _ReleasingStream(response.stream, release)
+            return response
+
+    def _wait(self, attempt, endpoint, reason, retry_after=None):
+        delay = backoff_delay(attempt, retry_after)
+        telemetry.increment("llm_retries_total", endpoint=endpoint, reason=reason)
+        print(f"[WARNING] LLM request for '{endpoint}' failed ({reason}); retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+    def close(self):
+        self._inner.close()
+
+# -------------------- Clients --------------------
+
+def _api_key():
+    api_key = os.getenv("Groq_Api_Key")
+    if not api_key:
+        raise ValueError("Groq_Api_Key not found in environment variables.")
+    return api_key
+
+def _load_llm_http_client():
+    transport = GovernedTransport(TokenBucket(LLM_REQUESTS_PER_MINUTE, LLM_BURST))
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT))
+
+def _load_llm_client():
+    from openai import OpenAI
+
+    # Retries happen in the transport, so the SDK must not add its own
+    return OpenAI(api_key=_api_key(), base_url=LLM_BASE_URL, http_client=resources.get("llm_http_client"),
+                  max_retries=0, timeout=LLM_TIMEOUT)
+
+resources.register("llm_http_client", _load_llm_http_client)
+resources.register("llm_client", _load_llm_client)
+
+def chat_completion(endpoint, messages, temperature=0.5, timeout=None, **kwargs):
+    """
+    Chat completion through the shared client. Non-streamed calls record
+    their latency and token usage under endpoint; streamed calls
+    (stream=True) return the stream, and the caller records usage.
+    """
+    client = resources.get("llm_client")
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=LLM_MODEL_NAME,
+            messages=messages,
+            temperature=temperature,
+            timeout=timeout or LLM_TIMEOUT,
+            extra_headers={ENDPOINT_HEADER: endpoint},
+            **kwargs
+        )
+    except Exception:
+        telemetry.increment("llm_calls_total", endpoint=endpoint, result="error")
+        raise
+    telemetry.increment("llm_calls_total", endpoint=endpoint, result="ok")
+    if not kwargs.get("stream"):
+        telemetry.observe("llm_call_seconds", time.perf_counter() - start, endpoint=endpoint)
+        telemetry.record_llm_usage(endpoint, response.usage)
+    return response
+
+# -------------------- LangChain --------------------
+
+def _usage_recorder(endpoint):
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class UsageRecorder(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            usage = (response.llm_output or {}).get("token_usage")
+            if not usage:
+                for generation in (g for batch in response.generations for g in batch):
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                    if metadata:
+                        usage = {"prompt_tokens": metadata.get("input_tokens"),
+                                 "completion_tokens": metadata.get("output_tokens"),
+                                 "total_tokens": metadata.get("total_tokens")}
+                        break
+            telemetry.record_llm_usage(endpoint, usage)
+
+    return UsageRecorder()
+
+def chat_model(endpoint, temperature=0.4, streaming=False):
+    """
+    LangChain chat model on the shared, rate-limited HTTP client.
+    """
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=LLM_MODEL_NAME,
+        base_url=LLM_BASE_URL,
+        api_key=_api_key(),
+        temperature=temperature,
+        streaming=streaming,
+        stream_usage=True,
+        timeout=LLM_TIMEOUT,
+        max_retries=0,
+        http_client=resources.get("llm_http_client"),
+        default_headers={ENDPOINT_HEADER: endpoint},
+        callbacks=[_usage_recorder(endpoint)],
+    )
@@ -1,20 +1,16 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
 import re
 import json
+import hashlib
+import resources
+import telemetry
+import llm_client
+from cache import PersistentCache, SemanticIndex, normalize_query
+from query_parser import parse_query_json
+from query_encoder import encode_queries
 
-# Load the .env file
-load_dotenv()
-api_key = os.getenv("Groq_Api_Key")
-
-# Setup OpenAI (Groq) client
-client = OpenAI(
-    api_key=api_key,
-    base_url="https://api.groq.com/openai/v1"
-)
-
-MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
+# Groq calls go through the shared, rate-limited client in llm_client
+MODEL_NAME = llm_client.LLM_MODEL_NAME
 
 # Helper to extract and clean the JSON block from LLM response
 def clean_response(text):
@@ -34,8 +30,7 @@ def clean_response(text):
         print(f"[ERROR] Failed to clean/parse JSON: {e}")
         return text
 
-def understand_query(user_query):
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a product search assistant. Extract structured JSON from the user query with keys:
 - category (e.g., "laptop")
 - intent (e.g., "search", "recommend")
@@ -58,15 +53,119 @@ Only respond with valid JSON format.
 User query: "{user_query}"
 """
 
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "system", "content": "You are a helpful assistant for understanding product search queries."},
-                  {"role": "user", "content": prompt}],
+# Cached answers are only valid for the prompt and model that produced them
+PROMPT_VERSION = hashlib.sha1((PROMPT_TEMPLATE + MODEL_NAME).encode("utf-8")).hexdigest()[:12]
+
+# -------------------- Query Understanding Cache --------------------
+
+query_cache = PersistentCache(
+    "understand_query",
+    version=PROMPT_VERSION,
+    ttl_seconds=int(os.getenv("QUERY_CACHE_TTL", 7 * 24 * 3600)),
+    max_entries=1024
+)
+
+# Optional third tier: serve near-duplicate queries via MiniLM similarity
+SEMANTIC_CACHE_ENABLED = os.getenv("QUERY_CACHE_SEMANTIC", "0") == "1"
+semantic_index = SemanticIndex(threshold=float(os.getenv("QUERY_CACHE_SEMANTIC_THRESHOLD", 0.95)))
+semantic_hits = 0
+
+# Rule-based parsing for simple queries; the LLM is only used below this confidence
+FAST_PATH_ENABLED = os.getenv("QUERY_FAST_PATH", "1") == "1"
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("QUERY_FAST_PATH_MIN_CONFIDENCE", 0.8))
+fast_path_hits = 0
+
+def _embed_for_cache(key):
+    try:
+        return encode_queries([key])[0]
+    except Exception as e:
+        print(f"[WARNING] Semantic cache disabled for this query: {e}")
+        return None
+
+def cache_stats():
+    """
+    Hit/miss counters for the query-understanding cache tiers.
+    """
+    stats = query_cache.snapshot()
+    stats["semantic_hits"] = semantic_hits
+    stats["fast_path_hits"] = fast_path_hits
+    return stats
+
+def _is_valid_json(text):
+    try:
+        json.loads(text)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def _fast_path(user_query):
+    try:
+        vocabulary = resources.get("query_vocabulary")
+    except RuntimeError as e:
+        print(f"[WARNING] Fast-path parser unavailable: {e}")
+        return None
+    result, confidence = parse_query_json(user_query, vocabulary)
+    return result if confidence >= FAST_PATH_MIN_CONFIDENCE else None
+
+def understand_query(user_query, use_llm=True):
+    result, _ = understand_query_with_source(user_query, use_llm)
+    return result
+
+def understand_query_with_source(user_query, use_llm=True):
+    """
+    Like understand_query, but also reports which path produced the answer:
+    "fast_path", "cache", "semantic_cache" or "llm". With use_llm=False a
+    query no cache tier answers gives (None, "miss") instead of an LLM call.
+    """
+    with telemetry.span("understand_query"):
+        result, source = _understand_query(user_query, use_llm)
+        telemetry.record_cache("understand_query", source)
+        return result, source
+
+def _understand_query(user_query, use_llm=True):
+    global semantic_hits, fast_path_hits
+
+    if FAST_PATH_ENABLED:
+        result = _fast_path(user_query)
+        if result is not None:
+            fast_path_hits += 1
+            return result, "fast_path"
+
+    key = normalize_query(user_query)
+    cached = query_cache.get(key)
+    if cached is not None:
+        return cached, "cache"
+
+    vector = _embed_for_cache(key) if SEMANTIC_CACHE_ENABLED else None
+    if vector is not None:
+        match = semantic_index.lookup(key, vector)
+        cached = query_cache.get(match) if match else None
+        if cached is not None:
+            semantic_hits += 1
+            return cached, "semantic_cache"
+
+    if not use_llm:
+        return None, "miss"
+
+    prompt = PROMPT_TEMPLATE.format(user_query=user_query)
+
+    response = llm_client.chat_completion(
+        "understand_query",
+        [{"role": "system", "content": "You are a helpful assistant for understanding product search queries."},
+         {"role": "user", "content": prompt}],
         temperature=0.2
     )
 
     raw_content = response.choices[0].message.content
-    return clean_response(raw_content)
+    result = clean_response(raw_content)
+
+    # Never cache an answer the caller will fail to parse
+    if _is_valid_json(result):
+        query_cache.set(key, result)
+        if vector is not None:
+            semantic_index.add(key, vector)
+
+    return result, "llm"
 
 # For testing
 if __name__ == "__main__":
@@ -80,4 +179,7 @@ if __name__ == "__main__":
 
     for q in queries:
         print(f"\n[QUERY] {q}")
-        print(understand_query(q))
\ No newline at end of file
+        result, source = understand_query_with_source(q)
+        print(f"[SOURCE] {source}")
+        print(result)
+    print(f"\n[CACHE] {cache_stats()}")
\ No newline at end of file
@@ -1,64 +1,36 @@
 import os
 import re
 import json
+import time
+import hashlib
 import logging
-from dotenv import load_dotenv
-from openai import OpenAI
 import pandas as pd
 from sqlite3 import connect, OperationalError
+import telemetry
+import resources
+import llm_client
+from cache import PersistentCache, normalize_query
+from renderings import TEMPLATES, renderings
+from messages import FAILURE_MESSAGE, INTERRUPTED_MESSAGE, is_complete
 
 # ------------------------- Configuration & Logging -------------------------
 
-# Load Groq API key from .env file
-load_dotenv()
-api_key = os.getenv("Groq_Api_Key")
-
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
-# Validate API key
-if not api_key:
-    raise EnvironmentError("Groq_Api_Key not found in environment variables")
+# Groq calls go through the shared, rate-limited client in llm_client
+MODEL_NAME = llm_client.LLM_MODEL_NAME
 
-# Setup OpenAI client for Groq
-try:
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.groq.com/openai/v1"
-    )
-except Exception as e:
-    logging.error(f"Failed to initialize Groq client: {e}")
-    raise
+# ------------------------- Prompt -------------------------
 
-MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
+SYSTEM_PROMPT = "You are a tech expert who helps users choose laptops."
 
-# ------------------------- Core Recommendation Function -------------------------
+EMPTY_MESSAGE = "Sorry, I couldn't find any laptops matching your request."
+INCOMPLETE_MESSAGE = "Product details were incomplete. No valid options available."
 
-def generate_recommendation(user_query, products_df):
-    if products_df.empty:
-        logging.warning("Empty DataFrame passed to generate_recommendation.")
-        return "Sorry, I couldn't find any laptops matching your request."
-
-    # Build formatted laptop list for the prompt
-    product_lines = []
-    for idx, row in products_df.iterrows():
-        try:
-            line = (
-                f"- {row['Company']} {row['Product']}, {row['Ram']}GB RAM, "
-                f"{row['PrimaryStorage']}GB {row['PrimaryStorageType']}, "
-                f"{row['GPU_model']} GPU, €{row['Price_euros']}, Weight: {row['Weight']}kg"
-            )
-            product_lines.append(line)
-        except KeyError as ke:
-            logging.warning(f"Missing expected column in row {idx}: {ke}")
-            continue
+PRODUCT_LINE_TEMPLATE = TEMPLATES["prompt_line"]
 
-    if not product_lines:
-        return "Product details were incomplete. No valid options available."
-
-    product_list = "\n".join(product_lines)
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a tech shopping assistant. A user asked: "{user_query}"
 
 Here are the matching laptops:
@@ -67,20 +39,224 @@ Here are the matching laptops:
 Write a helpful natural language recommendation for the user. Focus on the top 2-3 options. Mention highlights like performance, price, portability, or use-case fit (gaming, office, school, etc). Be concise and helpful.
 """
 
+def build_prompt(user_query, products_df):
+    """
+    Returns the user prompt for the recommendation, or None when the
+    products lack the columns the prompt needs. Product lines come
+    precomputed from the render store.
+    """
+    try:
+        product_lines = renderings("prompt_line", products_df).tolist()
+    except KeyError as ke:
+        logging.warning(f"Missing expected column for the product list: {ke}")
+        return None
+
+    if not product_lines:
+        return None
+
+    return PROMPT_TEMPLATE.format(user_query=user_query, product_list="\n".join(product_lines))
+
+# ------------------------- Recommendation Cache -------------------------
+
+# Cached prose is only valid for the prompt, model and catalog that produced it
+PROMPT_VERSION = hashlib.sha1(
+    (SYSTEM_PROMPT + PROMPT_TEMPLATE + PRODUCT_LINE_TEMPLATE + MODEL_NAME).encode("utf-8")
+).hexdigest()[:12]
+
+RECOMMENDATION_CACHE_ENABLED = os.getenv("RECOMMENDATION_CACHE", "1") == "1"
+
+def _load_recommendation_cache():
+    manifest = resources.get("index_manifest")
+    catalog_version = manifest.get("catalog_hash") or manifest.get("built_at", "unknown")
+    return PersistentCache(
+        "recommendation",
+        version=f"{PROMPT_VERSION}-{catalog_version[:12]}",
+        ttl_seconds=int(os.getenv("RECOMMENDATION_CACHE_TTL", 24 * 3600)),
+        max_entries=int(os.getenv("RECOMMENDATION_CACHE_SIZE", 512))
+    )
+
+resources.register("recommendation_cache", _load_recommendation_cache)
+
+def canonical_intent(user_query, query_data=None):
+    """
+    Order- and case-insensitive form of the parsed query attributes, so
+    "Gaming laptop" and "a laptop for gaming" share an entry when they parse
+    the same. Without parsed attributes the normalized query text is used.
+    """
+    attributes = (query_data or {}).get("important_attributes") or {}
+    canonical = {}
+    for key, value in attributes.items():
+        if value in ("", None, [], {}):
+            continue
+        if isinstance(value, str):
+            value = value.strip().lower()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        canonical[str(key).lower()] = value
+    if not canonical:
+        return {"query": normalize_query(user_query)}
+    return canonical
+
+def candidate_ids(products_df):
+    if products_df.index.name == "product_id":
+        return sorted(int(i) for i in products_df.index)
+    if "product_id" in products_df.columns:
+        return sorted(int(i) for i in products_df["product_id"])
+    return None
+
+def recommendation_key(user_query, products_df, query_data=None):
+    """
+    Cache key for a recommendation, or None when the candidates carry no
+    product IDs (such results are never cached).
+    """
+    ids = candidate_ids(products_df)
+    if ids is None:
+        return None
+    payload = json.dumps({
+        "intent": canonical_intent(user_query, query_data),
+        "products": ids,
+        "model": MODEL_NAME,
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def _cache():
+    if not RECOMMENDATION_CACHE_ENABLED:
+        return None
+    try:
+        return resources.get("recommendation_cache")
+    except RuntimeError as e:
+        logging.warning(f"Recommendation cache unavailable: {e}")
+        return None
+
+def _cached_recommendation(key):
+    cache = _cache()
+    if cache is None or key is None:
+        return None
+    cached = cache.get(key)
+    telemetry.record_cache("recommendation", "hit" if cached is not None else "miss")
+    return cached
+
+def _store_recommendation(key, text):
+    cache = _cache()
+    if cache is not None and key is not None and text:
+        cache.set(key, text)
+
+def cached_recommendation(user_query, products_df, query_data=None):
+    """
+    The cached recommendation for these candidates, or None. Never calls the LLM.
+    """
+    return _cached_recommendation(recommendation_key(user_query, products_df, query_data))
+
+def recommendation_cache_stats():
+    cache = _cache()
+    return cache.snapshot() if cache is not None else {}
+
+# ------------------------- Core Recommendation Function -------------------------
+
+@telemetry.traced("generate_recommendation")
+def generate_recommendation(user_query, products_df, query_data=None):
+    """
+    Recommendation prose for the candidate products. query_data (the parsed
+    query) lets differently worded requests with the same intent and the
+    same candidates reuse one cached answer.
+    """
+    telemetry.set_attribute("product_count", len(products_df))
+    if products_df.empty:
+        logging.warning("Empty DataFrame passed to generate_recommendation.")
+        return EMPTY_MESSAGE
+
+    key = recommendation_key(user_query, products_df, query_data)
+    cached = _cached_recommendation(key)
+    if cached is not None:
+        return cached
+
+    prompt = build_prompt(user_query, products_df)
+    if prompt is None:
+        return INCOMPLETE_MESSAGE
+
     try:
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are a tech expert who helps users choose laptops."},
+        response = llm_client.chat_completion(
+            "generate_recommendation",
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.5
         )
-        return response.choices[0].message.content.strip()
+        recommendation = response.choices[0].message.content.strip()
+        _store_recommendation(key, recommendation)
+        return recommendation
 
     except Exception as e:
         logging.error(f"LLM request failed: {e}")
-        return "Oops, there was a problem generating your recommendation. Please try again later."
+        return FAILURE_MESSAGE
+
+def generate_recommendation_stream(user_query, products_df, query_data=None):
+    """
+    Streaming variant of generate_recommendation: yields text chunks as
+    the model produces them, so the UI can render the answer incrementally.
+    Joining the chunks gives the complete recommendation. Time to first
+    token is recorded in the llm_time_to_first_token_seconds histogram.
+    A cached recommendation is yielded as a single chunk. A stream that
+    fails before its first token yields FAILURE_MESSAGE; one that fails
+    later ends with INTERRUPTED_MESSAGE (see is_complete).
+    """
+    if products_df.empty:
+        logging.warning("Empty DataFrame passed to generate_recommendation_stream.")
+        yield EMPTY_MESSAGE
+        return
+
+    key = recommendation_key(user_query, products_df, query_data)
+    cached = _cached_recommendation(key)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_prompt(user_query, products_df)
+    if prompt is None:
+        yield INCOMPLETE_MESSAGE
+        return
+
+    start = time.perf_counter()
+    first_token = None
+    chunks = []
+    try:
+        stream = llm_client.chat_completion(
+            "generate_recommendation",
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.5,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            if chunk.usage is not None:
+                telemetry.record_llm_usage("generate_recommendation", chunk.usage)
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                telemetry.observe("llm_time_to_first_token_seconds", first_token,
+                                  endpoint="generate_recommendation")
+                text = text.lstrip()
+            chunks.append(text)
+            yield text
+
+        # Only a stream that ran to completion is cached
+        _store_recommendation(key, "".join(chunks).strip())
+
+    except Exception as e:
+        logging.error(f"LLM stream failed: {e}")
+        telemetry.increment("stage_errors_total", stage="generate_recommendation_stream")
+        yield FAILURE_MESSAGE if first_token is None else INTERRUPTED_MESSAGE
+    finally:
+        telemetry.observe("stage_duration_seconds", time.perf_counter() - start,
+                          stage="generate_recommendation_stream")
 
 # ------------------------- Optional Test Code -------------------------
 
@@ -103,5 +279,10 @@ if __name__ == "__main__":
     try:
         recommendation = generate_recommendation(user_query, test_df)
         print(f"\n[RECOMMENDATION]\n{recommendation}")
+
+        print("\n[STREAMED RECOMMENDATION]")
+        for chunk in generate_recommendation_stream(user_query, test_df):
+            print(chunk, end="", flush=True)
+        print()
     except Exception as e:
         logging.critical(f"Unexpected error during recommendation generation: {e}")
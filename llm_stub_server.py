@@ -0,0 +1,183 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -------------------- Canned Responses --------------------
+
+# Replies are chosen by the system prompt of each call site, so the stub can
+# stand in for Groq behind understand_query, generate_recommendation and the
+# LangChain SQL agent (a ReAct agent, which stops at "Final Answer:").
+CANNED_RESPONSES = {
+    "understanding product search queries": json.dumps({
+        "category": "laptop",
+        "intent": "search",
+        "important_attributes": {"price_under": 1500, "brand": "", "model": "", "use_case": "gaming"}
+    }),
+    "helps users choose laptops": (
+        "For gaming on a budget, the first option offers the best GPU for the price, "
+        "while the second is lighter and better suited to travel. Pick the first if "
+        "performance matters most."
+    ),
+    "default": "Thought: I now know the final answer.\nFinal Answer: The cheapest laptop in the catalog is the Acer Aspire 3.",
+}
+
+def pick_response(messages, responses=CANNED_RESPONSES):
+    system_text = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    for marker, reply in responses.items():
+        if marker != "default" and marker in system_text:
+            return reply
+    return responses["default"]
+
+# -------------------- Server --------------------
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Minimal /v1/chat/completions endpoint (plain or streamed) with configurable latency.
+    """
+
+    server_version = "LLMStub/1.0"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "stub-model", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        config = self.server.stub_config
+        delay = config["latency_ms"] + random.uniform(0, config["jitter_ms"])
+        time.sleep(delay / 1000)
+
+        messages = request.get("messages", [])
+        content = pick_response(messages, config["responses"])
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in messages)
+        completion_tokens = len(content.split())
+
+        with self.server.stats_lock:
+            self.server.request_count += 1
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage", False)
+            self._send_stream(request, content, usage if include_usage else None)
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-stub-{self.server.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub-model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def _send_stream(self, request, content, usage):
+        """
+        Server-sent events in the OpenAI chunk format, one word per chunk,
+        spaced token_latency_ms apart after the initial latency.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        base = {
+            "id": f"chatcmpl-stub-{self.server.request_count}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "stub-model"),
+        }
+
+        def send(chunk):
+            self.wfile.write(f"data: {json.dumps({**base, **chunk})}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.server.stub_config["token_latency_ms"] / 1000)
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            send({"choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        send({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if usage is not None:
+            send({"choices": [], "usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+def start_stub_server(host="127.0.0.1", port=0, latency_ms=200.0, jitter_ms=0.0, responses=None,
+                      token_latency_ms=0.0):
+    """
+    Starts the stub in a daemon thread and returns (server, base_url).
+    Port 0 picks a free port. Call server.shutdown() to stop it.
+    latency_ms is the time to the first token; streamed replies add
+    token_latency_ms between words.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.stub_config = {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "token_latency_ms": token_latency_ms,
+        "responses": responses or CANNED_RESPONSES,
+    }
+    server.request_count = 0
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+# -------------------- Example Usage --------------------
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for offline benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="fixed delay per completion")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform random delay")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0, help="delay between streamed words")
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                                    token_latency_ms=args.token_latency_ms)
+    print(f"[INFO] LLM stub listening at {url} (set Groq_Base_Url to use it)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,12 @@
+# User-facing texts of failed recommendations, shared by llm_recommendation
+# and the thin service client (which must not import the LLM stack)
+
+FAILURE_MESSAGE = "Oops, there was a problem generating your recommendation. Please try again later."
+# Trailing chunk of a stream that failed after its first token
+INTERRUPTED_MESSAGE = "\n\n⚠️ The recommendation was cut off. Please try again."
+
+def is_complete(recommendation):
+    """
+    False for the text of a failed or cut-off recommendation stream.
+    """
+    return recommendation != FAILURE_MESSAGE and not recommendation.endswith(INTERRUPTED_MESSAGE)
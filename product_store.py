@@ -0,0 +1,217 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+# -------------------- Configuration --------------------
+
+STORE_PATH = "embeddings/products"
+
+# Bump when the on-disk layout changes
+STORE_FORMAT = 1
+
+# Layout (one directory, no pickle anywhere):
+#   schema.json            column names, kinds and dtypes, row count
+#   ids.bin                int64 product IDs, ascending
+#   <col>.bin              numeric column, raw little-endian values
+#   <col>.data/.offsets    string column: UTF-8 bytes plus int64 offsets (n + 1)
+#   <col>.nulls            optional uint8 null flags for a string column
+#
+# Every file is opened with np.memmap, so all processes reading the store
+# share one page-cached copy and loading costs only a few system calls.
+
+# -------------------- Writer --------------------
+
+class ProductStoreWriter:
+    """
+    Appends DataFrame chunks (indexed by product_id, in ascending order) to
+    a new store, then atomically swaps it into place on close().
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.columns = None
+        self.rows = 0
+        self._files = {}
+        self._offsets = {}
+        self._has_nulls = {}
+
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+    def _open(self, name):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.tmp_path, name), "wb")
+        return self._files[name]
+
+    def _column_kinds(self, chunk):
+        columns = []
+        for name, dtype in chunk.dtypes.items():
+            if pd.api.types.is_bool_dtype(dtype):
+                columns.append({"name": name, "kind": "numeric", "dtype": "|u1"})
+            elif pd.api.types.is_numeric_dtype(dtype):
+                kind = np.dtype("<f8") if pd.api.types.is_float_dtype(dtype) else np.dtype("<i8")
+                columns.append({"name": name, "kind": "numeric", "dtype": kind.str})
+            else:
+                columns.append({"name": name, "kind": "string"})
+        return columns
+
+    def append(self, chunk):
+        if self.columns is None:
+            self.columns = self._column_kinds(chunk)
+            for column in self.columns:
+                if column["kind"] == "string":
+                    self._offsets[column["name"]] = 0
+                    self._open(f"{column['name']}.offsets").write(np.zeros(1, dtype="<i8").tobytes())
+
+        self._open("ids.bin").write(chunk.index.to_numpy(dtype="<i8").tobytes())
+
+        for column in self.columns:
+            name = column["name"]
+            values = chunk[name]
+            if column["kind"] == "numeric":
+                self._open(f"{name}.bin").write(values.to_numpy(dtype=column["dtype"]).tobytes())
+                continue
+
+            nulls = values.isna().to_numpy()
+            if nulls.any():
+                self._has_nulls[name] = True
+            encoded = values.fillna("").astype(str).str.encode("utf-8")
+            lengths = encoded.str.len().to_numpy(dtype="<i8")
+            offsets = self._offsets[name] + np.cumsum(lengths)
+            self._offsets[name] = int(offsets[-1]) if len(offsets) else self._offsets[name]
+            self._open(f"{name}.data").write(b"".join(encoded.tolist()))
+            self._open(f"{name}.offsets").write(offsets.astype("<i8").tobytes())
+            self._open(f"{name}.nulls").write(nulls.astype("u1").tobytes())
+
+        self.rows += len(chunk)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+        for column in self.columns or []:
+            if column["kind"] == "string":
+                column["nullable"] = self._has_nulls.get(column["name"], False)
+                if not column["nullable"]:
+                    os.remove(os.path.join(self.tmp_path, f"{column['name']}.nulls"))
+
+        with open(os.path.join(self.tmp_path, "schema.json"), "w", encoding="utf-8") as f:
+            json.dump({"format": STORE_FORMAT, "rows": self.rows, "columns": self.columns or []}, f, indent=2)
+
+        old_path = self.path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(self.tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+def write_product_store(df, path=STORE_PATH):
+    writer = ProductStoreWriter(path)
+    writer.append(df.sort_index())
+    writer.close()
+
+# -------------------- Reader --------------------
+
+class ProductStore:
+    """
+    Read-only, memory-mapped view of the product metadata.
+
+    Behaves enough like the old DataFrame for the search path: store[name]
+    returns a pandas Series over the whole column (numeric columns without
+    copying), store.index holds the product IDs, and frame(labels) gathers
+    just the requested rows into a small DataFrame.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        with open(os.path.join(path, "schema.json"), "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        if schema.get("format") != STORE_FORMAT:
+            raise ValueError(f"Unsupported product store format: {schema.get('format')}")
+
+        self.rows = schema["rows"]
+        self.columns = [column["name"] for column in schema["columns"]]
+        self._schema = {column["name"]: column for column in schema["columns"]}
+        self._strings = {}
+
+        self.ids = self._map("ids.bin", "<i8")
+        self.index = pd.Index(self.ids, name="product_id")
+
+    def _map(self, filename, dtype):
+        file_path = os.path.join(self.path, filename)
+        if os.path.getsize(file_path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(file_path, dtype=dtype, mode="r")
+
+    def __len__(self):
+        return self.rows
+
+    def _decode(self, name, positions=None):
+        data = self._map(f"{name}.data", "u1")
+        offsets = self._map(f"{name}.offsets", "<i8")
+        nulls = self._map(f"{name}.nulls", "u1") if self._schema[name].get("nullable") else None
+        positions = range(self.rows) if positions is None else positions
+
+        values = np.empty(len(positions), dtype=object)
+        for i, position in enumerate(positions):
+            if nulls is not None and nulls[position]:
+                values[i] = None
+            else:
+                values[i] = bytes(data[offsets[position]:offsets[position + 1]]).decode("utf-8")
+        return values
+
+    def column(self, name):
+        """
+        Whole column as a NumPy array: a zero-copy memmap for numeric columns,
+        a decoded (and cached) object array for strings.
+        """
+        column = self._schema[name]
+        if column["kind"] == "numeric":
+            return self._map(f"{name}.bin", column["dtype"])
+        if name not in self._strings:
+            self._strings[name] = self._decode(name)
+        return self._strings[name]
+
+    def __getitem__(self, name):
+        return pd.Series(self.column(name), index=self.index, name=name, copy=False)
+
+    def positions(self, labels):
+        labels = np.asarray(labels, dtype="int64")
+        positions = np.searchsorted(self.ids, labels)
+        if len(labels) and (positions.max() >= self.rows or (self.ids[positions] != labels).any()):
+            raise KeyError("Unknown product_id in lookup")
+        return positions
+
+    def take(self, name, labels):
+        """
+        Values of one column for the given products, in the given order.
+        """
+        positions = self.positions(labels)
+        column = self._schema[name]
+        if column["kind"] == "numeric":
+            return np.asarray(self._map(f"{name}.bin", column["dtype"])[positions])
+        if name in self._strings:
+            return self._strings[name][positions]
+        return self._decode(name, positions)
+
+    def frame(self, labels):
+        """
+        DataFrame with only the requested products, in the given order.
+        """
+        positions = self.positions(labels)
+        data = {}
+        for name in self.columns:
+            column = self._schema[name]
+            if column["kind"] == "numeric":
+                data[name] = np.asarray(self._map(f"{name}.bin", column["dtype"])[positions])
+            elif name in self._strings:
+                data[name] = self._strings[name][positions]
+            else:
+                data[name] = self._decode(name, positions)
+        return pd.DataFrame(data, index=pd.Index(self.ids[positions], name="product_id"))
+
+def load_product_store(path=STORE_PATH):
+    return ProductStore(path)
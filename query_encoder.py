@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+import resources
+import telemetry
+from cache import normalize_query
+from resources import EMBEDDING_MODEL_NAME
+
+# -------------------- Configuration --------------------
+
+# "torch" is the SentenceTransformer itself; "onnx" and "onnx-int8" run an
+# export of the same model (fp32, or with int8 dynamically quantized
+# weights) on ONNX Runtime, without importing torch
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+ENCODER_BACKENDS = {"torch": None, "onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+ENCODER_DIR = "embeddings/encoder"
+
+# ONNX Runtime intra-op threads (0 lets the runtime decide)
+ENCODER_THREADS = int(os.getenv("ENCODER_THREADS", 0))
+
+# Exports whose embeddings fall below this cosine similarity to the torch
+# embeddings (on any parity text) are rejected
+PARITY_MIN_COSINE = float(os.getenv("ENCODER_PARITY_MIN_COSINE", 0.99))
+
+# Query embeddings kept in memory, keyed by normalized query text
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+
+# Layout of ENCODER_DIR (written by export_onnx):
+#   model.onnx         transformer exported from the SentenceTransformer
+#   model.int8.onnx    same graph with int8 weights (dynamic quantization)
+#   tokenizer.json     fast tokenizer, loaded with the tokenizers package
+#   encoder.json       model name, max length, pooling and parity results
+
+# -------------------- ONNX Encoder --------------------
+
+class OnnxEncoder:
+    """
+    Mean-pooled sentence embeddings from an ONNX export of the model. Has
+    the encode() signature of SentenceTransformer, so callers need not know
+    which backend is loaded.
+    """
+
+    def __init__(self, model_file, encoder_dir=ENCODER_DIR, threads=ENCODER_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(encoder_dir, "encoder.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(encoder_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(encoder_dir, model_file), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        if isinstance(texts, str):
+            texts = [texts]
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype="int64"),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype="int64"),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype="int64"),
+            }
+            hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+            mask = feeds["attention_mask"][..., None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.config.get("normalize"):
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype("float32"))
+        return np.concatenate(batches) if batches else np.empty((0, 0), dtype="float32")
+
+def load_encoder(backend=ENCODER_BACKEND, encoder_dir=ENCODER_DIR):
+    """
+    The query encoder for the given backend.
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Choose from: {', '.join(ENCODER_BACKENDS)}")
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    encoder = OnnxEncoder(ENCODER_BACKENDS[backend], encoder_dir)
+    if encoder.config.get("model") != EMBEDDING_MODEL_NAME:
+        raise ValueError(f"ONNX encoder was exported from {encoder.config.get('model')}, "
+                         f"not {EMBEDDING_MODEL_NAME}; run query_encoder.py --export")
+    parity = encoder.config.get("parity", {}).get(backend)
+    if parity is not None and parity["min_cosine"] < PARITY_MIN_COSINE:
+        raise ValueError(f"'{backend}' encoder failed its parity check "
+                         f"(min cosine {parity['min_cosine']:.4f} < {PARITY_MIN_COSINE})")
+    return encoder
+
+# -------------------- Query Embedding Cache --------------------
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU of query embeddings keyed by normalized query text.
+    """
+
+    def __init__(self, max_entries=QUERY_EMBEDDING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return vector
+
+    def set(self, key, vector):
+        if self.max_entries <= 0:
+            return
+        vector = np.array(vector, dtype="float32")
+        vector.setflags(write=False)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
+
+query_embeddings = QueryEmbeddingCache()
+
+def encode_queries(texts, batch_size=32):
+    """
+    Embeddings of the normalized query texts, one row per text (a fresh
+    array the caller may modify). Cached queries skip the encoder; the rest
+    are encoded in one batch.
+    """
+    keys = [normalize_query(text) for text in texts]
+    vectors = [query_embeddings.get(key) for key in keys]
+    for vector in vectors:
+        telemetry.record_cache("query_embedding", "miss" if vector is None else "hit")
+
+    missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+    if missing:
+        encoded = resources.get("embedding_model").encode(missing, batch_size=batch_size, convert_to_numpy=True)
+        fresh = dict(zip(missing, np.asarray(encoded, dtype="float32")))
+        for key, vector in fresh.items():
+            query_embeddings.set(key, vector)
+        vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+    if not vectors:
+        return np.empty((0, 0), dtype="float32")
+    return np.stack(vectors).astype("float32")
+
+# -------------------- Export and Parity --------------------
+
+PARITY_TEXTS = [
+    "HP laptop under 800 euros",
+    "lightweight student laptop",
+    "Suggest a good gaming laptop which has 16GB RAM and is lightweight.",
+    "MacBook Air between 900 and 1500",
+    "Asus gaming laptop with GTX 1060",
+    "Lenovo ThinkPad for office work",
+    "High performance laptops for video editing which has above 32 GB RAM",
+    "Dell XPS 13 Ultrabook 13.3 inch, 8 RAM, Windows 10, 1.2kg, Full HD 1920x1080, "
+    "Intel Core i7 8550U @ 1.8GHz, 256 SSD, Intel UHD Graphics 620, Price: 1499.0 euros",
+]
+
+def parity_check(encoder, reference, texts=PARITY_TEXTS):
+    """
+    Cosine similarity between the encoder's embeddings and the reference
+    (torch) embeddings of the same texts, plus the per-text encode time.
+    """
+    expected = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype="float32")
+    start = time.perf_counter()
+    actual = np.stack([encoder.encode([text], convert_to_numpy=True)[0] for text in texts])
+    per_text_ms = (time.perf_counter() - start) * 1000 / len(texts)
+
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    actual /= np.linalg.norm(actual, axis=1, keepdims=True)
+    cosine = (expected * actual).sum(axis=1)
+    return {"min_cosine": round(float(cosine.min()), 6), "mean_cosine": round(float(cosine.mean()), 6),
+            "ms_per_query": round(per_text_ms, 3)}
+
+def export_onnx(encoder_dir=ENCODER_DIR, quantize=True, opset=14):
+    """
+    Exports the SentenceTransformer's transformer to ONNX (and an int8
+    dynamically quantized copy), saves its tokenizer and records parity
+    with the torch embeddings in encoder.json. Returns the parity results.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    tmp_dir = encoder_dir + ".tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    sample = tokenizer(["an example laptop query"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    print(f"[INFO] Exporting {EMBEDDING_MODEL_NAME} to ONNX (opset {opset})...")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer, tuple(sample[name] for name in names), os.path.join(tmp_dir, "model.onnx"),
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=opset,
+        )
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        print("[INFO] Quantizing weights to int8...")
+        quantize_dynamic(os.path.join(tmp_dir, "model.onnx"), os.path.join(tmp_dir, "model.int8.onnx"),
+                         weight_type=QuantType.QInt8)
+
+    tokenizer.backend_tokenizer.save(os.path.join(tmp_dir, "tokenizer.json"))
+    config = {
+        "model": EMBEDDING_MODEL_NAME,
+        "max_seq_length": model.max_seq_length,
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+        "pooling": "mean",
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(tmp_dir, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    parity = {"torch": parity_check(model, model)}
+    for backend, model_file in ENCODER_BACKENDS.items():
+        if model_file and os.path.exists(os.path.join(tmp_dir, model_file)):
+            parity[backend] = parity_check(OnnxEncoder(model_file, tmp_dir), model)
+    config["parity"] = parity
+    with open(os.path.join(tmp_dir, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    shutil.rmtree(encoder_dir, ignore_errors=True)
+    os.replace(tmp_dir, encoder_dir)
+    return parity
+
+def print_parity(parity):
+    print(f"\n{'backend':<10} {'min cos':>9} {'mean cos':>9} {'ms/query':>9}")
+    for backend, result in parity.items():
+        flag = "" if result["min_cosine"] >= PARITY_MIN_COSINE else "  FAILED"
+        print(f"{backend:<10} {result['min_cosine']:>9.4f} {result['mean_cosine']:>9.4f} "
+              f"{result['ms_per_query']:>9.2f}{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the query encoder to ONNX and check parity with torch.")
+    parser.add_argument("--export", action="store_true", help="export fp32 and int8 ONNX models, then check parity")
+    parser.add_argument("--no-quantize", action="store_true", help="skip the int8 model")
+    parser.add_argument("--parity", action="store_true", help="re-check parity of an existing export")
+    args = parser.parse_args()
+
+    if args.export:
+        results = export_onnx(quantize=not args.no_quantize)
+    elif args.parity:
+        reference = load_encoder("torch")
+        results = {backend: parity_check(OnnxEncoder(model_file), reference)
+                   for backend, model_file in ENCODER_BACKENDS.items()
+                   if model_file and os.path.exists(os.path.join(ENCODER_DIR, model_file))}
+    else:
+        parser.error("choose --export or --parity")
+    print_parity(results)
+    if any(result["min_cosine"] < PARITY_MIN_COSINE for result in results.values()):
+        raise SystemExit(1)
@@ -0,0 +1,238 @@
+import re
+import json
+import sqlite3
+
+# -------------------- Configuration --------------------
+
+DB_PATH = "db/laptops.db"
+
+# Longest vocabulary phrase (in tokens) matched against the query
+MAX_PHRASE_TOKENS = 4
+
+# Weight (kg) at or below which a stated limit means "lightweight"
+LIGHTWEIGHT_MAX_KG = 2.0
+
+USE_CASE_SYNONYMS = {
+    "gaming": ["gaming", "gamer"],
+    "student": ["student", "college", "school"],
+    "office": ["office", "business", "work"],
+    "video editing": ["video editing", "content creation", "editing"]
+}
+
+LIGHTWEIGHT_WORDS = {"lightweight", "light", "portable", "thin", "slim", "travel", "ultralight", "ultraportable"}
+RECOMMEND_WORDS = {"recommend", "suggest", "best", "good", "advice"}
+
+# Spec words with no matching attribute; semantic search handles them
+SPEC_WORDS = {
+    "ssd", "hdd", "ram", "memory", "storage", "screen", "display", "touchscreen", "touch",
+    "ips", "fhd", "hd", "4k", "retina", "graphics", "gpu", "cpu", "processor", "battery",
+}
+
+# Filler words that carry no constraint the LLM would extract either
+STOPWORDS = {
+    "a", "an", "the", "for", "with", "and", "or", "of", "to", "in", "on", "my", "me", "i", "im",
+    "is", "it", "that", "which", "who", "has", "have", "having", "be", "can", "some", "any",
+    "need", "want", "looking", "look", "show", "find", "get", "give", "buy", "search", "list",
+    "please", "laptop", "laptops", "notebook", "notebooks", "computer", "pc", "one", "ones",
+    "new", "nice", "great", "top", "decent", "should", "would", "like", "something", "also",
+    "use", "used", "using", "weighs", "weight", "weighing", "price", "priced", "cost", "costs",
+    "budget", "around", "euro", "euros", "eur", "what", "are", "there",
+} | RECOMMEND_WORDS
+
+# Currencies the catalog is not priced in; such queries go to the LLM
+FOREIGN_CURRENCY = re.compile(r"₹|\$|£|\b(?:rs|inr|rupees?|usd|dollars?|gbp|pounds?)\b")
+
+NUMBER = r"(\d+(?:[.,]\d+)?)\s*(k)?"
+EURO = r"(?:€|eur(?:os?)?)?"
+UPPER_WORDS = r"(?:under|below|less than|cheaper than|up to|upto|max(?:imum)?|within|at most|<=?)"
+LOWER_WORDS = r"(?:over|above|more than|at least|min(?:imum)?|from|starting at|>=?)"
+
+WEIGHT_LIMIT = re.compile(rf"{UPPER_WORDS}\s*{NUMBER}\s*(?:kg|kgs|kilos?|kilograms?)\b")
+PRICE_RANGE = re.compile(rf"(?:between\s+)?{EURO}\s*{NUMBER}\s*{EURO}\s*(?:-|to|and)\s*{EURO}\s*{NUMBER}\s*{EURO}(?![\d.]*\s*(?:gb|tb|kg|inch|\"|hz|ghz))")
+PRICE_UPPER = re.compile(rf"{UPPER_WORDS}\s*{EURO}\s*{NUMBER}\s*{EURO}(?![\d.]*\s*(?:gb|tb|kg|inch|\"|hz|ghz))")
+PRICE_LOWER = re.compile(rf"{LOWER_WORDS}\s*{EURO}\s*{NUMBER}\s*{EURO}(?![\d.]*\s*(?:gb|tb|kg|inch|\"|hz|ghz))")
+SPEC = re.compile(r"\b\d+(?:\.\d+)?\s*(?:gb|tb|inch(?:es)?|\"|hz|ghz|cores?)\b(?:\s*(?:of\s+)?(?:ram|memory|ssd|hdd|storage|screen|display))?")
+
+TOKEN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+
+# -------------------- Vocabulary --------------------
+
+def build_vocabulary(db_path=DB_PATH):
+    """
+    Builds the gazetteer from distinct catalog values: phrase -> (kind, value).
+    Product names map to themselves, and their leading series word (e.g.
+    "thinkpad") maps to the series so partial model names still match.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        def distinct(column):
+            rows = conn.execute(f"SELECT DISTINCT {column} FROM laptops WHERE {column} IS NOT NULL")
+            return [str(r[0]).strip() for r in rows if str(r[0]).strip()]
+
+        companies = distinct("Company")
+        products = conn.execute(
+            "SELECT DISTINCT Product, Company FROM laptops WHERE Product IS NOT NULL"
+        ).fetchall()
+        hardware = distinct("CPU_model") + distinct("GPU_model")
+    finally:
+        conn.close()
+
+    phrases = {}
+
+    def add(phrase, kind, value):
+        key = " ".join(TOKEN.findall(phrase.lower()))
+        if key and key not in STOPWORDS and len(key.split()) <= MAX_PHRASE_TOKENS:
+            phrases.setdefault(key, (kind, value))
+
+    for company in companies:
+        add(company, "brand", company)
+
+    product_companies = {}
+    for product, company in products:
+        key = " ".join(TOKEN.findall(product.lower()))
+        product_companies.setdefault(key, set()).add(company)
+        series = key.split()[0] if key else ""
+        if len(series) >= 4 and series.isalpha():
+            product_companies.setdefault(series, set()).add(company)
+
+    for key, owners in product_companies.items():
+        add(key, "model", key)
+
+    for name in hardware:
+        add(name, "hardware", name)
+        for token in TOKEN.findall(name.lower()):
+            if len(token) >= 2:
+                add(token, "hardware", name)
+
+    # A model that belongs to exactly one company implies that brand
+    model_brands = {key: next(iter(owners)) for key, owners in product_companies.items() if len(owners) == 1}
+    return {"phrases": phrases, "model_brands": model_brands}
+
+# -------------------- Parsing --------------------
+
+def _amount(number, thousands):
+    value = float(number.replace(",", "")) * (1000 if thousands else 1)
+    return int(value) if value.is_integer() else value
+
+def _consume(pattern, text):
+    """
+    Returns the first match and the text with that match blanked out.
+    """
+    match = pattern.search(text)
+    if not match:
+        return None, text
+    return match, text[:match.start()] + " " + text[match.end():]
+
+def parse_query(user_query, vocabulary):
+    """
+    Rule and gazetteer based query understanding.
+
+    Returns the same structure understand_query produces plus a confidence
+    in [0, 1]: the share of meaningful query tokens the rules explained.
+    """
+    text = user_query.lower() if isinstance(user_query, str) else ""
+    attributes = {}
+
+    if FOREIGN_CURRENCY.search(text):
+        return None, 0.0
+
+    match, text = _consume(WEIGHT_LIMIT, text)
+    if match and _amount(match.group(1).replace(",", "."), None) <= LIGHTWEIGHT_MAX_KG:
+        attributes["lightweight"] = True
+
+    match, text = _consume(PRICE_RANGE, text)
+    if match:
+        low, high = _amount(*match.group(1, 2)), _amount(*match.group(3, 4))
+        attributes["price_above"], attributes["price_under"] = min(low, high), max(low, high)
+    else:
+        match, text = _consume(PRICE_UPPER, text)
+        if match:
+            attributes["price_under"] = _amount(*match.group(1, 2))
+        match, text = _consume(PRICE_LOWER, text)
+        if match:
+            attributes["price_above"] = _amount(*match.group(1, 2))
+
+    text = SPEC.sub(" ", text)
+
+    for use_case, synonyms in USE_CASE_SYNONYMS.items():
+        for synonym in synonyms:
+            pattern = rf"\b{synonym}\b"
+            if re.search(pattern, text):
+                attributes.setdefault("use_case", use_case)
+                text = re.sub(pattern, " ", text)
+
+    tokens = TOKEN.findall(text)
+    phrases = vocabulary["phrases"]
+    explained = [False] * len(tokens)
+
+    # Longest phrase first, so "macbook air" wins over "macbook"
+    for size in range(min(MAX_PHRASE_TOKENS, len(tokens)), 0, -1):
+        for start in range(len(tokens) - size + 1):
+            if any(explained[start:start + size]):
+                continue
+            entry = phrases.get(" ".join(tokens[start:start + size]))
+            if entry is None:
+                continue
+            kind, value = entry
+            if kind == "brand":
+                attributes.setdefault("brand", value)
+            elif kind == "model":
+                attributes.setdefault("model", value)
+            explained[start:start + size] = [True] * size
+
+    intent = "search"
+    unknown = 0
+    content = 0
+    for token, known in zip(tokens, explained):
+        if token in RECOMMEND_WORDS:
+            intent = "recommend"
+        if token in LIGHTWEIGHT_WORDS:
+            attributes["lightweight"] = True
+            known = True
+        if token in STOPWORDS or token in SPEC_WORDS:
+            continue
+        content += 1
+        unknown += not known
+
+    if attributes.get("model") and not attributes.get("brand"):
+        brand = vocabulary["model_brands"].get(attributes["model"])
+        if brand:
+            attributes["brand"] = brand
+
+    for key in ["brand", "model", "use_case"]:
+        attributes.setdefault(key, "")
+
+    confidence = 1.0 if content == 0 else 1.0 - unknown / content
+    parsed = {"category": "laptop", "intent": intent, "important_attributes": attributes}
+    return parsed, confidence
+
+def parse_query_json(user_query, vocabulary):
+    """
+    Same as parse_query, but formatted exactly like clean_response output.
+    """
+    parsed, confidence = parse_query(user_query, vocabulary)
+    return (json.dumps(parsed, indent=2) if parsed is not None else None), confidence
+
+# -------------------- Example Usage --------------------
+
+if __name__ == "__main__":
+    import time
+
+    vocabulary = build_vocabulary()
+    queries = [
+        "HP laptop under 800 euros",
+        "lightweight student laptop",
+        "Suggest a good gaming laptop which has 16GB RAM and is lightweight.",
+        "I need a lightweight Dell laptop which weight under 1 kg",
+        "MacBook Air between 900 and 1500",
+        "Looking for gaming laptops under 60000 rupees",
+        "Give me laptops with SSD and Ryzen 7",
+        "something that runs my favourite simulation software smoothly",
+    ]
+
+    for q in queries:
+        start = time.perf_counter()
+        parsed, confidence = parse_query(q, vocabulary)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\n[QUERY] {q}  (confidence={confidence:.2f}, {elapsed_ms:.3f} ms)")
+        print(json.dumps(parsed))
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import string
+import numpy as np
+import pandas as pd
+import resources
+
+# -------------------- Configuration --------------------
+
+RENDER_STORE_PATH = "embeddings/renders"
+
+# Shown for values a source does not provide (scraped feeds often lack
+# weight or GPU details)
+MISSING_VALUE = "n/a"
+
+# Every string a product is turned into. They are rendered once per build
+# (vectorized, chunk by chunk) into a store next to the product store, so
+# the request path only gathers precomputed strings by product ID.
+TEMPLATES = {
+    # Text the sentence encoder embeds (and the content hash covers)
+    "embedding": (
+        "{Company} {Product} {TypeName} {Inches} inch, {Ram} RAM, {OS}, {Weight}kg, {Screen} "
+        "{ScreenW}x{ScreenH}, Touchscreen: {Touchscreen}, IPS: {IPSpanel}, Retina: {RetinaDisplay}, "
+        "{CPU_company} {CPU_model} @ {CPU_freq}GHz, {PrimaryStorage} {PrimaryStorageType}, "
+        "{SecondaryStorage} {SecondaryStorageType}, {GPU_company} {GPU_model}, Price: {Price_euros} euros"
+    ),
+    # One line of the recommendation prompt
+    "prompt_line": (
+        "- {Company} {Product}, {Ram}GB RAM, "
+        "{PrimaryStorage}GB {PrimaryStorageType}, "
+        "{GPU_model} GPU, €{Price_euros}, Weight: {Weight} kg"
+    ),
+    # One entry of the plain-text search response (search_laptops)
+    "result": (
+        "\n{Product} by {Company}\n"
+        "  - RAM: {Ram} GB\n"
+        "  - CPU: {CPU_model}\n"
+        "  - GPU: {GPU_model}\n"
+        "  - Price: €{Price_euros}\n"
+        "  - Weight: {Weight} kg\n"
+        "  - Storage: {PrimaryStorage} GB\n"
+    ),
+    # Markdown card shown in the Search view
+    "card": (
+        "**{Company} {Product}**\n"
+        "- 💾 RAM: {Ram}GB | 💽 {PrimaryStorage}GB {PrimaryStorageType}\n"
+        "- 🎮 GPU: {GPU_model} | 💰 Price: €{Price_euros} | ⚖️ {Weight} kg"
+    ),
+}
+
+# Stored renderings are only valid for the templates that produced them
+RENDER_VERSION = hashlib.sha1(json.dumps(TEMPLATES, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+# -------------------- Rendering --------------------
+
+def render_template(template, df):
+    """
+    Renders a str.format template for every row at once with vectorized
+    string concatenation. Values are formatted like str() would, so the
+    result matches template.format(**row), except that missing values
+    render as MISSING_VALUE. Raises KeyError for a column the frame lacks.
+    """
+    rendered = pd.Series("", index=df.index, dtype=object)
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            rendered = rendered + literal
+        if field is None:
+            continue
+        if spec or conversion:
+            raise ValueError(f"Format specs are not supported in render templates: {{{field}}}")
+        values = df[field]
+        text = values.astype(str)
+        if values.hasnans:
+            text = text.where(values.notna(), MISSING_VALUE)
+        rendered = rendered + text
+    return rendered
+
+def render_frame(df):
+    """
+    Every rendering of every row, one column per template.
+    """
+    return pd.DataFrame({kind: render_template(template, df) for kind, template in TEMPLATES.items()},
+                        index=df.index)
+
+# -------------------- Lookup --------------------
+
+def _load_render_store():
+    from product_store import load_product_store
+
+    store = load_product_store(RENDER_STORE_PATH)
+    if resources.get("index_manifest").get("render_version") != RENDER_VERSION:
+        raise ValueError("Render templates changed since the last build; rebuild the index")
+    if not np.array_equal(store.ids, resources.get("product_store").ids):
+        raise ValueError("Render store is out of date with the product store; rebuild the index")
+    return store
+
+resources.register("render_store", _load_render_store)
+
+# Set when the render store fails to load; later calls render on the fly
+# instead of retrying the load (a rebuild needs a restart anyway)
+_unavailable = False
+
+def renderings(kind, df):
+    """
+    The kind rendering of each row of df, in row order.
+
+    Frames indexed by product_id (everything the search path returns) are
+    served from the render store. Other frames, products the store lacks,
+    or a missing or stale store fall back to rendering on the fly.
+    """
+    global _unavailable
+    if df.index.name == "product_id" and len(df) and not _unavailable:
+        try:
+            store = resources.get("render_store")
+        except RuntimeError as e:
+            print(f"[WARNING] Rendering products on the fly: {e}")
+            _unavailable = True
+        else:
+            try:
+                return pd.Series(store.take(kind, df.index.to_numpy(dtype="int64")), index=df.index, dtype=object)
+            except KeyError:
+                pass
+    return render_template(TEMPLATES[kind], df)
@@ -0,0 +1,180 @@
+import json
+import time
+import threading
+
+# -------------------- Configuration --------------------
+
+INDEX_PATH = "embeddings/faiss.index"
+MANIFEST_PATH = "embeddings/manifest.json"
+PRODUCT_STORE_PATH = "embeddings/products"
+LEXICAL_INDEX_PATH = "embeddings/lexical.npz"
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+LAPTOP_DB_URI = "sqlite:///db/laptops.db"
+
+# -------------------- Registry State --------------------
+
+# Module-level state is shared by every Streamlit session running in this
+# process, so each resource is built at most once per process.
+_loaders = {}
+_resources = {}
+_load_timings = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, loader):
+    """
+    Registers a zero-argument loader for a lazily built resource.
+    """
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+
+def get(name):
+    """
+    Returns the named resource, loading it on first use.
+    """
+    if name in _resources:
+        return _resources[name]
+
+    if name not in _loaders:
+        raise KeyError(f"Unknown resource: {name}")
+
+    with _locks[name]:
+        # Another thread may have finished loading while we waited
+        if name in _resources:
+            return _resources[name]
+
+        start = time.perf_counter()
+        try:
+            resource = _loaders[name]()
+        except Exception as e:
+            raise RuntimeError(f"Failed to load resource '{name}': {e}")
+        _load_timings[name] = time.perf_counter() - start
+        _resources[name] = resource
+        print(f"[INFO] Loaded resource '{name}' in {_load_timings[name]:.2f}s")
+        return resource
+
+
+def is_loaded(name):
+    return name in _resources
+
+
+def load_timings():
+    """
+    Returns a copy of the per-resource load times in seconds.
+    """
+    return dict(_load_timings)
+
+
+def warmup(names=None):
+    """
+    Eagerly loads the given resources (all registered ones by default) and
+    returns their load timings. Failures are reported, not raised, so a
+    missing optional resource never blocks the others.
+    """
+    names = list(_loaders) if names is None else names
+    for name in names:
+        try:
+            get(name)
+        except Exception as e:
+            print(f"[WARNING] Warmup failed for '{name}': {e}")
+    return {name: _load_timings[name] for name in names if name in _load_timings}
+
+# -------------------- Resource Loaders --------------------
+
+def _load_index_manifest():
+    # Indexes built before manifests existed are exact, unnormalized L2
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"spec": "flat-l2", "metric": "l2", "normalize": False, "search_params": {}}
+
+
+def _load_faiss_index():
+    import faiss
+
+    # Memory-map the vectors so worker processes share one page-cached copy;
+    # older FAISS builds without mmap support read the file normally
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", getattr(faiss, "IO_FLAG_MMAP", 0))
+    try:
+        index = faiss.read_index(INDEX_PATH, mmap_flag | getattr(faiss, "IO_FLAG_READ_ONLY", 0))
+    except RuntimeError:
+        index = faiss.read_index(INDEX_PATH)
+    for name, value in get("index_manifest").get("search_params", {}).items():
+        faiss.ParameterSpace().set_index_parameter(index, name, value)
+    return index
+
+
+def _load_product_store():
+    from product_store import load_product_store
+    return load_product_store(PRODUCT_STORE_PATH)
+
+
+def _load_lexical_index():
+    import numpy as np
+    from lexical_index import load_lexical_index
+
+    index = load_lexical_index(LEXICAL_INDEX_PATH)
+    # Lexical positions double as product store positions for filter masks
+    if not np.array_equal(index.ids, get("product_store").ids):
+        raise ValueError("Lexical index is out of date with the product store; rebuild the index")
+    return index
+
+
+def _load_embedding_model():
+    # Backend chosen by ENCODER_BACKEND: torch, onnx or onnx-int8
+    from query_encoder import load_encoder
+    return load_encoder()
+
+
+def _load_filter_columns():
+    from search_handler import filter_columns
+    return filter_columns(get("product_store"))
+
+
+def _load_query_vocabulary():
+    from query_parser import build_vocabulary
+    return build_vocabulary()
+
+
+def _load_sql_llm():
+    from llm_client import chat_model
+
+    # Tokens reach callbacks as they arrive (used by query_assistant_stream)
+    return chat_model("query_assistant", temperature=0.4, streaming=True)
+
+
+def _load_sql_database():
+    from langchain_community.utilities import SQLDatabase
+    return SQLDatabase.from_uri(LAPTOP_DB_URI)
+
+
+def _load_sql_agent():
+    from langchain_community.agent_toolkits.sql.base import SQLDatabaseToolkit, create_sql_agent
+
+    llm = get("sql_llm")
+    toolkit = SQLDatabaseToolkit(db=get("sql_database"), llm=llm)
+    return create_sql_agent(llm=llm, toolkit=toolkit, verbose=True)
+
+
+register("index_manifest", _load_index_manifest)
+register("faiss_index", _load_faiss_index)
+register("product_store", _load_product_store)
+register("filter_columns", _load_filter_columns)
+register("lexical_index", _load_lexical_index)
+register("embedding_model", _load_embedding_model)
+register("query_vocabulary", _load_query_vocabulary)
+register("sql_llm", _load_sql_llm)
+register("sql_database", _load_sql_database)
+register("sql_agent", _load_sql_agent)
+
+# -------------------- Example Usage --------------------
+
+if __name__ == "__main__":
+    timings = warmup()
+    print("=" * 80)
+    for name, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        print(f"{name:<20} {seconds:8.3f}s")
@@ -1,28 +1,37 @@
 import os
-import pickle
 import json
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
 import numpy as np
-import pandas as pd
-import faiss
-from sentence_transformers import SentenceTransformer
-from llm_query_handler import understand_query
+import resources
+import telemetry
+from query_parser import USE_CASE_SYNONYMS
+from lexical_index import query_terms
+from renderings import renderings
 
-# -------------------- Load Resources with Error Handling --------------------
+# Heavy resources (FAISS index, product store, SentenceTransformer) are
+# loaded lazily through the shared registry on the first search, not at
+# import; so are the modules behind them (faiss, the LLM client stack and
+# the query encoder), imported by the functions that use them.
 
-try:
-    index = faiss.read_index("embeddings/faiss.index")
-except Exception as e:
-    raise RuntimeError(f"Failed to load FAISS index: {e}")
+# Per-stage deadlines (seconds) for the concurrent search pipeline
+UNDERSTANDING_TIMEOUT = float(os.getenv("SEARCH_UNDERSTANDING_TIMEOUT", 4.0))
+ENCODE_TIMEOUT = float(os.getenv("SEARCH_ENCODE_TIMEOUT", 10.0))
 
-try:
-    df = pd.read_pickle("embeddings/laptop_dataframe.pkl")
-except Exception as e:
-    raise RuntimeError(f"Failed to load DataFrame: {e}")
+# Lexical (BM25) retrieval: exact model-name hits skip the encoder, other
+# queries naming catalog terms fuse the lexical and dense rankings
+LEXICAL_ENABLED = os.getenv("SEARCH_LEXICAL", "1") == "1"
+HYBRID_DEPTH = int(os.getenv("SEARCH_HYBRID_DEPTH", 50))
+RRF_K = 60
 
-try:
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-except Exception as e:
-    raise RuntimeError(f"Failed to load SentenceTransformer model: {e}")
+# Batch search (search_laptops_batch): concurrent query-understanding calls
+# and queries per encoder batch
+BATCH_PARSE_WORKERS = int(os.getenv("SEARCH_BATCH_PARSE_WORKERS", 8))
+BATCH_ENCODE_SIZE = int(os.getenv("SEARCH_BATCH_ENCODE_SIZE", 64))
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
 
 # -------------------- Helper Functions --------------------
 
@@ -34,113 +43,488 @@ def clean_llm_response(response_text):
     except Exception:
         return response_text
 
-def apply_filters(query_analysis, results_df):
-    filters = query_analysis.get("important_attributes", {})
-    df_filtered = results_df.copy()
+def normalize_use_case(use_case_raw):
+    use_case = use_case_raw.lower() if isinstance(use_case_raw, str) else ""
+    for key, synonyms in USE_CASE_SYNONYMS.items():
+        if any(s in use_case for s in synonyms):
+            return key
+    return use_case
+
+def filter_columns(df):
+    """
+    Precomputes the normalized columns the filters compare against, so a
+    filter mask is a handful of vectorized comparisons with no DataFrame copy.
+    """
+    gpu = df["GPU_model"].fillna("")
+    return {
+        "labels": df.index.to_numpy(dtype="int64"),
+        "price": df["Price_euros"].to_numpy(),
+        "weight": df["Weight"].to_numpy(),
+        "ram": df["Ram"].to_numpy(),
+        "company": df["Company"].fillna("").str.lower(),
+        "product": df["Product"].fillna("").str.lower(),
+        "gaming_gpu": gpu.str.contains("GTX|RTX", case=False, na=False).to_numpy(),
+        "creator_gpu": gpu.str.contains("GTX|RTX|Quadro", case=False, na=False).to_numpy(),
+    }
+
+def filter_signature(query_analysis):
+    """
+    Reduces the parsed query to a hashable tuple of the constraints that
+    actually affect filtering, so identical constraints share a cached mask.
+    """
+    filters = query_analysis.get("important_attributes", {}) or {}
+
+    def number(key):
+        value = filters.get(key)
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+    def text(key):
+        value = filters.get(key)
+        return value.strip().lower() if isinstance(value, str) else ""
+
+    return (
+        number("price_under"),
+        number("price_above"),
+        filters.get("lightweight") is True,
+        text("brand"),
+        text("model"),
+        normalize_use_case(filters.get("use_case")),
+    )
+
+def filter_mask(signature, columns):
+    price_under, price_above, lightweight, brand, model_filter, use_case = signature
+    mask = np.ones(len(columns["price"]), dtype=bool)
 
     # Price filters
-    if isinstance(filters.get("price_under"), (int, float)):
-        df_filtered = df_filtered[df_filtered["Price_euros"] <= filters["price_under"]]
-    if isinstance(filters.get("price_above"), (int, float)):
-        df_filtered = df_filtered[df_filtered["Price_euros"] >= filters["price_above"]]
+    if price_under is not None:
+        mask &= columns["price"] <= price_under
+    if price_above is not None:
+        mask &= columns["price"] >= price_above
 
     # Lightweight filter
-    if filters.get("lightweight") is True:
-        df_filtered = df_filtered[df_filtered["Weight"] < 2.0]
-
-    # Brand filter
-    brand = filters.get("brand")
-    if isinstance(brand, str) and brand.strip():
-        df_filtered = df_filtered[
-            df_filtered["Company"].fillna("").str.lower().str.contains(brand.strip().lower(), na=False)
-        ]
-
-    # Model filter
-    model_filter = filters.get("model")
-    if isinstance(model_filter, str) and model_filter.strip():
-        df_filtered = df_filtered[
-            df_filtered["Product"].fillna("").str.lower().str.contains(model_filter.strip().lower(), na=False)
-        ]
+    if lightweight:
+        mask &= columns["weight"] < 2.0
+
+    # Brand and model filters
+    if brand:
+        mask &= columns["company"].str.contains(brand, regex=False).to_numpy()
+    if model_filter:
+        mask &= columns["product"].str.contains(model_filter, regex=False).to_numpy()
 
     # Use-case filter
-    use_case_raw = filters.get("use_case")
-    use_case = use_case_raw.lower() if isinstance(use_case_raw, str) else ""
+    if use_case == "gaming":
+        mask &= (columns["ram"] >= 8) & columns["gaming_gpu"]
+    elif use_case == "student":
+        mask &= (columns["weight"] < 2.0) & (columns["price"] < 1000)
+    elif use_case == "office":
+        mask &= columns["weight"] < 2.0
+    elif use_case == "video editing":
+        mask &= (columns["ram"] >= 16) & columns["creator_gpu"]
 
-    if use_case:
-        use_case_synonyms = {
-            "gaming": ["gaming", "gamer"],
-            "student": ["student", "college", "school"],
-            "office": ["office", "business", "work"],
-            "video editing": ["video editing", "content creation", "editing"]
-        }
-
-        for key, synonyms in use_case_synonyms.items():
-            if any(s in use_case for s in synonyms):
-                use_case = key
-                break
-
-        if use_case == "gaming":
-            df_filtered = df_filtered[
-                (df_filtered["Ram"] >= 8) &
-                (df_filtered["GPU_model"].fillna("").str.contains("GTX|RTX", case=False, na=False))
-            ]
-        elif use_case == "student":
-            df_filtered = df_filtered[
-                (df_filtered["Weight"] < 2.0) &
-                (df_filtered["Price_euros"] < 1000)
-            ]
-        elif use_case == "office":
-            df_filtered = df_filtered[df_filtered["Weight"] < 2.0]
-        elif use_case == "video editing":
-            df_filtered = df_filtered[
-                (df_filtered["Ram"] >= 16) &
-                (df_filtered["GPU_model"].fillna("").str.contains("GTX|RTX|Quadro", case=False, na=False))
-            ]
-
-    return df_filtered
+    return mask
 
-# -------------------- Main Function --------------------
+@lru_cache(maxsize=256)
+def catalog_mask(signature):
+    """
+    Boolean mask over the whole catalog for the given filter signature.
+    Cached, so repeated constraints cost nothing after the first query.
+    """
+    mask = filter_mask(signature, resources.get("filter_columns"))
+    mask.setflags(write=False)
+    return mask
 
-def search_laptops(user_query, top_k=5):
-    print(f"[INFO] User query: {user_query}")
+@telemetry.traced("apply_filters")
+def apply_filters(query_analysis, results_df):
+    mask = filter_mask(filter_signature(query_analysis), filter_columns(results_df))
+    telemetry.set_attribute("result_count", int(mask.sum()))
+    return results_df[mask]
+
+def search_parameters(selector):
+    """
+    Builds FAISS search parameters carrying the ID selector. IVF indexes
+    need their own parameter type, which must also repeat nprobe.
+    """
+    import faiss
+
+    search_params = resources.get("index_manifest").get("search_params", {})
+    if "nprobe" in search_params:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=search_params["nprobe"])
+    return faiss.SearchParameters(sel=selector)
+
+def filtered_search(index, embedding, labels, mask, top_k):
+    """
+    Returns the FAISS labels (product IDs) of the top_k nearest catalog rows
+    that pass the filter mask. The candidate set is pushed into FAISS as an
+    ID selector; indexes that reject search parameters fall back to an
+    adaptive over-fetch that widens k until enough filtered hits exist.
+    """
+    candidates = labels[mask]
+    k = min(top_k, candidates.size)
+    if k == 0:
+        return candidates
+
+    if candidates.size == labels.size:
+        _, indices = index.search(embedding, k)
+        return indices[0][indices[0] >= 0]
+
+    import faiss
 
     try:
-        llm_response = understand_query(user_query)
-        query_data = json.loads(clean_llm_response(llm_response))
+        params = search_parameters(faiss.IDSelectorBatch(candidates))
+        _, indices = index.search(embedding, k, params=params)
+        return indices[0][indices[0] >= 0]
+    except (RuntimeError, TypeError, AttributeError):
+        pass
+
+    fetch = min(max(top_k * 4, 32), index.ntotal)
+    while True:
+        _, indices = index.search(embedding, fetch)
+        hits = indices[0][indices[0] >= 0]
+        hits = hits[np.isin(hits, candidates)]
+        if hits.size >= k or fetch >= index.ntotal:
+            return hits[:k]
+        fetch = min(fetch * 4, index.ntotal)
+
+# -------------------- Lexical Retrieval --------------------
+
+# Set when the lexical index fails to load; later queries skip it instead
+# of retrying the load (a rebuild needs a restart anyway)
+_lexical_unavailable = False
+
+def lexical_match(user_query):
+    """
+    Returns (query terms, exact-hit positions or None) for the query, or
+    None when it has no content terms or the lexical index is unavailable.
+    """
+    global _lexical_unavailable
+    if not LEXICAL_ENABLED or _lexical_unavailable:
+        return None
+    terms = query_terms(user_query)
+    if not terms:
+        return None
+    try:
+        index = resources.get("lexical_index")
+    except RuntimeError as e:
+        print(f"[WARNING] Lexical search unavailable: {e}")
+        _lexical_unavailable = True
+        return None
+    return terms, index.exact_positions(terms)
+
+def fuse_rankings(rankings, top_k, k=RRF_K):
+    """
+    Reciprocal rank fusion: every ranking contributes 1 / (k + rank) per
+    product, so items ranked well by both lexical and dense search win.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, label in enumerate(ranking.tolist()):
+            scores[label] = scores.get(label, 0.0) + 1.0 / (k + rank + 1)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return np.array(best, dtype="int64")
+
+# -------------------- Pipeline Stages --------------------
+
+def parse_query_data(user_query, use_llm=True):
+    from llm_query_handler import understand_query
+
+    try:
+        llm_response = understand_query(user_query, use_llm)
+        if llm_response is None:
+            return {"important_attributes": {}}
+        return json.loads(clean_llm_response(llm_response))
     except Exception as e:
         print(f"[WARNING] LLM understanding failed: {e}")
+        return {"important_attributes": {}}
+
+@telemetry.traced("encode_query")
+def encode_query(user_query):
+    return encode_queries([user_query])
+
+def encode_queries(queries, batch_size=32):
+    """
+    Encodes the queries in one batched model call (cached queries skip the
+    encoder); one row per query.
+    """
+    import faiss
+    from query_encoder import encode_queries as embed_queries
+
+    embeddings = embed_queries(list(queries), batch_size)
+    if resources.get("index_manifest").get("normalize"):
+        faiss.normalize_L2(embeddings)
+    return embeddings
+
+def rank_candidates(embedding, query_data, top_k, lexical=None):
+    """
+    Returns the top_k filtered catalog rows for the query, sorted by price.
+
+    Rows are the nearest to the query embedding, fused with the BM25
+    ranking when lexical (from lexical_match) carries query terms. With no
+    embedding, the exact lexical hits are ranked by BM25 alone; None is
+    returned if none of them passes the filters.
+    """
+    labels = rank_labels(embedding, query_data, top_k, lexical)
+    if labels is None:
+        return None
+    return resources.get("product_store").frame(labels).sort_values(by="Price_euros")
+
+def rank_labels(embedding, query_data, top_k, lexical=None, dense_labels=None):
+    """
+    Product IDs behind rank_candidates, in rank order. dense_labels, when
+    given, is the filtered dense ranking already computed for this query
+    (by a batched index search) and replaces the per-query index search.
+    """
+    columns = resources.get("filter_columns")
+    terms, exact = lexical if lexical is not None else (None, None)
+
+    with telemetry.span("apply_filters"):
+        mask = catalog_mask(filter_signature(query_data))
+        telemetry.set_attribute("result_count", int(mask.sum()))
+
+    if embedding is None:
+        with telemetry.span("lexical_search", top_k=top_k):
+            allowed = np.zeros(mask.shape, dtype=bool)
+            allowed[exact] = True
+            allowed &= mask
+            labels = resources.get("lexical_index").search(terms, top_k, allowed)
+            telemetry.set_attribute("result_count", int(labels.size))
+        if labels.size == 0:
+            return None
+        path = "lexical"
+    else:
+        depth = max(top_k, HYBRID_DEPTH) if terms else top_k
+        if dense_labels is not None:
+            labels = dense_labels[:depth]
+        else:
+            with telemetry.span("index_search", top_k=depth):
+                labels = filtered_search(resources.get("faiss_index"), embedding, columns["labels"], mask, depth)
+                telemetry.set_attribute("result_count", int(labels.size))
+        path = "dense"
+        if terms:
+            with telemetry.span("lexical_search", top_k=depth):
+                lexical_labels = resources.get("lexical_index").search(terms, depth, mask)
+                telemetry.set_attribute("result_count", int(lexical_labels.size))
+            if lexical_labels.size:
+                labels = fuse_rankings([labels, lexical_labels], top_k)
+                path = "hybrid"
+        labels = labels[:top_k]
+
+    telemetry.increment("search_requests_total", result="empty" if labels.size == 0 else "ok")
+    telemetry.increment("retrieval_path_total", path=path)
+    return labels
+
+def format_results(filtered_df):
+    if filtered_df.empty:
+        return "Sorry, no laptops match your criteria."
+
+    return "Top Results:\n" + "".join(renderings("result", filtered_df))
+
+# -------------------- Main Function --------------------
+
+def find_laptops(user_query, top_k=5, use_llm=True):
+    """
+    Runs query understanding (network-bound) and query encoding (CPU-bound)
+    concurrently, then searches with the parsed filters. If understanding
+    misses its deadline the search degrades to unfiltered results; the
+    pending call still completes in the background and fills the cache.
+    Queries that exactly name catalog models are ranked lexically and skip
+    the encoder, unless the filters reject every lexical hit.
+
+    With use_llm=False understanding comes from its caches only (an
+    uncached query is searched unfiltered), as in the local cache warmup.
+
+    Returns (results DataFrame, parsed query data). Raises RuntimeError
+    with a user-facing message when no results can be produced.
+    """
+    with telemetry.request("find_laptops"):
+        return _find_laptops(user_query, top_k, use_llm)
+
+def _find_laptops(user_query, top_k, use_llm=True):
+    print(f"[INFO] User query: {user_query}")
+
+    lexical = lexical_match(user_query)
+    exact = lexical is not None and lexical[1] is not None
+
+    # Copying the context keeps the worker-thread spans inside this request's trace
+    parse_future = _executor.submit(contextvars.copy_context().run, parse_query_data, user_query, use_llm)
+    encode_future = None if exact else _submit_encode(user_query)
+
+    embedding = _encode_result(encode_future) if encode_future is not None else None
+
+    try:
+        query_data = parse_future.result(timeout=UNDERSTANDING_TIMEOUT)
+    except FutureTimeoutError:
+        print(f"[WARNING] Query understanding timed out after {UNDERSTANDING_TIMEOUT}s; returning unfiltered results")
+        telemetry.increment("stage_timeouts_total", stage="understand_query")
         query_data = {"important_attributes": {}}
 
     try:
-        embedding = model.encode([user_query], convert_to_numpy=True).astype('float32')
-        _, indices = index.search(embedding, top_k)
+        if embedding is None:
+            results = rank_candidates(None, query_data, top_k, lexical)
+            if results is not None:
+                return results, query_data
     except Exception as e:
-        return f"Error during semantic search: {e}"
+        raise RuntimeError(f"Error during semantic search: {e}")
+
+    if embedding is None:
+        embedding = _encode_result(_submit_encode(user_query))
 
     try:
-        result_df = df.iloc[indices[0]].copy()
+        return rank_candidates(embedding, query_data, top_k, lexical), query_data
     except Exception as e:
-        return f"Error accessing results: {e}"
+        raise RuntimeError(f"Error during semantic search: {e}")
 
-    filtered_df = apply_filters(query_data, result_df)
+def _submit_encode(user_query):
+    return _executor.submit(contextvars.copy_context().run, encode_query, user_query)
 
-    if filtered_df.empty:
-        return "Sorry, no laptops match your criteria."
+def _encode_result(encode_future):
+    try:
+        return encode_future.result(timeout=ENCODE_TIMEOUT)
+    except FutureTimeoutError:
+        raise RuntimeError(f"Error during semantic search: query encoding timed out after {ENCODE_TIMEOUT}s")
+    except Exception as e:
+        raise RuntimeError(f"Error during semantic search: {e}")
+
+def search_laptops(user_query, top_k=5):
+    try:
+        filtered_df, _ = find_laptops(user_query, top_k)
+    except RuntimeError as e:
+        return str(e)
+    return format_results(filtered_df)
+
+async def search_laptops_async(user_query, top_k=5):
+    """
+    Native asyncio variant of search_laptops with the same stage overlap and
+    timeouts, for callers that already run an event loop.
+    """
+    with telemetry.request("search_laptops_async"):
+        return await _search_laptops_async(user_query, top_k)
+
+async def _search_laptops_async(user_query, top_k):
+    print(f"[INFO] User query: {user_query}")
 
-    filtered_df = filtered_df.sort_values(by="Price_euros")
+    lexical = await asyncio.to_thread(lexical_match, user_query)
+    exact = lexical is not None and lexical[1] is not None
 
-    # Format response
-    response = "Top Results:\n"
-    for _, row in filtered_df.iterrows():
-        response += f"\n{row['Product']} by {row['Company']}\n"
-        response += f"  - RAM: {row['Ram']} GB\n"
-        response += f"  - CPU: {row['CPU_model']}\n"
-        response += f"  - GPU: {row['GPU_model']}\n"
-        response += f"  - Price: €{row['Price_euros']}\n"
-        response += f"  - Weight: {row['Weight']} kg\n"
-        response += f"  - Storage: {row['PrimaryStorage']} GB\n"
+    parse_task = asyncio.ensure_future(
+        asyncio.wait_for(asyncio.to_thread(parse_query_data, user_query), UNDERSTANDING_TIMEOUT)
+    )
+    encode_task = None if exact else asyncio.ensure_future(
+        asyncio.wait_for(asyncio.to_thread(encode_query, user_query), ENCODE_TIMEOUT)
+    )
+
+    embedding = None
+    if encode_task is not None:
+        try:
+            embedding = await encode_task
+        except asyncio.TimeoutError:
+            parse_task.cancel()
+            return f"Error during semantic search: query encoding timed out after {ENCODE_TIMEOUT}s"
+        except Exception as e:
+            parse_task.cancel()
+            return f"Error during semantic search: {e}"
+
+    try:
+        query_data = await parse_task
+    except asyncio.TimeoutError:
+        print(f"[WARNING] Query understanding timed out after {UNDERSTANDING_TIMEOUT}s; returning unfiltered results")
+        telemetry.increment("stage_timeouts_total", stage="understand_query")
+        query_data = {"important_attributes": {}}
+
+    try:
+        if embedding is None:
+            filtered_df = await asyncio.to_thread(rank_candidates, None, query_data, top_k, lexical)
+            if filtered_df is not None:
+                return format_results(filtered_df)
+            embedding = await asyncio.wait_for(asyncio.to_thread(encode_query, user_query), ENCODE_TIMEOUT)
+        filtered_df = await asyncio.to_thread(rank_candidates, embedding, query_data, top_k, lexical)
+    except asyncio.TimeoutError:
+        return f"Error during semantic search: query encoding timed out after {ENCODE_TIMEOUT}s"
+    except Exception as e:
+        return f"Error during semantic search: {e}"
+    return format_results(filtered_df)
+
+# -------------------- Batch Search --------------------
+
+def batch_dense_labels(embeddings, masks, depth):
+    """
+    Filtered dense rankings for many queries from one matrix index search.
+    Every query is over-fetched once and filtered with its own mask; the
+    few whose filters reject too many neighbours fall back to a per-query
+    filtered_search.
+    """
+    index = resources.get("faiss_index")
+    labels = resources.get("filter_columns")["labels"]
+    fetch = min(max(depth * 4, 32), index.ntotal)
+    if fetch == 0:
+        return [np.empty(0, dtype="int64") for _ in masks]
+
+    with telemetry.span("index_search", top_k=fetch, queries=len(masks)):
+        _, indices = index.search(embeddings, fetch)
+
+    rankings = []
+    for row, (neighbours, mask) in enumerate(zip(indices, masks)):
+        hits = neighbours[neighbours >= 0]
+        hits = hits[mask[np.searchsorted(labels, hits)]][:depth]
+        if hits.size < min(depth, int(mask.sum())) and fetch < index.ntotal:
+            hits = filtered_search(index, embeddings[row:row + 1], labels, mask, depth)
+        rankings.append(hits)
+    return rankings
+
+def search_laptops_batch(queries, top_k=5, parse_workers=BATCH_PARSE_WORKERS, batch_size=BATCH_ENCODE_SIZE):
+    """
+    Searches many queries at once, for offline and bulk traffic.
+
+    Query understanding runs concurrently across parse_workers threads
+    (duplicates are parsed once), every query that needs the encoder is
+    encoded in one batched call, and the dense retrieval is a single
+    matrix index search; filters and lexical fusion then apply per query.
+    Result rows are gathered from the product store in one pass.
+
+    Returns one dict per query, in input order, with the query, its parsed
+    query_data and a results DataFrame sorted by price (like find_laptops).
+    Raises RuntimeError when the batch cannot be searched.
+    """
+    with telemetry.request("search_laptops_batch", queries=len(queries)):
+        return _search_laptops_batch(list(queries), top_k, parse_workers, batch_size)
+
+def _search_laptops_batch(queries, top_k, parse_workers, batch_size):
+    unique = list(dict.fromkeys(queries))
+    print(f"[INFO] Batch search: {len(queries)} queries ({len(unique)} distinct)")
+
+    with ThreadPoolExecutor(max_workers=max(1, parse_workers), thread_name_prefix="search-batch") as pool:
+        parsed = pool.map(lambda q, ctx: ctx.run(parse_query_data, q),
+                          unique, [contextvars.copy_context() for _ in unique])
+        lexical = [lexical_match(query) for query in unique]
+        query_data = list(parsed)
+
+    try:
+        # Exact model-name hits are ranked lexically and skip the encoder
+        ranked = [None] * len(unique)
+        for i, match in enumerate(lexical):
+            if match is not None and match[1] is not None:
+                ranked[i] = rank_labels(None, query_data[i], top_k, match)
+
+        pending = [i for i in range(len(unique)) if ranked[i] is None]
+        if pending:
+            with telemetry.span("encode_query", queries=len(pending)):
+                embeddings = encode_queries([unique[i] for i in pending], batch_size)
+            depth = max(top_k, HYBRID_DEPTH) if any(lexical[i] for i in pending) else top_k
+            masks = [catalog_mask(filter_signature(query_data[i])) for i in pending]
+            dense = batch_dense_labels(embeddings, masks, depth)
+            for i, embedding, labels in zip(pending, embeddings, dense):
+                ranked[i] = rank_labels(embedding.reshape(1, -1), query_data[i], top_k, lexical[i], labels)
+
+        # One gather for every query's rows, then a cheap per-query slice
+        shared = np.unique(np.concatenate(ranked)) if ranked else np.empty(0, dtype="int64")
+        frame = resources.get("product_store").frame(shared)
+    except Exception as e:
+        raise RuntimeError(f"Error during batch search: {e}")
 
-    return response
+    results = {
+        query: {"query": query, "query_data": data, "results": frame.loc[labels].sort_values(by="Price_euros")}
+        for query, data, labels in zip(unique, query_data, ranked)
+    }
+    return [dict(results[query]) for query in queries]
 
 # -------------------- Example Usage --------------------
 
@@ -0,0 +1,225 @@
+import os
+import json
+import asyncio
+import argparse
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import resources
+import telemetry
+from search_handler import find_laptops, search_laptops_batch
+from llm_recommendation import generate_recommendation, generate_recommendation_stream
+from agent import query_assistant, query_assistant_stream
+from user_history import save_history_to_db, get_user_history
+from cache_warmer import warm_caches_in_background
+
+# -------------------- Configuration --------------------
+
+# Every worker process loads the models, index and agent once at startup;
+# the index and product store are memory-mapped, so workers share their pages.
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", 8000))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 1))
+
+# Queries per /search/batch call; each may need an LLM parse on the shared client
+BATCH_MAX_QUERIES = int(os.getenv("SERVICE_BATCH_MAX_QUERIES", 100))
+
+# -------------------- Request Coalescing --------------------
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: the first caller runs the function
+    in a worker thread and later callers with the same key await the same
+    result instead of repeating the work. Results are not kept once the
+    call finishes (the caches behind each call handle reuse).
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, fn, *args):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            telemetry.increment("service_coalesced_requests_total", endpoint=key[0])
+        # A disconnecting client must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    def inflight(self):
+        return len(self._inflight)
+
+_flights = SingleFlight()
+
+def coalesce_key(endpoint, *parts):
+    return (endpoint, json.dumps(parts, sort_keys=True, default=str))
+
+# -------------------- Schemas --------------------
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    top_k: int = Field(5, ge=1, le=50)
+
+class SearchResponse(BaseModel):
+    query: str
+    query_data: Optional[dict] = None
+    results: List[dict]
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUERIES)
+    top_k: int = Field(5, ge=1, le=50)
+
+class RecommendRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    # Candidates from an earlier /search; searched again when omitted
+    product_ids: Optional[List[int]] = None
+    query_data: Optional[dict] = None
+    top_k: int = Field(5, ge=1, le=50)
+
+class RecommendResponse(BaseModel):
+    recommendation: str
+    product_ids: List[int]
+
+class AssistantRequest(BaseModel):
+    question: str = Field(..., min_length=1)
+
+class AssistantResponse(BaseModel):
+    answer: str
+
+class HistoryEntry(BaseModel):
+    user_id: str
+    query: str = ""
+    recommendation: str = ""
+
+class HistoryItem(BaseModel):
+    query: Optional[str] = None
+    recommendation: Optional[str] = None
+    timestamp: Optional[str] = None
+
+# -------------------- Helpers --------------------
+
+def frame_records(df):
+    """
+    JSON-safe rows of a results frame (NaN becomes null), with product_id.
+    """
+    return json.loads(df.reset_index().to_json(orient="records"))
+
+def _search(query, top_k):
+    try:
+        results, query_data = find_laptops(query, top_k)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"query": query, "query_data": query_data, "results": frame_records(results)}
+
+def _candidates(request):
+    """
+    Candidate frame and parsed query for a recommendation request.
+    """
+    if request.product_ids is None:
+        try:
+            return find_laptops(request.query, request.top_k)
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    try:
+        products = resources.get("product_store").frame(request.product_ids)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown product_id in request")
+    return products, request.query_data
+
+def _recommend(request):
+    products, query_data = _candidates(request)
+    recommendation = generate_recommendation(request.query, products, query_data)
+    return {"recommendation": recommendation, "product_ids": [int(i) for i in products.index]}
+
+# -------------------- App --------------------
+
+@asynccontextmanager
+async def lifespan(app):
+    timings = await asyncio.to_thread(resources.warmup)
+    print(f"[INFO] Service worker {os.getpid()} ready; loaded {len(timings)} resources")
+    # Hot history queries are replayed in the background: every worker warms
+    # its own in-process caches, and whichever claims the warmup first also
+    # runs the LLM pass; requests are served meanwhile
+    warm_caches_in_background()
+    yield
+
+app = FastAPI(
+    title="DealWizard API",
+    description="Laptop search, recommendations, the SQL assistant and query history.",
+    version="1.0",
+    lifespan=lifespan,
+)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid(), "inflight": _flights.inflight(), "loaded": resources.load_timings()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return telemetry.prometheus_text()
+
+@app.post("/search", response_model=SearchResponse)
+async def search(request: SearchRequest):
+    return await _flights.do(coalesce_key("search", request.query, request.top_k),
+                             _search, request.query, request.top_k)
+
+@app.post("/search/batch", response_model=List[SearchResponse])
+async def search_batch(request: BatchSearchRequest):
+    try:
+        entries = await asyncio.to_thread(search_laptops_batch, request.queries, request.top_k)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return [dict(entry, results=frame_records(entry["results"])) for entry in entries]
+
+@app.post("/recommend", response_model=RecommendResponse)
+async def recommend(request: RecommendRequest):
+    key = coalesce_key("recommend", request.query, request.product_ids, request.query_data, request.top_k)
+    return await _flights.do(key, _recommend, request)
+
+@app.post("/recommend/stream", response_class=StreamingResponse)
+async def recommend_stream(request: RecommendRequest):
+    """
+    Recommendation as a plain-text token stream. Streams are not coalesced;
+    repeats of a finished recommendation come from its cache.
+    """
+    products, query_data = await asyncio.to_thread(_candidates, request)
+    return StreamingResponse(generate_recommendation_stream(request.query, products, query_data),
+                             media_type="text/plain; charset=utf-8")
+
+@app.post("/assistant", response_model=AssistantResponse)
+async def assistant(request: AssistantRequest):
+    answer = await _flights.do(coalesce_key("assistant", request.question), query_assistant, request.question)
+    return {"answer": answer}
+
+@app.post("/assistant/stream", response_class=StreamingResponse)
+async def assistant_stream(request: AssistantRequest):
+    return StreamingResponse(query_assistant_stream(request.question), media_type="text/plain; charset=utf-8")
+
+@app.get("/history/{user_id}", response_model=List[HistoryItem])
+async def history(user_id: str, limit: int = Query(50, ge=1, le=500)):
+    rows = await asyncio.to_thread(get_user_history, user_id, limit=limit)
+    return [{"query": q, "recommendation": r, "timestamp": ts} for q, r, ts in rows]
+
+@app.post("/history", status_code=202)
+async def add_history(entries: List[HistoryEntry]):
+    # Queued for the background writer; returns before the rows hit disk
+    save_history_to_db([entry.model_dump() for entry in entries])
+    return {"queued": len(entries)}
+
+# -------------------- Entry Point --------------------
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the DealWizard search/recommendation service.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS,
+                        help="worker processes, each loading the models once")
+    args = parser.parse_args()
+
+    uvicorn.run("service:app", host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,88 @@
+import os
+import requests
+import pandas as pd
+from messages import FAILURE_MESSAGE, INTERRUPTED_MESSAGE, is_complete
+
+# Thin client for service.py, with the same call signatures the Streamlit
+# app uses locally. Nothing heavy (models, index, agent) is loaded here.
+
+# -------------------- Configuration --------------------
+
+SERVICE_URL = os.getenv("DEALWIZARD_SERVICE_URL", "").rstrip("/")
+SERVICE_TIMEOUT = float(os.getenv("DEALWIZARD_SERVICE_TIMEOUT", 60.0))
+
+_session = requests.Session()
+
+def _url(path):
+    return f"{SERVICE_URL}{path}"
+
+def _detail(response):
+    try:
+        return response.json().get("detail", response.text)
+    except ValueError:
+        return response.text
+
+def _post(path, payload, stream=False):
+    response = _session.post(_url(path), json=payload, timeout=SERVICE_TIMEOUT, stream=stream)
+    if response.status_code >= 400:
+        raise RuntimeError(str(_detail(response)))
+    return response
+
+def _stream_text(response):
+    with response:
+        for text in response.iter_content(chunk_size=None, decode_unicode=True):
+            if text:
+                yield text
+
+# -------------------- Client API --------------------
+
+def find_laptops(user_query, top_k=5):
+    """
+    Returns (results DataFrame indexed by product_id, like the local
+    search path, so renderings() reads the render store; parsed query
+    data). Raises RuntimeError with the service's message on failure.
+    """
+    try:
+        body = _post("/search", {"query": user_query, "top_k": top_k}).json()
+    except requests.RequestException as e:
+        raise RuntimeError(f"Search service unavailable: {e}")
+    results = pd.DataFrame(body["results"])
+    if "product_id" in results.columns:
+        results = results.set_index("product_id")
+    return results, body["query_data"]
+
+def generate_recommendation_stream(user_query, products_df, query_data=None):
+    payload = {"query": user_query, "query_data": query_data}
+    if products_df.index.name == "product_id":
+        payload["product_ids"] = [int(i) for i in products_df.index]
+    started = False
+    try:
+        for text in _stream_text(_post("/recommend/stream", payload, stream=True)):
+            started = True
+            yield text
+    except (requests.RequestException, RuntimeError) as e:
+        print(f"[ERROR] Recommendation service failed: {e}")
+        yield INTERRUPTED_MESSAGE if started else FAILURE_MESSAGE
+
+def query_assistant_stream(user_input):
+    try:
+        yield from _stream_text(_post("/assistant/stream", {"question": user_input}, stream=True))
+    except (requests.RequestException, RuntimeError) as e:
+        yield f"[ERROR] Could not process query: {str(e)}"
+
+def save_history_to_db(history):
+    entries = [{"user_id": entry.get("user_id", "unknown"), "query": entry.get("query", ""),
+                "recommendation": entry.get("recommendation", "")} for entry in history]
+    try:
+        _post("/history", entries)
+    except (requests.RequestException, RuntimeError) as e:
+        print(f"[ERROR] Failed to save history: {e}")
+
+def get_user_history(user_id, limit=50):
+    try:
+        response = _session.get(_url(f"/history/{user_id}"), params={"limit": limit}, timeout=SERVICE_TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        print(f"[ERROR] Failed to retrieve history for user '{user_id}': {e}")
+        return []
+    return [(row["query"], row["recommendation"], row["timestamp"]) for row in response.json()]
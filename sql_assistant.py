@@ -0,0 +1,346 @@
+import os
+import re
+import json
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+import resources
+import telemetry
+from cache import PersistentCache
+
+# -------------------- Configuration --------------------
+
+DB_PATH = "db/laptops.db"
+TABLE_NAME = "laptops"
+
+# Rows returned by one query; keeps agent observations and cache entries small
+MAX_RESULT_ROWS = 50
+
+# Rows listed by a template answer when the question names no count
+DEFAULT_LIMIT = 10
+
+# Text columns with at most this many distinct values are listed in the schema summary
+LOW_CARDINALITY = 25
+
+LEAN_AGENT_MAX_ITERATIONS = int(os.getenv("ASSISTANT_MAX_ITERATIONS", 4))
+
+# -------------------- Read-Only Pool --------------------
+
+class ReadOnlyPool:
+    """
+    Per-thread read-only connections to the catalog database. mode=ro plus
+    query_only means nothing the agent generates can modify the catalog.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql, params=()):
+        """
+        Returns (column names, at most MAX_RESULT_ROWS rows).
+        """
+        cursor = self.connection().execute(sql, params)
+        columns = [d[0] for d in cursor.description or []]
+        return columns, cursor.fetchmany(MAX_RESULT_ROWS)
+
+def catalog_version(db_path=DB_PATH):
+    """
+    Changes whenever the catalog database is rewritten (e.g. by data_loader).
+    """
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return "missing"
+    return hashlib.sha1(f"{stat.st_size}-{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:12]
+
+# -------------------- Schema Summary --------------------
+
+def describe_schema(pool):
+    """
+    Compact description of the laptops table: column types, numeric ranges
+    and the values of low-cardinality text columns. Computed once and
+    embedded in the agent prompt, replacing the list-tables, schema and
+    sample-rows tool calls of the SQL toolkit.
+    """
+    conn = pool.connection()
+    count = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+    lines = [f"Table {TABLE_NAME} ({count} rows, one per laptop configuration):"]
+    for _, name, column_type, *_ in conn.execute(f"PRAGMA table_info({TABLE_NAME})").fetchall():
+        if column_type in ("INTEGER", "REAL"):
+            low, high = conn.execute(f'SELECT MIN("{name}"), MAX("{name}") FROM {TABLE_NAME}').fetchone()
+            detail = f"range {low} to {high}"
+        else:
+            values = [str(r[0]) for r in conn.execute(
+                f'SELECT DISTINCT "{name}" FROM {TABLE_NAME} WHERE "{name}" IS NOT NULL LIMIT {LOW_CARDINALITY + 1}'
+            )]
+            if len(values) <= LOW_CARDINALITY:
+                detail = "one of " + ", ".join(values)
+            else:
+                detail = "e.g. " + ", ".join(values[:3])
+        lines.append(f"- {name} {column_type or 'TEXT'}: {detail}")
+
+    fts = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (f"{TABLE_NAME}_fts",)
+    ).fetchone()
+    if fts is not None:
+        lines.append(
+            f"Full-text index {TABLE_NAME}_fts over Product, CPU_model and GPU_model; its rowid is "
+            f"product_id, e.g. WHERE product_id IN (SELECT rowid FROM {TABLE_NAME}_fts WHERE {TABLE_NAME}_fts MATCH 'rtx')"
+        )
+    return "\n".join(lines)
+
+def _load_sql_schema():
+    pool = resources.get("sql_pool")
+    companies = [r[0] for r in pool.connection().execute(
+        f"SELECT DISTINCT Company FROM {TABLE_NAME} WHERE Company IS NOT NULL"
+    )]
+    return {"summary": describe_schema(pool), "companies": companies}
+
+# -------------------- Result Cache --------------------
+
+def _load_sql_result_cache():
+    return PersistentCache(
+        "sql_results",
+        version=catalog_version(),
+        ttl_seconds=int(os.getenv("SQL_RESULT_CACHE_TTL", 24 * 3600)),
+        max_entries=int(os.getenv("SQL_RESULT_CACHE_SIZE", 512))
+    )
+
+def run_query(sql, params=()):
+    """
+    Runs one SELECT over the read-only pool, serving repeated statements
+    from the result cache. Returns (column names, rows).
+    """
+    sql = sql.strip().rstrip(";").strip()
+    if not re.match(r"(?is)^(select|with)\b", sql):
+        raise ValueError("Only SELECT queries are allowed.")
+
+    key = hashlib.sha1(json.dumps([sql, list(params)], default=str).encode("utf-8")).hexdigest()
+    cache = resources.get("sql_result_cache")
+    cached = cache.get(key)
+    telemetry.record_cache("sql_results", "hit" if cached is not None else "miss")
+    if cached is not None:
+        result = json.loads(cached)
+        return result["columns"], [tuple(row) for row in result["rows"]]
+
+    with telemetry.span("sql_query"):
+        columns, rows = resources.get("sql_pool").execute(sql, params)
+        telemetry.set_attribute("result_count", len(rows))
+    cache.set(key, json.dumps({"columns": columns, "rows": rows}, default=str))
+    return columns, rows
+
+# -------------------- Question Templates --------------------
+
+ORDERINGS = [
+    (re.compile(r"\b(?:cheapest|least expensive|lowest[- ]priced?|most affordable)\b"), '"Price_euros" ASC'),
+    (re.compile(r"\b(?:most expensive|priciest|highest[- ]priced?)\b"), '"Price_euros" DESC'),
+    (re.compile(r"\b(?:lightest|most portable)\b"), '"Weight" ASC'),
+    (re.compile(r"\b(?:most ram|most memory)\b"), '"Ram" DESC'),
+]
+
+LIMIT = re.compile(r"\b(?:top|first)\s+(\d+)\b|\b(\d+)\b(?=\s+(?:cheapest|least|lowest|most|priciest|highest|lightest))")
+
+RAM = re.compile(r"(?:(more than|over|above|at least|min(?:imum)?|>=?|less than|under|below|at most|max(?:imum)?|<=?)\s*)?"
+                 r"\b(\d+)\s*gb\b(?:\s*(?:of\s+)?(ram|memory))?")
+# A size in a question mentioning these may be graphics memory, so only an
+# explicit "GB RAM" is read as system memory
+GPU_MEMORY_WORDS = re.compile(r"\b(?:gpu|gpus|vram|graphics|video|dedicated)\b")
+PRICE = re.compile(r"(under|below|less than|cheaper than|at most|over|above|more than|at least)\s*€?\s*(\d+(?:\.\d+)?)\s*(?:€|eur(?:os?)?)?(?!\s*(?:gb|kg))")
+GPU = re.compile(r"\b(rtx|gtx|quadro|radeon|geforce|iris|mx\s?\d{3})\b")
+
+COMPARATORS = {
+    "more than": ">", "over": ">", "above": ">", ">": ">",
+    "at least": ">=", "min": ">=", "minimum": ">=", ">=": ">=",
+    "less than": "<", "under": "<", "below": "<", "cheaper than": "<", "<": "<",
+    "at most": "<=", "max": "<=", "maximum": "<=", "<=": "<=",
+}
+
+# Words that add no constraint; any other leftover word sends the question to the agent
+FILLER_WORDS = {
+    "a", "an", "the", "all", "any", "some", "me", "i", "you", "what", "which", "are", "is", "there",
+    "show", "list", "find", "give", "get", "see", "want", "need", "please", "can", "do", "have", "has",
+    "with", "and", "of", "by", "from", "in", "made", "that", "laptop", "laptops", "notebook", "notebooks",
+    "models", "options", "ones", "graphics", "gpu", "gpus", "card", "cards", "ram", "memory", "catalog",
+    "price", "prices", "euros", "euro", "eur", "available",
+}
+
+RESULT_COLUMNS = ["Company", "Product", "Ram", "GPU_model", "Price_euros", "Weight"]
+DEFAULT_ORDER = '"Price_euros" ASC'
+
+def _consume(match, text):
+    return text[:match.start()] + " " + text[match.end():]
+
+def match_template(question, companies):
+    """
+    Maps common question shapes ("top 5 cheapest laptops", "Dell laptops
+    with more than 16GB RAM", "laptops with RTX graphics") to parameterized
+    SQL. Returns (sql, params) or None when any part of the question is
+    not understood, so only fully explained questions skip the agent.
+    """
+    text = question.lower() if isinstance(question, str) else ""
+    clauses, params = [], []
+
+    limit = DEFAULT_LIMIT
+    match = LIMIT.search(text)
+    if match:
+        limit = min(int(match.group(1) or match.group(2)), MAX_RESULT_ROWS)
+        text = _consume(match, text)
+
+    order = None
+    for pattern, ordering in ORDERINGS:
+        match = pattern.search(text)
+        if match:
+            order = ordering
+            text = _consume(match, text)
+            break
+
+    match = RAM.search(text)
+    if match and (match.group(3) == "ram" or not GPU_MEMORY_WORDS.search(text)):
+        clauses.append(f'"Ram" {COMPARATORS.get(match.group(1), "=")} ?')
+        params.append(int(match.group(2)))
+        text = _consume(match, text)
+
+    match = PRICE.search(text)
+    if match:
+        clauses.append(f'"Price_euros" {COMPARATORS[match.group(1)]} ?')
+        params.append(float(match.group(2)))
+        text = _consume(match, text)
+
+    match = GPU.search(text)
+    if match:
+        clauses.append('"GPU_model" LIKE ?')
+        params.append(f"%{match.group(1).replace(' ', '')}%")
+        text = _consume(match, text)
+
+    brands = {company.lower(): company for company in companies}
+    words = re.findall(r"[a-z0-9]+", text)
+    named = {brands[word] for word in words if word in brands}
+    if len(named) > 1:
+        # "Dell and HP" or "Dell but not HP": left to the agent
+        return None
+    if named:
+        clauses.append('"Company" = ?')
+        params.append(named.pop())
+
+    leftover = [w for w in words if w not in FILLER_WORDS and w not in brands]
+    if leftover or (order is None and not clauses):
+        return None
+
+    sql = "SELECT " + ", ".join(f'"{c}"' for c in RESULT_COLUMNS) + f" FROM {TABLE_NAME}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {order or DEFAULT_ORDER} LIMIT ?"
+    return sql, params + [limit]
+
+def format_rows(rows):
+    if not rows:
+        return "No laptops in the catalog match that."
+    lines = [f"Here are {len(rows)} matching laptops:"]
+    for i, (company, product, ram, gpu, price, weight) in enumerate(rows, 1):
+        lines.append(f"{i}. {company} {product} - {ram}GB RAM, {gpu}, €{price}, {weight}kg")
+    return "\n".join(lines)
+
+def answer_from_template(question):
+    """
+    Answers the question with a SQL template and no LLM call, or returns
+    None when no template fits.
+    """
+    template = match_template(question, resources.get("sql_schema")["companies"])
+    if template is None:
+        return None
+    _, rows = run_query(*template)
+    return format_rows(rows)
+
+# -------------------- Lean Agent --------------------
+
+LEAN_AGENT_PROMPT = """You answer questions about laptops using a SQLite database.
+
+{schema}
+
+Write SQLite SELECT statements against the {table} table, quoting column names exactly as listed. Unless the user asks for a specific number, return at most 10 rows. Answer only from query results.
+
+You have access to the following tools:
+
+{{tools}}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{{tool_names}}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Question: {{input}}
+Thought:{{agent_scratchpad}}"""
+
+def _run_tool(sql):
+    sql = re.sub(r"^```(?:sql)?|```$", "", sql.strip()).strip()
+    try:
+        columns, rows = run_query(sql)
+    except (ValueError, sqlite3.Error) as e:
+        return f"Error: {e}"
+    if not rows:
+        return "No rows."
+    return "\n".join([" | ".join(columns)] + [" | ".join(str(v) for v in row) for row in rows])
+
+def _load_lean_sql_agent():
+    """
+    Single-tool ReAct agent with the schema in its prompt: a typical
+    question costs one query round-trip and one answer, instead of the
+    toolkit's list/schema/check/query sequence.
+    """
+    from langchain.agents import AgentExecutor, create_react_agent
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.tools import Tool
+
+    # The summary quotes catalog values; braces in them must not become template variables
+    summary = resources.get("sql_schema")["summary"].replace("{", "{{").replace("}", "}}")
+    prompt = PromptTemplate.from_template(LEAN_AGENT_PROMPT.format(schema=summary, table=TABLE_NAME))
+    tool = Tool(
+        name="sql_query",
+        func=_run_tool,
+        description="Runs one SQLite SELECT statement and returns the matching rows."
+    )
+    agent = create_react_agent(resources.get("sql_llm"), [tool], prompt)
+    return AgentExecutor(
+        agent=agent,
+        tools=[tool],
+        max_iterations=LEAN_AGENT_MAX_ITERATIONS,
+        handle_parsing_errors=True,
+        verbose=False
+    )
+
+resources.register("sql_pool", ReadOnlyPool)
+resources.register("sql_schema", _load_sql_schema)
+resources.register("sql_result_cache", _load_sql_result_cache)
+resources.register("lean_sql_agent", _load_lean_sql_agent)
+
+# -------------------- Example Usage --------------------
+
+if __name__ == "__main__":
+    questions = [
+        "What are the top 5 cheapest laptops?",
+        "List all Apple laptops with more than 8GB RAM",
+        "Show me laptops with RTX graphics",
+        "Which brand has the best build quality?",
+    ]
+
+    print(resources.get("sql_schema")["summary"])
+    for q in questions:
+        print(f"\n[QUESTION] {q}")
+        print(answer_from_template(q) or "[NO TEMPLATE]")
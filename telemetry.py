@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import uuid
+import random
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Optional sampling profiler for slow requests
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+# -------------------- Configuration --------------------
+
+METRIC_PREFIX = "dealwizard"
+
+# Finished request traces are appended here as JSON lines when set
+TRACE_JSONL_PATH = os.getenv("DEALWIZARD_TRACE_JSONL")
+
+# Requests slower than this are reported to the slow-request hook/profiler
+SLOW_REQUEST_MS = float(os.getenv("DEALWIZARD_SLOW_REQUEST_MS", 2000))
+
+# Share of requests run under the sampling profiler (needs pyinstrument)
+PROFILE_SAMPLE_RATE = float(os.getenv("DEALWIZARD_PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("DEALWIZARD_PROFILE_DIR", "profiles")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# -------------------- Metrics --------------------
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_recent_traces = deque(maxlen=100)
+_slow_request_hooks = []
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def increment(name, value=1, **labels):
+    """
+    Adds value to a counter, e.g. increment("cache_requests_total", cache="query", result="hit").
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """
+    Records one observation (in seconds for durations) into a histogram.
+    """
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def record_llm_usage(endpoint, usage):
+    """
+    Adds token counts from an OpenAI-style response.usage to the counters.
+    """
+    if usage is None:
+        return
+    for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        count = getattr(usage, field, None)
+        if count is None and isinstance(usage, dict):
+            count = usage.get(field)
+        if count:
+            increment("llm_tokens_total", count, endpoint=endpoint, kind=field.replace("_tokens", ""))
+    set_attribute("llm_tokens", getattr(usage, "total_tokens", None))
+
+def record_cache(cache, result):
+    increment("cache_requests_total", cache=cache, result=result)
+    set_attribute("cache", result)
+
+# -------------------- Spans --------------------
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start", "duration_ms", "attributes", "children")
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.start = time.time()
+        self.duration_ms = None
+        self.attributes = dict(attributes)
+        self.children = []
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+_current_span = contextvars.ContextVar("dealwizard_current_span", default=None)
+
+def current_span():
+    return _current_span.get()
+
+def set_attribute(key, value):
+    """
+    Attaches an attribute (result count, cache outcome, ...) to the active span.
+    """
+    span = _current_span.get()
+    if span is not None and value is not None:
+        span.attributes[key] = value
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a pipeline stage. Durations go to the stage_duration_seconds
+    histogram; nested spans form a per-request trace. Work handed to
+    threads keeps its parent when submitted via contextvars.copy_context().
+    """
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield current
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        current.duration_ms = elapsed * 1000
+        current.attributes.setdefault("status", status)
+        _current_span.reset(token)
+        observe("stage_duration_seconds", elapsed, stage=name)
+        if status == "error":
+            increment("stage_errors_total", stage=name)
+        if parent is not None:
+            with _lock:
+                parent.children.append(current)
+        else:
+            _finish_trace(current)
+
+def traced(name=None):
+    """
+    Decorator form of span(); defaults to the function name.
+    """
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def request(name, **attributes):
+    """
+    Root span for one user request. A sampled share of requests runs under
+    the pyinstrument sampling profiler; the profile is kept only if the
+    request turns out slow. Slow requests are also passed to any hooks
+    registered with on_slow_request().
+    """
+    profiler = None
+    if Profiler is not None and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        profiler = Profiler()
+        profiler.start()
+
+    with span(name, **attributes) as root:
+        try:
+            yield root
+        finally:
+            if profiler is not None:
+                profiler.stop()
+
+    if root.duration_ms >= SLOW_REQUEST_MS:
+        increment("slow_requests_total", request=name)
+        if profiler is not None:
+            _save_profile(root, profiler)
+        for hook in list(_slow_request_hooks):
+            try:
+                hook(root.to_dict())
+            except Exception as e:
+                print(f"[WARNING] Slow-request hook failed: {e}")
+
+def on_slow_request(hook):
+    """
+    Registers hook(trace_dict), called for every request slower than SLOW_REQUEST_MS.
+    """
+    _slow_request_hooks.append(hook)
+    return hook
+
+def _save_profile(root, profiler):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{root.name}-{root.trace_id}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        root.attributes["profile"] = path
+        print(f"[INFO] Slow request profile saved at {path}")
+    except Exception as e:
+        print(f"[WARNING] Failed to save profile: {e}")
+
+def _finish_trace(root):
+    trace = {"trace_id": root.trace_id, **root.to_dict()}
+    with _lock:
+        _recent_traces.append(trace)
+    if TRACE_JSONL_PATH:
+        try:
+            with open(TRACE_JSONL_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace, default=str) + "\n")
+        except OSError as e:
+            print(f"[WARNING] Failed to export trace: {e}")
+
+# -------------------- Export --------------------
+
+def recent_traces():
+    with _lock:
+        return list(_recent_traces)
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+def prometheus_text():
+    """
+    Renders all counters and histograms in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: dict(value, buckets=list(value["buckets"])) for key, value in _histograms.items()}
+
+    for metric in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"{METRIC_PREFIX}_{name}{_format_labels(labels)} {value}")
+
+    for metric in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} histogram")
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name != metric:
+                continue
+            for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                lines.append(f"{METRIC_PREFIX}_{name}_bucket{_format_labels(labels, [('le', str(bound))])} {count}")
+            lines.append(f"{METRIC_PREFIX}_{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{METRIC_PREFIX}_{name}_sum{_format_labels(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+def metrics_snapshot():
+    """
+    JSON-friendly copy of every counter and histogram.
+    """
+    with _lock:
+        return {
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in _counters.items()],
+            "histograms": [{"name": name, "labels": dict(labels), "count": h["count"], "sum": h["sum"],
+                            "buckets": dict(zip(map(str, DURATION_BUCKETS), h["buckets"]))}
+                           for (name, labels), h in _histograms.items()],
+        }
+
+def export_jsonl(path):
+    """
+    Appends the current metrics snapshot to path as one JSON line.
+    """
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"timestamp": time.time(), **metrics_snapshot()}) + "\n")
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _recent_traces.clear()
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the persistent caches out of db/ while tests run
+os.environ.setdefault("DEALWIZARD_CACHE_DB", os.path.join(tempfile.mkdtemp(prefix="dealwizard-tests-"), "cache.db"))
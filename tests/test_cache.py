@@ -0,0 +1,62 @@
+import pytest
+
+import cache
+from cache import PersistentCache, normalize_query
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+@pytest.mark.parametrize("text, expected", [
+    ("Gaming laptop ", "gaming laptop"),
+    ("  GAMING\tlaptop?!", "gaming laptop"),
+    ("gaming laptop.", "gaming laptop"),
+    (None, ""),
+])
+def test_normalize_query(text, expected):
+    assert normalize_query(text) == expected
+
+def test_memory_then_disk_hits(db_path):
+    first = PersistentCache("ns", "v1", db_path=db_path)
+    first.set("k", "value")
+    assert first.get("k") == "value"
+    assert first.snapshot()["memory_hits"] == 1
+
+    # A new process starts with an empty memory tier but reads the disk tier
+    second = PersistentCache("ns", "v1", db_path=db_path)
+    assert second.get("k") == "value"
+    assert second.get("k") == "value"
+    assert second.snapshot() == {"memory_hits": 1, "disk_hits": 1, "misses": 0, "memory_entries": 1}
+
+def test_namespaces_and_versions_are_isolated(db_path):
+    PersistentCache("ns", "v1", db_path=db_path).set("k", "old")
+    assert PersistentCache("other", "v1", db_path=db_path).get("k") is None
+    assert PersistentCache("ns", "v2", db_path=db_path).get("k") is None
+    # Opening v2 purged the v1 rows
+    assert PersistentCache("ns", "v1", db_path=db_path).get("k") is None
+
+def test_expired_entries_are_misses(db_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    store = PersistentCache("ns", "v1", ttl_seconds=60, db_path=db_path)
+    store.set("k", "value")
+    now[0] += 61
+    assert store.get("k") is None
+    assert PersistentCache("ns", "v1", ttl_seconds=60, db_path=db_path).get("k") is None
+
+def test_memory_tier_is_bounded_lru(db_path):
+    store = PersistentCache("ns", "v1", max_entries=2, db_path=db_path)
+    store.set("a", "1")
+    store.set("b", "2")
+    store.get("a")
+    store.set("c", "3")
+    assert list(store._memory) == ["a", "c"]
+    # Evicted from memory, still on disk
+    assert store.get("b") == "2"
+    assert store.snapshot()["disk_hits"] == 1
+
+def test_unavailable_disk_keeps_the_memory_tier(tmp_path):
+    # A directory cannot be opened as a database
+    store = PersistentCache("ns", "v1", db_path=str(tmp_path))
+    store.set("k", "value")
+    assert store.get("k") == "value"
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import cache_warmer
+from cache_warmer import claim_warmup, hot_queries
+from user_history import HistoryStore
+
+def write_history(db_path, rows):
+    """rows: (query, days_ago) pairs."""
+    store = HistoryStore(str(db_path))
+    with store._write_conn:
+        store._write_conn.executemany(
+            "INSERT INTO history (user_id, query, recommendation, timestamp) VALUES ('u', ?, '', ?)",
+            [(query, (datetime.now() - timedelta(days=days)).isoformat()) for query, days in rows])
+    store.close()
+
+def test_hot_queries_alternate_frequent_and_recent(tmp_path):
+    db_path = tmp_path / "history.db"
+    write_history(db_path, [
+        ("gaming laptop", 5), ("gaming laptop", 4), ("Gaming  Laptop", 3),
+        ("dell xps", 2), ("dell xps", 2),
+        ("cheap laptop", 1),
+        ("macbook air", 0),
+        ("too old", 90), ("too old", 90), ("too old", 90), ("too old", 90),
+    ])
+    queries = hot_queries(limit=10, window_days=30, db_path=str(db_path))
+    # Most used, most recent, next most used, next most recent...
+    assert queries == ["Gaming  Laptop", "macbook air", "dell xps", "cheap laptop"]
+    assert hot_queries(limit=2, window_days=30, db_path=str(db_path)) == ["Gaming  Laptop", "macbook air"]
+
+def test_hot_queries_without_history(tmp_path):
+    assert hot_queries(db_path=str(tmp_path / "missing.db")) == []
+
+def test_claim_warmup_is_exclusive_until_the_lease_expires(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    assert claim_warmup(600, db_path)
+    assert not claim_warmup(600, db_path)
+    assert claim_warmup(0, db_path)
+
+@pytest.fixture
+def warmed(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(cache_warmer, "CACHE_WARMUP_ENABLED", True)
+    monkeypatch.setattr(cache_warmer, "hot_queries", lambda limit, db_path: ["q1", "q2"])
+    monkeypatch.setattr(cache_warmer, "warm_query", lambda q, use_llm=True: calls.append((q, use_llm)))
+    return calls
+
+def test_every_process_warms_locally_but_only_the_lease_holder_calls_the_llm(monkeypatch, warmed):
+    monkeypatch.setattr(cache_warmer, "claim_warmup", lambda: False)
+    report = cache_warmer.warm_caches()
+    assert warmed == [("q1", False), ("q2", False)]
+    assert report["local_warmed"] == 2 and not report["llm_pass"]
+
+    warmed.clear()
+    monkeypatch.setattr(cache_warmer, "claim_warmup", lambda: True)
+    report = cache_warmer.warm_caches()
+    assert warmed == [("q1", False), ("q2", False), ("q1", True), ("q2", True)]
+    assert report["llm_warmed"] == 2 and report["llm_pass"]
+
+def test_time_budget_stops_before_the_llm_pass(monkeypatch, warmed):
+    def claim():
+        raise AssertionError("no lease is needed once the budget is spent")
+
+    monkeypatch.setattr(cache_warmer, "claim_warmup", claim)
+    report = cache_warmer.warm_caches(time_budget=0)
+    assert warmed == [] and report["stopped_by"] == "time"
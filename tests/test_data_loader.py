@@ -0,0 +1,45 @@
+import sqlite3
+
+import pandas as pd
+
+import data_loader
+
+CSV_PATH = data_loader.PRIMARY_CSV_PATH
+
+def load_ids(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return pd.read_sql("SELECT product_id, Company, Product, Price_euros FROM laptops", conn)
+    finally:
+        conn.close()
+
+def import_csv(df, tmp_path):
+    csv_path = tmp_path / "laptops.csv"
+    df.to_csv(csv_path, index=False)
+    db_path = str(tmp_path / "db" / "laptops.db")
+    assert data_loader.csv_to_sqlite(str(csv_path), db_path) == len(df)
+    return load_ids(db_path).set_index("product_id")
+
+def test_ids_survive_inserted_and_deleted_rows(tmp_path):
+    original = pd.read_csv(CSV_PATH).head(50)
+    first = import_csv(original, tmp_path)
+    assert list(first.index) == list(range(1, 51))
+
+    # New product on top, one product removed, one repriced
+    changed = original.drop(index=5).copy()
+    changed.loc[10, "Price_euros"] += 100
+    changed = pd.concat([original.iloc[[0]].assign(Product="Brand New"), changed])
+    second = import_csv(changed, tmp_path)
+
+    kept = first.drop(index=6)
+    assert second.loc[kept.index, "Product"].tolist() == kept["Product"].tolist()
+    assert second.loc[11, "Price_euros"] == first.loc[11, "Price_euros"] + 100
+    # The new product gets a fresh ID; the removed one's ID is not reused
+    assert second.index[second["Product"] == "Brand New"].tolist() == [51]
+    assert 6 not in second.index
+
+def test_duplicate_rows_get_distinct_ids(tmp_path):
+    original = pd.read_csv(CSV_PATH).head(3)
+    duplicated = pd.concat([original, original.iloc[[1]]], ignore_index=True)
+    ids = import_csv(duplicated, tmp_path)
+    assert sorted(ids.index) == [1, 2, 3, 4]
@@ -0,0 +1,49 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from lexical_index import LexicalIndex, LexicalIndexWriter, lexical_texts, tokenize, LEXICAL_FIELDS
+
+def catalog():
+    rows = [
+        ["Dell", "XPS 13", "Intel", "Core i7", "Intel", "Iris Xe"],
+        ["Asus", "ROG Strix", "AMD", "Ryzen 7", "Nvidia", "GeForce GTX 1050"],
+        ["Asus", "ROG Strix", "AMD", "Ryzen 7", "Nvidia", "GeForce GTX 1050"],
+        ["HP", None, "Intel", "Core i5", "Intel", "HD Graphics 620"],
+        ["Lenovo", "Legion 5", "AMD", "Ryzen 5", "Nvidia", "GeForce RTX 3060"],
+    ]
+    return pd.DataFrame(rows, columns=LEXICAL_FIELDS, index=pd.Index([3, 7, 8, 20, 21], name="product_id"))
+
+def build(tmp_path, df, chunk_size):
+    writer = LexicalIndexWriter(str(tmp_path / "lexical.npz"))
+    for start in range(0, len(df), chunk_size):
+        writer.append(df.iloc[start:start + chunk_size])
+    writer.close()
+    assert not (tmp_path / "lexical.npz.parts").exists()
+    return LexicalIndex(str(tmp_path / "lexical.npz"))
+
+def test_postings_match_tokenize(tmp_path):
+    df = catalog()
+    index = build(tmp_path, df, chunk_size=2)
+    counts = [Counter(tokenize(text)) for text in lexical_texts(df)]
+
+    assert index.ids.tolist() == df.index.tolist()
+    assert index.doc_lengths.tolist() == [sum(c.values()) for c in counts]
+    assert index.terms.tolist() == sorted(set().union(*counts))
+    for term in index.terms.tolist():
+        positions, tfs = index._postings(term)
+        expected = [(row, c[term]) for row, c in enumerate(counts) if term in c]
+        assert list(zip(positions.tolist(), tfs.astype(int).tolist())) == expected
+
+def test_chunking_does_not_change_the_index(tmp_path):
+    df = catalog()
+    whole = build(tmp_path / "whole", df, chunk_size=len(df))
+    split = build(tmp_path / "split", df, chunk_size=1)
+    for name in ("ids", "doc_lengths", "terms", "offsets", "postings", "tfs"):
+        assert np.array_equal(getattr(whole, name), getattr(split, name))
+
+def test_search_finds_joined_model_numbers(tmp_path):
+    index = build(tmp_path, catalog(), chunk_size=3)
+    assert index.search(["gtx1050"], top_k=5).tolist() == [7, 8]
+    assert index.exact_positions(["legion"]).tolist() == [4]
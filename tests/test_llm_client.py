@@ -0,0 +1,65 @@
+import httpx
+import pytest
+
+import llm_client
+from llm_client import GovernedTransport, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(llm_client.time, "sleep", clock.sleep)
+    return clock
+
+def test_burst_is_free_then_callers_wait_for_the_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert clock.now == pytest.approx(1.0)
+
+def test_tokens_refill_up_to_capacity(clock):
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    bucket.acquire(), bucket.acquire()
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+def test_timeout_gives_up_without_taking_a_token(clock):
+    bucket = TokenBucket(rate_per_minute=6, capacity=1)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire(timeout=5) is None
+    assert clock.now == 0.0
+    assert bucket.acquire(timeout=10) == pytest.approx(10.0)
+
+def test_zero_rate_disables_the_limit(clock):
+    bucket = TokenBucket(rate_per_minute=0, capacity=1)
+    assert all(bucket.acquire(timeout=0) == 0.0 for _ in range(100))
+
+def test_full_concurrency_rejects_after_the_queue_timeout(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_QUEUE_TIMEOUT", 0.05)
+    transport = GovernedTransport(TokenBucket(0, 1), max_concurrency=1)
+    release = transport._acquire_slot("test")
+    with pytest.raises(httpx.PoolTimeout):
+        transport._acquire_slot("test")
+    release()
+    release()  # idempotent: the slot is freed only once
+    transport._acquire_slot("test")()
+    transport.close()
+
+def test_rate_limit_rejects_when_no_token_comes_in_time(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_QUEUE_TIMEOUT", 1.0)
+    transport = GovernedTransport(TokenBucket(1, 1), max_concurrency=2)
+    transport._acquire_slot("test")()
+    with pytest.raises(httpx.PoolTimeout, match="rate limit"):
+        transport._acquire_slot("test")
+    transport.close()
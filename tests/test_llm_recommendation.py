@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import llm_recommendation
+from cache import PersistentCache
+from messages import FAILURE_MESSAGE, INTERRUPTED_MESSAGE, is_complete
+
+def chunk(text=None, usage=None):
+    choices = [] if text is None else [SimpleNamespace(delta=SimpleNamespace(content=text))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+@pytest.fixture
+def products():
+    return pd.DataFrame({"Company": ["Dell", "HP"]}, index=pd.Index([7, 3], name="product_id"))
+
+@pytest.fixture
+def llm(monkeypatch, tmp_path):
+    """Replays the scripted chunks; an Exception in the script is raised mid-stream."""
+    script = []
+    calls = []
+
+    def chat_completion(endpoint, messages, **kwargs):
+        calls.append(endpoint)
+
+        def stream():
+            for item in script:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        return stream()
+
+    cache = PersistentCache("recommendation", "test", db_path=str(tmp_path / "cache.db"))
+    monkeypatch.setattr(llm_recommendation.llm_client, "chat_completion", chat_completion)
+    monkeypatch.setattr(llm_recommendation, "_cache", lambda: cache)
+    monkeypatch.setattr(llm_recommendation, "build_prompt", lambda query, df: "prompt")
+    return SimpleNamespace(script=script, calls=calls)
+
+def stream(products, query="gaming laptop"):
+    return list(llm_recommendation.generate_recommendation_stream(query, products))
+
+def test_completed_stream_is_cached_and_replayed_whole(llm, products):
+    llm.script += [chunk("  Buy "), chunk(), chunk("the Dell."), chunk(usage=None)]
+    assert stream(products) == ["Buy ", "the Dell."]
+    assert stream(products) == ["Buy the Dell."]
+    assert llm.calls == ["generate_recommendation"]
+
+def test_failure_before_the_first_token(llm, products):
+    llm.script += [RuntimeError("connection reset")]
+    text = "".join(stream(products))
+    assert text == FAILURE_MESSAGE and not is_complete(text)
+
+def test_failure_mid_stream_is_marked_and_not_cached(llm, products):
+    llm.script += [chunk("Buy the"), RuntimeError("connection reset")]
+    text = "".join(stream(products))
+    assert text == "Buy the" + INTERRUPTED_MESSAGE and not is_complete(text)
+
+    llm.script[:] = [chunk("Buy the HP.")]
+    assert "".join(stream(products)) == "Buy the HP."
+    assert len(llm.calls) == 2
+
+def test_empty_results_never_call_the_llm(llm):
+    empty = pd.DataFrame(index=pd.Index([], name="product_id"))
+    assert stream(empty) == [llm_recommendation.EMPTY_MESSAGE]
+    assert llm.calls == []
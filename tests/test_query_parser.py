@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import pytest
+
+import llm_query_handler
+from cache import PersistentCache
+from query_parser import build_vocabulary, parse_query
+
+@pytest.fixture(scope="module")
+def vocabulary():
+    return build_vocabulary()
+
+PARSED = [
+    ("HP laptop under 800 euros", {"brand": "HP", "price_under": 800}),
+    ("lightweight student laptop", {"use_case": "student", "lightweight": True}),
+    ("MacBook Air between 900 and 1500",
+     {"model": "macbook air", "brand": "Apple", "price_above": 900, "price_under": 1500}),
+    ("Lenovo ThinkPad for office work", {"brand": "Lenovo", "model": "thinkpad", "use_case": "office"}),
+    ("I need a lightweight Dell laptop which weight under 1 kg", {"brand": "Dell", "lightweight": True}),
+    ("laptop over 1.5k", {"price_above": 1500}),
+    ("gaming laptop with 16GB RAM under 1500", {"use_case": "gaming", "price_under": 1500}),
+]
+
+@pytest.mark.parametrize("query, expected", PARSED)
+def test_simple_queries_parse_with_full_confidence(vocabulary, query, expected):
+    parsed, confidence = parse_query(query, vocabulary)
+    attributes = {k: v for k, v in parsed["important_attributes"].items() if v != ""}
+    assert attributes == expected
+    assert confidence == 1.0
+
+def test_recommend_words_set_the_intent(vocabulary):
+    parsed, _ = parse_query("Suggest a good gaming laptop", vocabulary)
+    assert parsed["intent"] == "recommend"
+
+@pytest.mark.parametrize("query", [
+    "Looking for gaming laptops under 60000 rupees",
+    "laptop under $900",
+    "something that runs my favourite simulation software smoothly",
+])
+def test_unexplained_or_foreign_currency_queries_have_low_confidence(vocabulary, query):
+    _, confidence = parse_query(query, vocabulary)
+    assert confidence < llm_query_handler.FAST_PATH_MIN_CONFIDENCE
+
+# -------------------- Routing --------------------
+
+@pytest.fixture
+def llm_calls(monkeypatch, tmp_path):
+    calls = []
+
+    def chat_completion(endpoint, messages, **kwargs):
+        calls.append(endpoint)
+        content = '{"category": "laptop", "intent": "search", "important_attributes": {"use_case": "simulation"}}'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    monkeypatch.setattr(llm_query_handler.llm_client, "chat_completion", chat_completion)
+    monkeypatch.setattr(llm_query_handler, "query_cache",
+                        PersistentCache("understand_query", "test", db_path=str(tmp_path / "cache.db")))
+    monkeypatch.setattr(llm_query_handler, "SEMANTIC_CACHE_ENABLED", False)
+    return calls
+
+def test_simple_queries_skip_the_llm(llm_calls):
+    _, source = llm_query_handler.understand_query_with_source("HP laptop under 800 euros")
+    assert source == "fast_path" and llm_calls == []
+
+def test_unparsed_queries_call_the_llm_once(llm_calls):
+    query = "something that runs my favourite simulation software smoothly"
+    assert llm_query_handler.understand_query_with_source(query)[1] == "llm"
+    assert llm_query_handler.understand_query_with_source(query + "!")[1] == "cache"
+    assert llm_calls == ["understand_query"]
+
+def test_cache_only_understanding_never_calls_the_llm(llm_calls):
+    result = llm_query_handler.understand_query_with_source("a laptop for simulation work", use_llm=False)
+    assert result == (None, "miss") and llm_calls == []
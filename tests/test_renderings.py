@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_loader import prepare_frame, PRIMARY_CSV_PATH
+from renderings import MISSING_VALUE, TEMPLATES, render_frame, render_template
+
+@pytest.fixture(scope="module")
+def catalog():
+    return prepare_frame(pd.read_csv(PRIMARY_CSV_PATH).head(200)).set_index("product_id")
+
+@pytest.mark.parametrize("kind", sorted(TEMPLATES))
+def test_matches_str_format_row_by_row(catalog, kind):
+    expected = [TEMPLATES[kind].format(**row) for row in catalog.to_dict("records")]
+    assert render_template(TEMPLATES[kind], catalog).tolist() == expected
+
+def test_missing_values_render_as_placeholder():
+    df = pd.DataFrame({"Company": ["Dell", None], "Weight": [1.5, np.nan]})
+    rendered = render_template("{Company} {Weight} kg", df)
+    assert rendered.tolist() == ["Dell 1.5 kg", f"{MISSING_VALUE} {MISSING_VALUE} kg"]
+
+def test_keeps_the_frame_index(catalog):
+    rendered = render_frame(catalog.iloc[:3])
+    assert list(rendered.columns) == list(TEMPLATES)
+    assert rendered.index.tolist() == catalog.index[:3].tolist()
+
+def test_rejects_format_specs_and_unknown_columns():
+    df = pd.DataFrame({"Price_euros": [999.0]})
+    with pytest.raises(ValueError):
+        render_template("{Price_euros:.2f}", df)
+    with pytest.raises(KeyError):
+        render_template("{Company}", df)
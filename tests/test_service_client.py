@@ -0,0 +1,53 @@
+import service_client
+from messages import FAILURE_MESSAGE, INTERRUPTED_MESSAGE, is_complete
+
+class FakeResponse:
+    def __init__(self, body=None, chunks=()):
+        self.body, self.chunks = body, chunks
+
+    def json(self):
+        return self.body
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        yield from self.chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def test_find_laptops_indexes_results_by_product_id(monkeypatch):
+    body = {"results": [{"product_id": 7, "Company": "Dell"}, {"product_id": 3, "Company": "HP"}],
+            "query_data": {"brand": None}}
+    monkeypatch.setattr(service_client, "_post", lambda path, payload, stream=False: FakeResponse(body))
+    results, query_data = service_client.find_laptops("any laptop")
+    assert results.index.name == "product_id"
+    assert results.index.tolist() == [7, 3]
+    assert results["Company"].tolist() == ["Dell", "HP"]
+    assert query_data == {"brand": None}
+
+def test_recommendation_stream_sends_product_ids(monkeypatch):
+    sent = {}
+
+    def post(path, payload, stream=False):
+        sent.update(payload)
+        return FakeResponse(chunks=["Buy ", "the Dell"])
+
+    body = {"results": [{"product_id": 7}, {"product_id": 3}], "query_data": None}
+    monkeypatch.setattr(service_client, "_post", lambda path, payload, stream=False: FakeResponse(body))
+    results, _ = service_client.find_laptops("any laptop")
+
+    monkeypatch.setattr(service_client, "_post", post)
+    text = "".join(service_client.generate_recommendation_stream("any laptop", results))
+    assert sent["product_ids"] == [7, 3]
+    assert text == "Buy the Dell" and is_complete(text)
+
+def test_failed_stream_is_incomplete(monkeypatch):
+    def post(path, payload, stream=False):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(service_client, "_post", post)
+    text = "".join(service_client.generate_recommendation_stream("q", service_client.pd.DataFrame()))
+    assert text == FAILURE_MESSAGE and not is_complete(text)
+    assert not is_complete("Buy the Dell" + INTERRUPTED_MESSAGE)
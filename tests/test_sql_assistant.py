@@ -0,0 +1,41 @@
+import pytest
+from sql_assistant import match_template, DEFAULT_LIMIT
+
+COMPANIES = ["Apple", "Dell", "HP", "Lenovo", "Asus"]
+
+# question -> (WHERE clauses in order, params) the template must produce
+MATCHES = [
+    ("top 5 cheapest laptops", [], [5]),
+    ("cheapest laptops", [], [DEFAULT_LIMIT]),
+    ("Dell laptops with more than 16GB RAM", ['"Ram" > ?', '"Company" = ?'], [16, "Dell", DEFAULT_LIMIT]),
+    ("laptops with RTX graphics", ['"GPU_model" LIKE ?'], ["%rtx%", DEFAULT_LIMIT]),
+    ("HP laptops under 800 euros", ['"Price_euros" < ?', '"Company" = ?'], [800.0, "HP", DEFAULT_LIMIT]),
+    ("16GB RAM laptops with RTX graphics", ['"Ram" = ?', '"GPU_model" LIKE ?'], [16, "%rtx%", DEFAULT_LIMIT]),
+]
+
+# Questions a template would answer wrongly; they must go to the agent
+NO_MATCH = [
+    "Dell and HP laptops under 800",
+    "laptops with 4GB GPU memory",
+    "laptops with 8GB of VRAM",
+    "which laptop is best for video editing",
+    "laptops",
+    "",
+]
+
+@pytest.mark.parametrize("question, clauses, params", MATCHES)
+def test_template_matches(question, clauses, params):
+    sql, actual = match_template(question, COMPANIES)
+    for clause in clauses:
+        assert clause in sql
+    assert sql.count("?") == len(clauses) + 1
+    assert actual == params
+
+@pytest.mark.parametrize("question", NO_MATCH)
+def test_template_declines(question):
+    assert match_template(question, COMPANIES) is None
+
+def test_ordering_and_limit():
+    sql, params = match_template("3 most expensive Apple laptops", COMPANIES)
+    assert 'ORDER BY "Price_euros" DESC' in sql
+    assert params == ["Apple", 3]
@@ -0,0 +1,60 @@
+import pytest
+
+from user_history import HistoryStore, MIGRATIONS
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+def save(store, user_id, count, start=0):
+    store.enqueue([{"user_id": user_id, "query": f"q{i}", "recommendation": f"r{i}"}
+                   for i in range(start, start + count)])
+
+def test_keyset_pages_walk_the_history_newest_first(store):
+    save(store, "alice", 7)
+    save(store, "bob", 3)
+    store.flush()
+
+    queries, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = store.page("alice", limit=3, cursor=cursor)
+        queries += [query for query, _, _ in rows]
+        pages += 1
+        if cursor is None:
+            break
+    assert queries == [f"q{i}" for i in range(6, -1, -1)]
+    assert pages == 3
+
+def test_full_last_page_ends_with_an_empty_page(store):
+    save(store, "alice", 4)
+    store.flush()
+    rows, cursor = store.page("alice", limit=2)
+    rows, cursor = store.page("alice", limit=2, cursor=cursor)
+    assert [q for q, _, _ in rows] == ["q1", "q0"] and cursor is not None
+    assert store.page("alice", limit=2, cursor=cursor) == ([], None)
+
+def test_pages_do_not_shift_when_new_rows_arrive(store):
+    save(store, "alice", 4)
+    store.flush()
+    first, cursor = store.page("alice", limit=2)
+    save(store, "alice", 2, start=4)
+    store.flush()
+    second, _ = store.page("alice", limit=2, cursor=cursor)
+    assert [q for q, _, _ in first] == ["q3", "q2"]
+    assert [q for q, _, _ in second] == ["q1", "q0"]
+
+def test_reads_see_rows_once_flushed(store):
+    save(store, "alice", 1)
+    store.flush()
+    assert store.pending() == 0
+    assert store.page("alice")[0][0][:2] == ("q0", "r0")
+
+def test_reopening_does_not_rerun_migrations(tmp_path):
+    path = str(tmp_path / "history.db")
+    HistoryStore(path).close()
+    store = HistoryStore(path)
+    version = store._write_conn.execute("PRAGMA user_version").fetchone()[0]
+    store.close()
+    assert version == len(MIGRATIONS)
@@ -1,81 +1,260 @@
 import sqlite3
 from datetime import datetime
 import os
+import queue
+import atexit
+import threading
+import telemetry
+
+# -------------------- Configuration --------------------
+
+HISTORY_DB_PATH = "db/user_history.db"
+
+# Background writer: rows are committed in batches of up to this size
+WRITE_BATCH_SIZE = 256
+
+# Default page size for history reads
+HISTORY_PAGE_SIZE = 50
+
+# -------------------- Schema --------------------
 
 def ensure_column_exists(cursor, table, column, column_type):
-    try:
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [info[1] for info in cursor.fetchall()]
-        if column not in columns:
-            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
-    except sqlite3.DatabaseError as e:
-        print(f"[ERROR] Failed to ensure column '{column}' exists in '{table}': {e}")
-
-def save_history_to_db(history, db_path="db/user_history.db"):
-    try:
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)  # Create the directory if not exists
-        conn = sqlite3.connect(db_path)
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = [info[1] for info in cursor.fetchall()]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+def _create_history_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            query TEXT,
+            timestamp TEXT
+        )
+    """)
+
+def _add_recommendation_column(cursor):
+    # Older databases may already have it from the pre-migration code
+    ensure_column_exists(cursor, "history", "recommendation", "TEXT")
+
+def _add_user_timestamp_index(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_user_timestamp ON history (user_id, timestamp)")
+
+# Applied in order; PRAGMA user_version records how many have run.
+# Append new steps, never edit or reorder existing ones.
+MIGRATIONS = [
+    _create_history_table,
+    _add_recommendation_column,
+    _add_user_timestamp_index,
+]
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    with conn:
         cursor = conn.cursor()
+        for step in MIGRATIONS[version:]:
+            step(cursor)
+        cursor.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+    print(f"[INFO] History database migrated from version {version} to {len(MIGRATIONS)}")
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# -------------------- History Store --------------------
+
+class HistoryStore:
+    """
+    One history database: migrated once on open, written by a single
+    background thread that drains a queue in executemany batches, and read
+    through per-thread connections (WAL lets reads run alongside the writer).
+    """
 
-        # Step 1: Ensure table exists
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT NOT NULL,
-                query TEXT,
-                timestamp TEXT
-            )
-        """)
+    def __init__(self, db_path=HISTORY_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
 
-        # Step 2: Ensure 'recommendation' column exists
-        ensure_column_exists(cursor, "history", "recommendation", "TEXT")
+        self._write_conn = connect(db_path)
+        migrate(self._write_conn)
 
-        # Step 3: Insert entries
+        self._readers = threading.local()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ---- writes ----
+
+    def enqueue(self, history):
+        """
+        Queues entries for writing and returns immediately. Timestamps are
+        taken here, so rows keep the order in which they were saved.
+        """
+        if self._closed:
+            raise RuntimeError("History store is closed")
         for entry in history:
+            self._queue.put((
+                entry.get("user_id", "unknown"),
+                entry.get("query", ""),
+                entry.get("recommendation", ""),
+                datetime.now().isoformat()
+            ))
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        try:
+            while len(batch) < WRITE_BATCH_SIZE:
+                item = self._queue.get_nowait()
+                if item is None:
+                    # Leave the stop marker for the next round, after this batch is written
+                    self._queue.task_done()
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write_loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._queue.task_done()
+                return
             try:
-                cursor.execute("""
-                    INSERT INTO history (user_id, query, recommendation, timestamp)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    entry.get("user_id", "unknown"),
-                    entry.get("query", ""),
-                    entry.get("recommendation", ""),
-                    datetime.now().isoformat()
-                ))
-            except sqlite3.DatabaseError as e:
-                print(f"[ERROR] Failed to insert entry {entry}: {e}")
-
-        conn.commit()
+                with telemetry.span("save_history_to_db", rows=len(batch)):
+                    with self._write_conn:
+                        self._write_conn.executemany(
+                            "INSERT INTO history (user_id, query, recommendation, timestamp) VALUES (?, ?, ?, ?)",
+                            batch
+                        )
+            except sqlite3.Error as e:
+                print(f"[ERROR] Failed to write {len(batch)} history entries: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def pending(self):
+        return self._queue.unfinished_tasks
 
+    def flush(self):
+        """
+        Blocks until every queued entry has been written.
+        """
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._write_conn.close()
+
+    # ---- reads ----
+
+    def _reader(self):
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = connect(self.db_path)
+        return conn
+
+    def page(self, user_id, limit=HISTORY_PAGE_SIZE, cursor=None):
+        """
+        Newest-first page of (query, recommendation, timestamp) rows.
+        Pass the returned cursor back to get the next page; it is None once
+        the history is exhausted. Keyset pagination, so every page is an
+        index range scan no matter how deep it is.
+
+        Only committed rows are read: a read never waits on the writer, and
+        entries still queued (normally for a few milliseconds) show up on
+        the next read. Call flush() first when a caller needs them.
+        """
+        with telemetry.span("get_user_history", limit=limit):
+            if cursor is None:
+                rows = self._reader().execute("""
+                    SELECT query, recommendation, timestamp, id
+                    FROM history
+                    WHERE user_id = ?
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """, (user_id, limit)).fetchall()
+            else:
+                timestamp, row_id = cursor
+                rows = self._reader().execute("""
+                    SELECT query, recommendation, timestamp, id
+                    FROM history
+                    WHERE user_id = ? AND (timestamp < ? OR (timestamp = ? AND id < ?))
+                    ORDER BY timestamp DESC, id DESC
+                    LIMIT ?
+                """, (user_id, timestamp, timestamp, row_id, limit)).fetchall()
+            telemetry.set_attribute("result_count", len(rows))
+
+        next_cursor = (rows[-1][2], rows[-1][3]) if len(rows) == limit else None
+        return [row[:3] for row in rows], next_cursor
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(db_path=HISTORY_DB_PATH):
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = _stores[db_path] = HistoryStore(db_path)
+        return store
+
+@atexit.register
+def close_all():
+    """
+    Writes out anything still queued before the interpreter exits.
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
+
+# -------------------- Public API --------------------
+
+def save_history_to_db(history, db_path=HISTORY_DB_PATH):
+    """
+    Queues history entries for the background writer; does not block on disk I/O.
+    """
+    try:
+        get_store(db_path).enqueue(history)
     except sqlite3.Error as e:
         print(f"[ERROR] Database operation failed: {e}")
     except Exception as e:
         print(f"[ERROR] Unexpected error occurred: {e}")
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
-def get_user_history(user_id, db_path="db/user_history.db"):
+def get_user_history(user_id, db_path=HISTORY_DB_PATH, limit=HISTORY_PAGE_SIZE, cursor=None):
+    """
+    Returns the newest `limit` (query, recommendation, timestamp) rows for the user.
+    """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT query, recommendation, timestamp
-            FROM history
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-        """, (user_id,))
-
-        rows = cursor.fetchall()
+        rows, _ = get_store(db_path).page(user_id, limit, cursor)
         return rows
-
     except sqlite3.Error as e:
         print(f"[ERROR] Failed to retrieve history for user '{user_id}': {e}")
         return []
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def get_user_history_page(user_id, db_path=HISTORY_DB_PATH, limit=HISTORY_PAGE_SIZE, cursor=None):
+    """
+    Like get_user_history, but also returns the cursor for the next page.
+    """
+    try:
+        return get_store(db_path).page(user_id, limit, cursor)
+    except sqlite3.Error as e:
+        print(f"[ERROR] Failed to retrieve history for user '{user_id}': {e}")
+        return [], None
 
 # Test saving and retrieving
 if __name__ == "__main__":
@@ -85,6 +264,8 @@ if __name__ == "__main__":
         {"user_id": "user123"}  # Intentionally missing fields for testing defaults
     ]
     save_history_to_db(sample_history)
+    # Reads see committed rows only
+    get_store().flush()
     history = get_user_history("user123")
     for row in history:
         print(row)